@@ -1,19 +1,38 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+import json
+import click
 import logging
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Local imports
 from config import get_config
-from models.database import init_db
-from models.user import get_user_by_phone
-from services.bitnob_service import BitnobService
+from models.database import commit_unit_of_work, init_db
+from models.stats import get_stats_summary, ensure_stats_counters, rebuild_stats_counters
+from models.user import (
+    get_user_identity, get_user_identities, get_user_transactions_page, iter_user_transactions,
+    configure_user_identity_cache, TransactionStatus, TransactionType
+)
+from services.bitnob_service import BitnobService, create_bitnob_retry_policy
 from services.twilio_service import TwilioService, create_twilio_service
 from services.otp_service import create_otp_service
+from services.message_queue import MessageQueue, ReplyWorkerPool
+from services.message_dedup import create_message_dedup_store
+from services.reconciler import create_transaction_reconciler
+from services.rates_service import create_rates_service
 from handlers.commands import create_command_handler
 from handlers.registration import create_registration_handler
 from handlers.transaction import create_transaction_handler, handle_bitnob_webhook
-from utils.helpers import normalize_phone_number, log_user_action
+from utils.helpers import normalize_phone_number, log_user_action, rate_limiter, encode_cursor, decode_cursor
+from utils.rate_limit import create_rate_limit_backend
+from utils.session_store import session_store, create_session_backend
+from utils.circuit_breaker import circuit_breakers
+from utils.retry import init_retry_deadline
+from utils.metrics import init_metrics, render_metrics, QUEUE_DEPTH
+from utils.tracing import tracer, init_tracing, create_span_exporter
+from utils.query_profiler import query_profiler, init_query_profiling
+from utils.logging_setup import configure_logging, parse_sample_rates
+from utils.validators import BitcoinValidator
 from utils.validators import MessageValidator
 
 # Initialize Flask app
@@ -23,27 +42,67 @@ app = Flask(__name__)
 config = get_config()
 app.config.from_object(config)
 
+# Request latency, SQL statement counts and trace spans (registered first so they cover the commit)
+init_metrics(app)
+init_tracing(app)
+tracer.use_exporter(create_span_exporter(app.config['TRACE_EXPORT_PATH'], app.config['TRACE_MIN_DURATION_MS']))
+
+# Per-endpoint report of repeated (N+1) and slow SQL statements, for development and staging
+if app.config['SQL_PROFILE_REPORT_PATH']:
+    init_query_profiling(app)
+    query_profiler.configure(app.config['SQL_PROFILE_REPORT_PATH'], app.config['SQL_SLOW_QUERY_MS'],
+                             app.config['SQL_REPEAT_THRESHOLD'])
+
+# Requests fail fast on a throttled Bitnob; background jobs keep the long Retry-After waits
+init_retry_deadline(app, app.config['BITNOB_REQUEST_RETRY_DEADLINE'])
+
 # Initialize database
 init_db(app)
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, app.config['LOG_LEVEL']),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Counters behind /api/stats, built from the tables the first time
+with app.app_context():
+    ensure_stats_counters()
+
+# Configure logging: records are written as JSON by a background thread, off the request path
+configure_logging(
+    app.config['LOG_LEVEL'], app.config['LOG_FORMAT'],
+    parse_sample_rates(app.config['LOG_SAMPLE_RATES']), app.config['LOG_QUEUE_SIZE']
 )
 logger = logging.getLogger(__name__)
 
+# Circuit breakers for Bitnob and Twilio calls
+circuit_breakers.configure(
+    failure_threshold=app.config['CIRCUIT_BREAKER_FAILURE_THRESHOLD'],
+    recovery_timeout=app.config['CIRCUIT_BREAKER_RECOVERY_SECONDS']
+)
+
+# Cached identities of registered users for the webhook and API lookups
+configure_user_identity_cache(app.config['USER_CACHE_TTL_SECONDS'])
+
+# Send addresses must belong to the network the Bitnob account runs on
+BitcoinValidator.use_network(app.config['BITCOIN_NETWORK'])
+
 # Initialize services
 bitnob_service = BitnobService(
     api_key=app.config['BITNOB_API_KEY'],
     secret_key=app.config['BITNOB_SECRET_KEY'],
-    base_url=app.config['BITNOB_BASE_URL']
+    base_url=app.config['BITNOB_BASE_URL'],
+    wallet_cache_ttl=app.config['BITNOB_WALLET_CACHE_TTL'],
+    max_stale_balance_age=app.config['BITNOB_MAX_STALE_BALANCE_SECONDS'],
+    retry_policy=create_bitnob_retry_policy(
+        max_retries=app.config['BITNOB_MAX_RETRIES'],
+        connect_timeout=app.config['BITNOB_CONNECT_TIMEOUT'],
+        read_timeout=app.config['BITNOB_READ_TIMEOUT'],
+        send_timeout=app.config['BITNOB_SEND_TIMEOUT'],
+        budget_ratio=app.config['BITNOB_RETRY_BUDGET_RATIO']
+    )
 )
 
 twilio_service = create_twilio_service(
     account_sid=app.config['TWILIO_ACCOUNT_SID'],
     auth_token=app.config['TWILIO_AUTH_TOKEN'],
-    phone_number=app.config['TWILIO_PHONE_NUMBER']
+    phone_number=app.config['TWILIO_PHONE_NUMBER'],
+    api_base_url=app.config['TWILIO_API_BASE_URL']
 )
 
 otp_service = create_otp_service(
@@ -51,10 +110,57 @@ otp_service = create_otp_service(
     max_attempts=app.config['MAX_OTP_ATTEMPTS']
 )
 
+# BTC rates and fee estimates, refreshed in the background so handlers read them from memory
+rates_service = None
+if app.config['RATES_REFRESH_SECONDS'] > 0:
+    rates_service = create_rates_service(
+        bitnob_service,
+        currencies=app.config['RATES_CURRENCIES'],
+        refresh_interval=app.config['RATES_REFRESH_SECONDS'],
+        max_age=app.config['RATES_MAX_AGE_SECONDS']
+    )
+    rates_service.start()
+
 # Initialize handlers
-command_handler = create_command_handler(bitnob_service, twilio_service, otp_service)
+command_handler = create_command_handler(bitnob_service, twilio_service, otp_service, rates_service)
 registration_handler = create_registration_handler(bitnob_service, twilio_service, otp_service)
-transaction_handler = create_transaction_handler(bitnob_service, twilio_service, otp_service)
+transaction_handler = create_transaction_handler(bitnob_service, twilio_service, otp_service, rates_service)
+
+# Twilio MessageSid dedup store (Twilio retries webhooks on timeouts)
+message_dedup = create_message_dedup_store(
+    backend=app.config['TWILIO_DEDUP_BACKEND'],
+    ttl_seconds=app.config['TWILIO_DEDUP_TTL_SECONDS'],
+    path=app.config['TWILIO_DEDUP_PATH']
+)
+
+# Rate limit counters, shared across workers unless the backend is 'memory'
+rate_limiter.use_backend(create_rate_limit_backend(
+    backend=app.config['RATE_LIMIT_BACKEND'],
+    path=app.config['RATE_LIMIT_PATH']
+))
+
+# Conversation state (awaiting_name, awaiting_otp, ...) kept off the users table
+session_store.use_backend(
+    create_session_backend(
+        backend=app.config['SESSION_BACKEND'],
+        path=app.config['SESSION_PATH']
+    ),
+    ttl_seconds=app.config['SESSION_TTL_SECONDS']
+)
+
+# Optional asynchronous reply mode
+message_queue = None
+reply_workers = None
+if app.config['TWILIO_ASYNC_REPLIES']:
+    message_queue = MessageQueue(app.config['MESSAGE_QUEUE_PATH'])
+    reply_workers = ReplyWorkerPool(
+        message_queue,
+        app,
+        command_handler.handle_message,
+        twilio_service.send_message,
+        workers=app.config['MESSAGE_QUEUE_WORKERS']
+    )
+    reply_workers.start()
 
 @app.route('/', methods=['GET', 'HEAD'])
 def root():
@@ -68,15 +174,39 @@ def root():
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    health = {
         'status': 'healthy',
         'timestamp': datetime.utcnow().isoformat(),
         'version': '1.0.0'
-    })
+    }
+    
+    if message_queue is not None:
+        health['message_queue'] = message_queue.depth()
+    
+    if rates_service is not None:
+        health['rates'] = rates_service.snapshot()
+    
+    # Degraded, not unhealthy: the app still answers while an upstream circuit is open
+    health['circuit_breakers'] = circuit_breakers.snapshot()
+    if any(breaker['state'] == 'open' for breaker in health['circuit_breakers'].values()):
+        health['status'] = 'degraded'
+    
+    return jsonify(health)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics, summed across workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    if message_queue is not None:
+        for status, count in message_queue.depth().items():
+            QUEUE_DEPTH.labels(status).set(count)
+    
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
 
 @app.route('/webhook/twilio', methods=['POST'])
 def twilio_webhook():
     """Handle incoming WhatsApp messages from Twilio"""
+    message_sid = None
     try:
         # Validate webhook signature in production
         if app.config['ENVIRONMENT'] == 'production':
@@ -92,15 +222,39 @@ def twilio_webhook():
             logger.warning("Invalid webhook data received")
             return "Bad Request", 400
         
+        # Answer retried deliveries from the dedup store instead of re-running the turn
+        message_sid = request.form.get('MessageSid')
+        if message_sid:
+            claimed, cached_reply = message_dedup.claim(message_sid)
+            if not claimed:
+                logger.info(f"Duplicate Twilio message {message_sid} from {from_number}")
+                message_sid = None
+                if cached_reply is None:
+                    return twilio_service.create_empty_twiml_response(), 200, {'Content-Type': 'text/xml'}
+                return twilio_service.create_twiml_response(cached_reply), 200, {'Content-Type': 'text/xml'}
+        
         # Validate message content
         message_validation = MessageValidator.validate_message_content(message_body)
         if not message_validation['valid']:
             logger.warning(f"Invalid message content from {from_number}")
             response_message = "Invalid message format. Please try again."
+        elif not rate_limiter.is_allowed(f"twilio:{from_number}", app.config['RATE_LIMIT_PER_MINUTE'], window_minutes=1):
+            logger.warning(f"Rate limit exceeded for {from_number}")
+            response_message = "You're sending messages too quickly. Please wait a minute and try again."
+        elif message_queue is not None:
+            # Queue the turn and reply later through the REST API
+            message_queue.enqueue(from_number, message_body, message_sid)
+            reply_workers.notify()
+            return twilio_service.create_empty_twiml_response(), 200, {'Content-Type': 'text/xml'}
         else:
             # Process the message
             response_message = command_handler.handle_message(from_number, message_body)
         
+        # Save the turn before its reply is remembered or sent; a failed commit releases the claim below
+        commit_unit_of_work()
+        if message_sid:
+            message_dedup.record_reply(message_sid, response_message)
+        
         # Return TwiML response
         twiml_response = twilio_service.create_twiml_response(response_message)
         
@@ -108,6 +262,8 @@ def twilio_webhook():
         
     except Exception as e:
         logger.error(f"Twilio webhook error: {e}")
+        if message_sid:
+            message_dedup.release(message_sid)
         error_response = twilio_service.create_twiml_response(
             "Sorry, something went wrong. Please try again later."
         )
@@ -150,7 +306,7 @@ def get_user_balance_api(phone_number):
         # Add authentication/authorization as needed
         
         normalized_phone = normalize_phone_number(phone_number)
-        user = get_user_by_phone(normalized_phone)
+        user = get_user_identity(normalized_phone)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -171,60 +327,189 @@ def get_user_balance_api(phone_number):
             'balance': float(balance_data.get('available', 0)),
             'currency': 'BTC',
             'wallet_address': user.bitcoin_address,
-            'updated_at': datetime.utcnow().isoformat()
+            'stale': balance_data.get('stale', False),
+            'updated_at': balance_data.get('as_of', datetime.utcnow().isoformat())
         })
         
     except Exception as e:
         logger.error(f"Get balance API error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/balances', methods=['POST'])
+def get_balances_api():
+    """API endpoint to get many users' balances, streamed as a JSON array"""
+    try:
+        payload = request.get_json(silent=True) or {}
+        phone_numbers = payload.get('phone_numbers') or []
+        user_ids = payload.get('user_ids') or []
+        
+        if not isinstance(phone_numbers, list) or not isinstance(user_ids, list):
+            return jsonify({'error': 'phone_numbers and user_ids must be lists'}), 400
+        
+        if len(phone_numbers) + len(user_ids) > app.config['BALANCE_BATCH_MAX_USERS']:
+            return jsonify({'error': f"At most {app.config['BALANCE_BATCH_MAX_USERS']} users per request"}), 400
+        
+        # Requested keys in order, without duplicates
+        keys = list(dict.fromkeys(
+            [('phone_number', normalize_phone_number(str(phone))) for phone in phone_numbers] +
+            [('user_id', str(user_id)) for user_id in user_ids]
+        ))
+        
+        # One query for every user and one wallet-list fetch for every balance
+        identities = get_user_identities(
+            phone_numbers=[value for field, value in keys if field == 'phone_number'],
+            user_ids=[value for field, value in keys if field == 'user_id']
+        )
+        by_key = {}
+        for user in identities:
+            by_key[('phone_number', user.phone_number)] = user
+            by_key[('user_id', user.id)] = user
+        
+        wallet_ids = list({user.bitnob_wallet_id for user in identities if user.is_kyc_completed})
+        balances = {}
+        if wallet_ids:
+            balances_result = bitnob_service.get_wallet_balances(wallet_ids)
+            if balances_result.get('error'):
+                return jsonify({'error': 'Failed to get balances'}), 500
+            balances = balances_result['data']
+        
+        def balance_entry(field, value):
+            user = by_key.get((field, value))
+            if not user:
+                return {field: value, 'error': 'User not found'}
+            
+            entry = {'user_id': user.id, 'phone_number': user.phone_number}
+            if not user.is_kyc_completed:
+                entry['error'] = 'User account not complete'
+                return entry
+            
+            balance_result = balances[user.bitnob_wallet_id]
+            if balance_result.get('error'):
+                entry['error'] = 'Failed to get balance'
+                return entry
+            
+            balance_data = balance_result['data']
+            entry.update({
+                'balance': float(balance_data.get('available', 0)),
+                'currency': 'BTC',
+                'wallet_address': user.bitcoin_address,
+                'stale': balance_data.get('stale', False),
+                'updated_at': balance_data.get('as_of')
+            })
+            return entry
+        
+        def generate():
+            yield '['
+            for position, (field, value) in enumerate(keys):
+                yield (',' if position else '') + json.dumps(balance_entry(field, value))
+            yield ']'
+        
+        return Response(generate(), mimetype='application/json')
+        
+    except Exception as e:
+        logger.error(f"Get balances API error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/user/<phone_number>/transactions', methods=['GET'])
 def get_user_transactions_api(phone_number):
-    """API endpoint to get user transactions"""
+    """API endpoint to get user transactions, newest first, a page at a time or streamed as NDJSON"""
     try:
+        try:
+            filters = _parse_transaction_filters(request.args)
+            after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+            limit = request.args.get('limit', type=int)
+            if limit is not None and limit < 1:
+                raise ValueError("limit must be a positive number")
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         normalized_phone = normalize_phone_number(phone_number)
-        user = get_user_by_phone(normalized_phone)
+        user = get_user_identity(normalized_phone)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Get transaction history
-        result = transaction_handler.get_transaction_history(user)
+        max_limit = app.config['TRANSACTIONS_API_MAX_LIMIT']
         
-        if result['success']:
-            return jsonify({
-                'phone_number': normalized_phone,
-                'transactions': result['transactions'],
-                'count': len(result['transactions'])
-            })
-        else:
-            return jsonify({'error': result.get('message', 'Failed to get transactions')}), 500
+        if request.args.get('format') == 'ndjson':
+            # Export every matching transaction, a page of rows in memory at a time
+            def generate():
+                rows = iter_user_transactions(user.id, page_size=max_limit, after=after, **filters)
+                for position, tx in enumerate(rows):
+                    if limit and position >= limit:
+                        return
+                    line = tx.to_api_dict()
+                    line['cursor'] = encode_cursor(tx.created_at, tx.id)
+                    yield json.dumps(line) + '\n'
             
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        limit = min(limit or app.config['TRANSACTIONS_API_PAGE_SIZE'], max_limit)
+        transactions = get_user_transactions_page(user.id, limit, after, **filters)
+        next_cursor = None
+        if len(transactions) == limit:
+            next_cursor = encode_cursor(transactions[-1].created_at, transactions[-1].id)
+        
+        return jsonify({
+            'phone_number': normalized_phone,
+            'transactions': [tx.to_api_dict() for tx in transactions],
+            'count': len(transactions),
+            'next_cursor': next_cursor
+        })
+        
     except Exception as e:
         logger.error(f"Get transactions API error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/rates', methods=['GET'])
+def get_rates_api():
+    """API endpoint to get cached BTC rates and fee estimates"""
+    if rates_service is None:
+        return jsonify({'error': 'Rates refresh is disabled'}), 404
+    
+    return jsonify(rates_service.snapshot())
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    """Get system statistics"""
+    """Get system statistics from the running counters"""
     try:
-        from models.user import User, Transaction
-        
-        total_users = User.query.count()
-        active_users = User.query.filter_by(is_kyc_completed=True).count()
-        total_transactions = Transaction.query.count()
-        
-        return jsonify({
-            'total_users': total_users,
-            'active_users': active_users,
-            'total_transactions': total_transactions,
-            'timestamp': datetime.utcnow().isoformat()
-        })
+        stats = get_stats_summary(volume_days=app.config['STATS_VOLUME_DAYS'])
+        stats['timestamp'] = datetime.utcnow().isoformat()
+        return jsonify(stats)
         
     except Exception as e:
         logger.error(f"Get stats error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def _parse_transaction_filters(args):
+    """Read status, type, since and until query parameters; raises ValueError if one is invalid"""
+    filters = {}
+    
+    if args.get('status'):
+        try:
+            filters['status'] = TransactionStatus(args['status'].lower())
+        except ValueError:
+            raise ValueError(f"Unknown status: {args['status']}")
+    
+    if args.get('type'):
+        try:
+            filters['transaction_type'] = TransactionType(args['type'].lower())
+        except ValueError:
+            raise ValueError(f"Unknown type: {args['type']}")
+    
+    for name in ('since', 'until'):
+        if args.get(name):
+            try:
+                value = datetime.fromisoformat(args[name].replace('Z', '+00:00'))
+            except ValueError:
+                raise ValueError(f"{name} must be an ISO 8601 date or time")
+            if value.tzinfo:
+                # Timestamps are stored as naive UTC
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            filters[name] = value
+    
+    return filters
+
 def _validate_twilio_webhook():
     """Validate Twilio webhook signature"""
     try:
@@ -261,8 +546,11 @@ def internal_error(error):
 @app.before_request
 def log_request():
     """Log incoming requests"""
-    if request.endpoint != 'health_check':
-        logger.info(f"{request.method} {request.path} from {request.remote_addr}")
+    if request.endpoint != 'health_check' and logger.isEnabledFor(logging.INFO):
+        logger.info("%s %s from %s", request.method, request.path, request.remote_addr, extra={
+            'method': request.method, 'path': request.path, 'remote_addr': request.remote_addr,
+            'sample_key': 'request'
+        })
 
 @app.after_request
 def after_request(response):
@@ -277,6 +565,40 @@ def after_request(response):
     
     return response
 
+@app.cli.command('cleanup-otps')
+@click.option('--retention-days', type=int, default=None, help='Also delete OTPs created more than this many days ago')
+@click.option('--batch-size', type=int, default=1000, help='Rows deleted per transaction')
+def cleanup_otps_command(retention_days, batch_size):
+    """Expire stale OTPs and purge old ones (run periodically)"""
+    result = otp_service.cleanup_expired_otps(retention_days=retention_days, batch_size=batch_size)
+    click.echo(f"Expired {result['expired']} OTPs, deleted {result['deleted']} OTPs")
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the /api/stats counters from the users and transactions tables"""
+    count = rebuild_stats_counters()
+    click.echo(f"Rebuilt {count} stats counters")
+
+@app.cli.command('reconcile-transactions')
+@click.option('--stale-minutes', type=int, default=None, help='Only reconcile transactions older than this')
+@click.option('--max-pages', type=int, default=None, help='Stop after this many pages')
+def reconcile_transactions_command(stale_minutes, max_pages):
+    """Settle stale PENDING/PROCESSING transactions against Bitnob (run periodically)"""
+    reconciler = create_transaction_reconciler(
+        bitnob_service,
+        stale_after_minutes=stale_minutes or app.config['RECONCILER_STALE_MINUTES'],
+        page_size=app.config['RECONCILER_PAGE_SIZE'],
+        max_workers=app.config['RECONCILER_MAX_WORKERS'],
+        requests_per_second=app.config['RECONCILER_REQUESTS_PER_SECOND']
+    )
+    stats = reconciler.reconcile(max_pages=max_pages)
+    click.echo(
+        f"Scanned {stats['scanned']} transactions: {stats['completed']} completed, "
+        f"{stats['failed']} failed, {stats['unchanged']} unchanged, {stats['errors']} errors, "
+        f"{stats['drift']} disagreed with Bitnob "
+        f"(max lag {stats['max_lag_seconds']}s, {stats['without_bitnob_id']} without Bitnob id)"
+    )
+
 if __name__ == '__main__':
     # Development server only - Gunicorn doesn't execute this block
     port = int(os.getenv('PORT', 5000))
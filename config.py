@@ -16,12 +16,67 @@ class Config:
     TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
     TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
     TWILIO_WEBHOOK_URL = os.getenv('TWILIO_WEBHOOK_URL')
+    TWILIO_API_BASE_URL = os.getenv('TWILIO_API_BASE_URL')  # override for load tests
+    
+    # Asynchronous replies: acknowledge the webhook at once and reply via the REST API
+    TWILIO_ASYNC_REPLIES = os.getenv('TWILIO_ASYNC_REPLIES', 'False').lower() == 'true'
+    MESSAGE_QUEUE_PATH = os.getenv('MESSAGE_QUEUE_PATH', 'instance/message_queue.db')
+    MESSAGE_QUEUE_WORKERS = int(os.getenv('MESSAGE_QUEUE_WORKERS', '4'))
+    
+    # Inbound MessageSid dedup: 'memory' (per worker) or 'sqlite' (shared on one host)
+    TWILIO_DEDUP_BACKEND = os.getenv('TWILIO_DEDUP_BACKEND', 'memory')
+    TWILIO_DEDUP_TTL_SECONDS = int(os.getenv('TWILIO_DEDUP_TTL_SECONDS', '3600'))
+    TWILIO_DEDUP_PATH = os.getenv('TWILIO_DEDUP_PATH', 'instance/message_dedup.db')
     
     # Bitnob API configuration
     BITNOB_API_KEY = os.getenv('BITNOB_API_KEY')
     BITNOB_SECRET_KEY = os.getenv('BITNOB_SECRET_KEY')
     BITNOB_BASE_URL = os.getenv('BITNOB_BASE_URL', 'https://api.bitnob.co')
     BITNOB_WEBHOOK_SECRET = os.getenv('BITNOB_WEBHOOK_SECRET')
+    BITCOIN_NETWORK = os.getenv('BITCOIN_NETWORK', 'mainnet')  # 'testnet' for the Bitnob sandbox
+    BITNOB_WALLET_CACHE_TTL = int(os.getenv('BITNOB_WALLET_CACHE_TTL', '30'))  # seconds
+    # Oldest last known balances served (flagged stale) while Bitnob is unavailable
+    BITNOB_MAX_STALE_BALANCE_SECONDS = float(os.getenv('BITNOB_MAX_STALE_BALANCE_SECONDS', '300'))
+    BITNOB_CONNECT_TIMEOUT = float(os.getenv('BITNOB_CONNECT_TIMEOUT', '3.05'))  # seconds
+    BITNOB_READ_TIMEOUT = float(os.getenv('BITNOB_READ_TIMEOUT', '10'))  # seconds
+    BITNOB_SEND_TIMEOUT = float(os.getenv('BITNOB_SEND_TIMEOUT', '30'))  # read timeout for sends
+    BITNOB_MAX_RETRIES = int(os.getenv('BITNOB_MAX_RETRIES', '2'))
+    BITNOB_RETRY_BUDGET_RATIO = float(os.getenv('BITNOB_RETRY_BUDGET_RATIO', '0.2'))
+    BITNOB_REQUEST_RETRY_DEADLINE = float(os.getenv('BITNOB_REQUEST_RETRY_DEADLINE', '3'))  # seconds per call
+    
+    # Circuit breakers around Bitnob and Twilio calls
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_BREAKER_RECOVERY_SECONDS = float(os.getenv('CIRCUIT_BREAKER_RECOVERY_SECONDS', '30'))
+    
+    # Background BTC rate and fee estimate refresh (0 disables it)
+    RATES_REFRESH_SECONDS = float(os.getenv('RATES_REFRESH_SECONDS', '60'))
+    RATES_CURRENCIES = [c.strip() for c in os.getenv('RATES_CURRENCIES', 'USD').split(',') if c.strip()]
+    # Age at which rates are flagged stale and fee estimates stop being used (Bitnob is asked instead)
+    RATES_MAX_AGE_SECONDS = float(os.getenv('RATES_MAX_AGE_SECONDS', '180'))
+    
+    # Transaction reconciler
+    RECONCILER_STALE_MINUTES = int(os.getenv('RECONCILER_STALE_MINUTES', '10'))
+    RECONCILER_PAGE_SIZE = int(os.getenv('RECONCILER_PAGE_SIZE', '100'))
+    RECONCILER_MAX_WORKERS = int(os.getenv('RECONCILER_MAX_WORKERS', '8'))
+    RECONCILER_REQUESTS_PER_SECOND = float(os.getenv('RECONCILER_REQUESTS_PER_SECOND', '5'))
+    
+    # Conversation state: 'memory' (per worker), 'sqlite' (shared on one host) or 'database' (all hosts)
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'database')
+    SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS', '1800'))
+    SESSION_PATH = os.getenv('SESSION_PATH', 'instance/sessions.db')
+    
+    # Per-process cache of registered users' ids, wallets and addresses
+    USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', '60'))
+    
+    # Most users one POST /api/balances request may ask for
+    BALANCE_BATCH_MAX_USERS = int(os.getenv('BALANCE_BATCH_MAX_USERS', '1000'))
+    
+    # Transactions API page size, default and most per request (also the NDJSON export batch size)
+    TRANSACTIONS_API_PAGE_SIZE = int(os.getenv('TRANSACTIONS_API_PAGE_SIZE', '50'))
+    TRANSACTIONS_API_MAX_LIMIT = int(os.getenv('TRANSACTIONS_API_MAX_LIMIT', '500'))
+    
+    # Days of completed transaction volume reported by /api/stats
+    STATS_VOLUME_DAYS = int(os.getenv('STATS_VOLUME_DAYS', '30'))
     
     # OTP configuration
     OTP_EXPIRY_MINUTES = int(os.getenv('OTP_EXPIRY_MINUTES', '5'))
@@ -29,9 +84,26 @@ class Config:
     
     # Rate limiting
     RATE_LIMIT_PER_MINUTE = int(os.getenv('RATE_LIMIT_PER_MINUTE', '10'))
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH', 'instance/rate_limit.db')
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # 'json' or 'text' ('text' by default in development)
+    # Fraction of high-volume INFO events written, e.g. 'message_received=0.1,request=0.5' (1 keeps them all)
+    LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', 'message_received=0.1')
+    # Records waiting for the log writer thread; further records are dropped rather than block a request
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    
+    # Trace spans of each request, one JSON line per trace ('{pid}' is replaced per worker); empty disables tracing
+    TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH', '')
+    TRACE_MIN_DURATION_MS = float(os.getenv('TRACE_MIN_DURATION_MS', '0'))
+    
+    # SQL profiling for development and staging: report file of statements per endpoint ('{pid}' is
+    # replaced per worker), flagging SELECTs repeated within one request and slow statements; empty disables it
+    SQL_PROFILE_REPORT_PATH = os.getenv('SQL_PROFILE_REPORT_PATH', '')
+    SQL_SLOW_QUERY_MS = float(os.getenv('SQL_SLOW_QUERY_MS', '100'))
+    SQL_REPEAT_THRESHOLD = int(os.getenv('SQL_REPEAT_THRESHOLD', '2'))
     
     # Environment
     ENVIRONMENT = os.getenv('ENVIRONMENT', 'development')
@@ -39,6 +111,8 @@ class Config:
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory')
 
 class ProductionConfig(Config):
     DEBUG = False
@@ -46,6 +120,8 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    RATES_REFRESH_SECONDS = 0
+    SESSION_BACKEND = 'memory'
 
 config_dict = {
     'development': DevelopmentConfig,
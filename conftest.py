@@ -0,0 +1,91 @@
+"""
+Shared test helpers
+
+The test_*.py scripts import these directly, so they also work without pytest.
+Under pytest, every test additionally gets os.environ restored when it ends.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from sqlalchemy import event
+
+from models.database import db, init_db
+
+# Nothing listens here, so calls to it fail at once
+UNREACHABLE_URL = 'http://127.0.0.1:9'
+
+@contextmanager
+def patched_environ(**values):
+    """Set environment variables for a block, restoring the whole environment afterwards"""
+    saved = dict(os.environ)
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+def create_app(*extensions):
+    """A bare Flask app on an in-memory database; extensions (e.g. init_tracing) are set up before init_db"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    for extension in extensions:
+        extension(app)
+    init_db(app)
+    return app
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements run on the current app's engine"""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+def import_app(bitnob_url: str = UNREACHABLE_URL):
+    """The real app module, pointed at bitnob_url
+
+    app.py reads its configuration at import, so it is imported once per process,
+    against a throwaway database that is removed at exit. Later callers share it,
+    with its Bitnob client repointed and its wallet cache emptied.
+    """
+    if 'app' not in sys.modules:
+        from load_test import start_app
+
+        workdir = tempfile.mkdtemp(prefix='satchat-test-')
+        atexit.register(shutil.rmtree, workdir, True)
+        with patched_environ(RATES_REFRESH_SECONDS='0'):
+            server, _ = start_app(bitnob_url, UNREACHABLE_URL, workdir)
+            server.shutdown()
+
+    import app
+    app.bitnob_service.base_url = bitnob_url.rstrip('/')
+    app.bitnob_service.invalidate_wallet_cache()
+    return app
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture(autouse=True)
+    def restore_environ():
+        with patched_environ():
+            yield
@@ -0,0 +1,15 @@
+# Gunicorn settings, loaded automatically from the working directory
+import os
+import shutil
+
+def on_starting(server):
+    """Start with an empty metrics directory so samples from earlier runs are not reported"""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+def child_exit(server, worker):
+    """Drop the exited worker's live gauges from /metrics"""
+    from utils.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
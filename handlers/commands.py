@@ -1,9 +1,14 @@
 from typing import Dict, Any, Optional, Tuple
 import logging
-from models.user import User, Transaction, TransactionType, TransactionStatus, UserStatus, get_user_by_phone
+import time
+from models.user import (
+    User, Transaction, TransactionType, TransactionStatus, UserStatus, get_user_by_phone,
+    get_cached_user_identity, remember_user_identity
+)
 from services.bitnob_service import BitnobService
 from services.twilio_service import MessageFormatter
 from services.otp_service import OTPService, OTPPurpose
+from services.rates_service import RatesService, DEFAULT_FEE_BTC
 from utils.helpers import (
     detect_message_intent, parse_send_command, format_bitcoin_amount,
     generate_reference_number, log_user_action, normalize_phone_number,
@@ -12,44 +17,79 @@ from utils.helpers import (
 from utils.validators import (
     validate_send_command, TransactionValidator, BitcoinValidator
 )
+from utils.session_store import session_store
+from utils.metrics import MESSAGE_LATENCY
+from utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+# Intents a registered user's cached identity can answer on its own
+IDENTITY_INTENTS = {'greeting', 'balance', 'address', 'history', 'help'}
+
 class CommandHandler:
     """Handle user commands and interactions"""
     
-    def __init__(self, bitnob_service: BitnobService, twilio_service, otp_service: OTPService):
+    def __init__(self, bitnob_service: BitnobService, twilio_service, otp_service: OTPService,
+                 rates_service: Optional[RatesService] = None):
         self.bitnob_service = bitnob_service
         self.twilio_service = twilio_service
         self.otp_service = otp_service
+        self.rates_service = rates_service
     
     def handle_message(self, phone_number: str, message: str) -> str:
         """Main message handler - routes to appropriate command"""
-        try:
-            # Normalize phone number
-            phone_number = normalize_phone_number(phone_number)
-            
-            # Clean message: strip sandbox prefixes and normalize
-            cleaned_message = strip_sandbox_prefix(message)
-            
-            # Log user action with cleaned message
-            log_user_action(phone_number, "message_received", cleaned_message[:50])
-            
-            # Get or create user
-            user = get_user_by_phone(phone_number)
-            
-            # Detect intent from cleaned message
-            intent = detect_message_intent(cleaned_message)
-            
-            # Handle based on current session state or intent
-            if user and user.current_session_state:
-                return self._handle_session_state(user, cleaned_message, intent)
-            else:
-                return self._handle_intent(user, phone_number, cleaned_message, intent)
+        started = time.perf_counter()
+        step = 'error'
+        with tracer.start_as_current_span('handle_message') as span:
+            try:
+                with tracer.start_as_current_span('normalize'):
+                    # Normalize phone number
+                    phone_number = normalize_phone_number(phone_number)
+                    
+                    # Clean message: strip sandbox prefixes and normalize
+                    cleaned_message = strip_sandbox_prefix(message)
                 
-        except Exception as e:
-            logger.error(f"Error handling message from {phone_number}: {e}")
-            return MessageFormatter.error_message("Sorry, something went wrong. Please try again.")
+                # Log user action with cleaned message
+                log_user_action(phone_number, "message_received", cleaned_message[:50])
+                
+                # Detect intent from cleaned message
+                with tracer.start_as_current_span('detect_intent'):
+                    intent = detect_message_intent(cleaned_message)
+                step = intent
+                span.set_trace_attribute('intent', intent)
+                
+                # Registered users checking balance, address or history outside a
+                # conversation are served from their cached identity, without the users row
+                session = session_store.get(phone_number)
+                span.set_trace_attribute('session.state', session[0] if session else None)
+                identity = get_cached_user_identity(phone_number)
+                if identity and session is None and intent in IDENTITY_INTENTS:
+                    with tracer.start_as_current_span('handle_intent'):
+                        return self._handle_intent(identity, phone_number, cleaned_message, intent)
+                
+                # Get user
+                with tracer.start_as_current_span('db.get_user'):
+                    user = get_user_by_phone(phone_number)
+                if user:
+                    user.prime_session(session)
+                    remember_user_identity(user)
+                
+                # Handle based on current session state or intent
+                if user and user.current_session_state:
+                    # Timed by conversation step, since mid-conversation replies rarely match an intent
+                    step = user.current_session_state
+                    with tracer.start_as_current_span('handle_session_state'):
+                        return self._handle_session_state(user, cleaned_message, intent)
+                else:
+                    with tracer.start_as_current_span('handle_intent'):
+                        return self._handle_intent(user, phone_number, cleaned_message, intent)
+                    
+            except Exception as e:
+                logger.error(f"Error handling message from {phone_number}: {e}")
+                span.record_exception(e)
+                return MessageFormatter.error_message("Sorry, something went wrong. Please try again.")
+            finally:
+                MESSAGE_LATENCY.labels(step).observe(time.perf_counter() - started)
     
     def _handle_intent(self, user: Optional[User], phone_number: str, message: str, intent: str) -> str:
         """Handle message based on detected intent"""
@@ -62,10 +102,10 @@ class CommandHandler:
         if intent == 'confirm':
             if not user:
                 # User wants to start registration
-                return self._handle_registration_start(phone_number)
+                return self._handle_registration_start(user, phone_number)
             elif user and not user.is_kyc_completed:
                 # User exists but registration not complete - resume registration
-                return self._handle_registration_start(phone_number)
+                return self._handle_registration_start(user, phone_number)
             else:
                 # User is complete - this might be confirming something else
                 return MessageFormatter.error_message("Nothing to confirm right now. Try 'Help' for available commands.")
@@ -92,7 +132,7 @@ class CommandHandler:
                 return MessageFormatter.help_message()
             else:
                 # Try to resume registration
-                return self._handle_registration_start(phone_number)
+                return self._handle_registration_start(user, phone_number)
         
         # Handle help - always available
         elif intent == 'help':
@@ -135,19 +175,19 @@ class CommandHandler:
     def _handle_greeting(self, user: Optional[User], phone_number: str) -> str:
         """Handle greeting message"""
         if user and user.is_kyc_completed:
-            # Get balance for returning user
+            # Get balance for returning user; skip it rather than wait on a failing Bitnob
             balance = self._get_user_balance(user)
-            return f"👋 *Hello! Welcome back to SatChat.*\n\n💰 Your balance: {balance} BTC\n\nHow can I help you today?\n\nTry: Balance • Send • History • Address • Help"
+            balance_line = f"💰 Your balance: {balance} BTC\n\n" if balance is not None else ""
+            return f"👋 *Hello! Welcome back to SatChat.*\n\n{balance_line}How can I help you today?\n\nTry: Balance • Send • History • Address • Help"
         elif user and not user.is_kyc_completed:
             return f"👋 *Welcome back!*\n\nYour account setup is not complete. Reply *YES* to continue registration."
         else:
             return MessageFormatter.welcome_message()
     
-    def _handle_registration_start(self, phone_number: str) -> str:
+    def _handle_registration_start(self, existing_user: Optional[User], phone_number: str) -> str:
         """Start user registration process"""
         try:
-            # Check if user already exists
-            existing_user = get_user_by_phone(phone_number)
+            # The caller has already looked the user up
             if existing_user:
                 if existing_user.is_kyc_completed:
                     return "You already have an account! Use 'Balance' to check your Bitcoin balance."
@@ -159,6 +199,9 @@ class CommandHandler:
                     elif not existing_user.email:
                         existing_user.update_session('awaiting_email')
                         return "Please provide your email address:"
+                    else:
+                        # Details collected; resume the Bitnob steps that have not finished
+                        return self._complete_bitnob_registration(existing_user)
             
             # Create new user
             from models.user import create_user
@@ -228,7 +271,9 @@ class CommandHandler:
                 self.bitnob_service,
                 user.full_name,
                 user.email,
-                user.phone_number
+                user.phone_number,
+                progress=user.bitnob_progress,
+                on_progress=user.record_bitnob_progress
             )
             
             if not account_data:
@@ -282,6 +327,12 @@ class CommandHandler:
                     "Your account is temporarily locked. Please try again later."
                 )
             
+            # Fail fast while Bitnob transfers are failing
+            if not self.bitnob_service.is_available('transactions'):
+                return MessageFormatter.error_message(
+                    "Sending is temporarily unavailable. Please try again in a few minutes."
+                )
+            
             # Validate send command
             validation = validate_send_command(message)
             if not validation['valid']:
@@ -303,8 +354,12 @@ class CommandHandler:
                     "Unable to check your balance. Please try again."
                 )
             
-            # Estimate fee (simplified - you may want to call Bitnob API)
-            estimated_fee = 0.00001  # 1000 satoshis
+            # Estimate fee from the in-memory rates service, never a Bitnob round trip
+            estimated_fee = None
+            if self.rates_service:
+                estimated_fee = self.rates_service.estimate_fee(send_data['amount'])
+            if estimated_fee is None:
+                estimated_fee = DEFAULT_FEE_BTC
             
             balance_check = TransactionValidator.validate_balance_check(
                 current_balance, send_data['amount'], estimated_fee
@@ -362,7 +417,8 @@ class CommandHandler:
         try:
             if intent == 'confirm':
                 # Generate and send OTP
-                otp = self.otp_service.create_otp(user, OTPPurpose.TRANSACTION)
+                with tracer.start_as_current_span('otp.create'):
+                    otp = self.otp_service.create_otp(user, OTPPurpose.TRANSACTION)
                 
                 # Send OTP via WhatsApp
                 otp_result = self.twilio_service.send_otp(
@@ -424,9 +480,10 @@ class CommandHandler:
                 return f"❌ {otp_validation['error']}\n\nPlease enter the 6-digit code sent to your phone:"
             
             # Verify OTP
-            verification_result = self.otp_service.verify_otp(
-                user, otp_validation['code'], OTPPurpose.TRANSACTION
-            )
+            with tracer.start_as_current_span('otp.verify'):
+                verification_result = self.otp_service.verify_otp(
+                    user, otp_validation['code'], OTPPurpose.TRANSACTION
+                )
             
             if not verification_result[0]:  # OTP verification failed
                 error_msg = verification_result[1]
@@ -460,14 +517,16 @@ class CommandHandler:
             
             # Update transaction status
             transaction.status = TransactionStatus.PROCESSING
-            transaction.save()
+            # Commit before moving funds so the PROCESSING state survives a crash
+            transaction.save(commit=True)
             
             # Execute via Bitnob
             send_result = self.bitnob_service.send_bitcoin(
                 user.bitnob_wallet_id,
                 transaction.recipient_address,
                 float(transaction.amount),
-                f"SatChat transaction {transaction.reference_number}"
+                f"SatChat transaction {transaction.reference_number}",
+                reference=transaction.reference_number
             )
             
             if send_result.get('error'):
@@ -514,15 +573,22 @@ class CommandHandler:
                     "Your account is not fully set up. Please complete registration first."
                 )
             
-            balance = self._get_user_balance(user)
-            if balance is None:
+            balance_float, stale = self._lookup_balance(user)
+            if balance_float is None:
+                if not self.bitnob_service.is_available('wallets'):
+                    return MessageFormatter.error_message(
+                        "Balance checks are temporarily unavailable. Please try again in a few minutes."
+                    )
                 return MessageFormatter.error_message(
                     "Unable to retrieve balance. Please try again."
                 )
             
             log_user_action(user.phone_number, "balance_checked")
             
-            return MessageFormatter.balance_message(balance, user.bitcoin_address)
+            message = MessageFormatter.balance_message(format_bitcoin_amount(balance_float), user.bitcoin_address)
+            if stale:
+                message += "\n\n⚠️ We couldn't reach our Bitcoin provider, so this balance may be stale."
+            return message
             
         except Exception as e:
             logger.error(f"Balance check failed for {user.phone_number}: {e}")
@@ -600,24 +666,29 @@ Share this address to receive Bitcoin payments.
     
     def _get_user_balance_float(self, user: User) -> Optional[float]:
         """Get user balance as float"""
+        return self._lookup_balance(user)[0]
+    
+    def _lookup_balance(self, user: User) -> Tuple[Optional[float], bool]:
+        """Get user balance as (float, whether it may be stale)"""
         try:
             if not user.bitnob_wallet_id:
-                return 0.0
+                return 0.0, False
             
             balance_result = self.bitnob_service.get_wallet_balance(user.bitnob_wallet_id)
             
             if balance_result.get('error'):
                 logger.error(f"Failed to get balance for {user.phone_number}: {balance_result.get('message')}")
-                return None
+                return None, False
             
             balance_data = balance_result.get('data', {})
-            return float(balance_data.get('available', 0))
+            return float(balance_data.get('available', 0)), bool(balance_data.get('stale'))
             
         except Exception as e:
             logger.error(f"Balance retrieval failed for {user.phone_number}: {e}")
-            return None
+            return None, False
 
 # Factory function
-def create_command_handler(bitnob_service: BitnobService, twilio_service, otp_service: OTPService) -> CommandHandler:
+def create_command_handler(bitnob_service: BitnobService, twilio_service, otp_service: OTPService,
+                           rates_service: Optional[RatesService] = None) -> CommandHandler:
     """Create command handler instance"""
-    return CommandHandler(bitnob_service, twilio_service, otp_service)
\ No newline at end of file
+    return CommandHandler(bitnob_service, twilio_service, otp_service, rates_service)
\ No newline at end of file
@@ -76,8 +76,8 @@ class RegistrationHandler:
                     'user_id': user.id
                 }
             
-            elif not user.bitnob_customer_id:
-                # KYC data collected but Bitnob account not created
+            elif not user.is_kyc_completed:
+                # KYC data collected but Bitnob account not finished
                 return self._create_bitnob_account(user)
             
             else:
@@ -194,7 +194,9 @@ class RegistrationHandler:
                 self.bitnob_service,
                 user.full_name,
                 user.email,
-                user.phone_number
+                user.phone_number,
+                progress=user.bitnob_progress,
+                on_progress=user.record_bitnob_progress
             )
             
             if not account_data:
@@ -259,7 +261,7 @@ class RegistrationHandler:
                     'next_step': 'restart'
                 }
             
-            if user.bitnob_customer_id:
+            if user.is_kyc_completed:
                 return {
                     'success': True,
                     'message': "Your account is already set up!",
@@ -355,7 +357,7 @@ class RegistrationHandler:
                     'next_step': 'collect_email'
                 }
             
-            elif not user.bitnob_customer_id:
+            elif not user.is_kyc_completed:
                 return {
                     'status': 'creating_account',
                     'message': 'Creating your Bitcoin wallet...',
@@ -439,7 +441,7 @@ def get_next_registration_step(user: User) -> str:
     if not user.email:
         return 'collect_email'
     
-    if not user.bitnob_customer_id:
+    if not user.is_kyc_completed:
         return 'create_bitnob_account'
     
     if is_registration_complete(user):
@@ -459,7 +461,7 @@ def format_registration_progress(user: User) -> str:
         steps_completed += 1
     if user.email:
         steps_completed += 1
-    if user.bitnob_customer_id:
+    if user.is_kyc_completed:
         steps_completed += 1
     
     progress_bar = "█" * steps_completed + "░" * (total_steps - steps_completed)
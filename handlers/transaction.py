@@ -1,9 +1,11 @@
 from typing import Dict, Any, Optional, List
 import logging
 from datetime import datetime
+from sqlalchemy.orm import joinedload
 from models.user import User, Transaction, TransactionType, TransactionStatus, get_user_by_phone
 from services.bitnob_service import BitnobService
 from services.otp_service import OTPService, OTPPurpose
+from services.rates_service import RatesService, DEFAULT_FEE_BTC
 from services.twilio_service import TwilioService, MessageFormatter
 from utils.helpers import (
     generate_reference_number, format_bitcoin_amount, log_user_action,
@@ -16,10 +18,12 @@ logger = logging.getLogger(__name__)
 class TransactionHandler:
     """Handle Bitcoin transactions"""
     
-    def __init__(self, bitnob_service: BitnobService, twilio_service: TwilioService, otp_service: OTPService):
+    def __init__(self, bitnob_service: BitnobService, twilio_service: TwilioService, otp_service: OTPService,
+                 rates_service: Optional[RatesService] = None):
         self.bitnob_service = bitnob_service
         self.twilio_service = twilio_service
         self.otp_service = otp_service
+        self.rates_service = rates_service
     
     def initiate_send(self, user: User, recipient_address: str, amount: float, description: str = "") -> Dict[str, Any]:
         """Initiate Bitcoin send transaction"""
@@ -272,14 +276,16 @@ class TransactionHandler:
             
             # Update transaction status to processing
             transaction.status = TransactionStatus.PROCESSING
-            transaction.save()
+            # Commit before moving funds so the PROCESSING state survives a crash
+            transaction.save(commit=True)
             
             # Execute via Bitnob API
             send_result = self.bitnob_service.send_bitcoin(
                 user.bitnob_wallet_id,
                 transaction.recipient_address,
                 float(transaction.amount),
-                f"SatChat transaction {transaction.reference_number}"
+                f"SatChat transaction {transaction.reference_number}",
+                reference=transaction.reference_number
             )
             
             if send_result.get('error'):
@@ -535,19 +541,25 @@ class TransactionHandler:
     def _estimate_transaction_fee(self, amount: float) -> float:
         """Estimate transaction fee"""
         try:
+            # Served from memory once the rates service has fetched fee tiers
+            if self.rates_service:
+                fee = self.rates_service.estimate_fee(amount)
+                if fee is not None:
+                    return fee
+            
             # Try to get actual fee estimate from Bitnob
             fee_result = self.bitnob_service.estimate_fee(amount)
             
             if not fee_result.get('error'):
                 fee_data = fee_result.get('data', {})
-                return float(fee_data.get('fee', 0.00001))
+                return float(fee_data.get('fee', DEFAULT_FEE_BTC))
             
             # Fallback to fixed fee
-            return 0.00001  # 1000 satoshis
+            return DEFAULT_FEE_BTC
             
         except Exception as e:
             logger.error(f"Fee estimation failed: {e}")
-            return 0.00001  # Safe fallback
+            return DEFAULT_FEE_BTC  # Safe fallback
     
     def _get_user_balance(self, user: User) -> Optional[str]:
         """Get formatted user balance"""
@@ -622,6 +634,10 @@ def handle_bitnob_webhook(webhook_data: Dict[str, Any], bitnob_service: BitnobSe
         event_type = webhook_data.get('event')
         data = webhook_data.get('data', {})
         
+        # Balances changed upstream - drop the cached wallet list
+        if event_type in ('wallet.credited', 'transaction.completed'):
+            bitnob_service.invalidate_wallet_cache()
+        
         if event_type == 'transaction.completed':
             return _handle_transaction_completed_webhook(data)
         elif event_type == 'transaction.failed':
@@ -636,6 +652,12 @@ def handle_bitnob_webhook(webhook_data: Dict[str, Any], bitnob_service: BitnobSe
         logger.error(f"Webhook handling failed: {e}")
         return {'success': False, 'error': str(e)}
 
+def _get_transaction_with_user(bitnob_tx_id: str) -> Optional[Transaction]:
+    """Find a transaction by Bitnob ID, loading its user in the same query"""
+    return Transaction.query.options(joinedload(Transaction.user)).filter_by(
+        bitnob_transaction_id=bitnob_tx_id
+    ).first()
+
 def _handle_transaction_completed_webhook(data: Dict[str, Any]) -> Dict[str, Any]:
     """Handle transaction completed webhook"""
     try:
@@ -643,7 +665,7 @@ def _handle_transaction_completed_webhook(data: Dict[str, Any]) -> Dict[str, Any
         blockchain_hash = data.get('hash')
         
         # Find transaction by Bitnob ID
-        transaction = Transaction.query.filter_by(bitnob_transaction_id=bitnob_tx_id).first()
+        transaction = _get_transaction_with_user(bitnob_tx_id)
         
         if transaction:
             transaction.mark_completed(blockchain_hash)
@@ -663,7 +685,7 @@ def _handle_transaction_failed_webhook(data: Dict[str, Any]) -> Dict[str, Any]:
         failure_reason = data.get('failureReason', 'Transaction failed')
         
         # Find transaction by Bitnob ID
-        transaction = Transaction.query.filter_by(bitnob_transaction_id=bitnob_tx_id).first()
+        transaction = _get_transaction_with_user(bitnob_tx_id)
         
         if transaction:
             transaction.mark_failed(failure_reason)
@@ -708,6 +730,7 @@ def _handle_wallet_credited_webhook(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'success': False, 'error': str(e)}
 
 # Factory function
-def create_transaction_handler(bitnob_service: BitnobService, twilio_service: TwilioService, otp_service: OTPService) -> TransactionHandler:
+def create_transaction_handler(bitnob_service: BitnobService, twilio_service: TwilioService, otp_service: OTPService,
+                               rates_service: Optional[RatesService] = None) -> TransactionHandler:
     """Create transaction handler instance"""
-    return TransactionHandler(bitnob_service, twilio_service, otp_service)
\ No newline at end of file
+    return TransactionHandler(bitnob_service, twilio_service, otp_service, rates_service)
\ No newline at end of file
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Load test the WhatsApp conversation pipeline against local Bitnob and Twilio stand-ins
+
+Starts the Flask app on a local port with BITNOB_BASE_URL and TWILIO_API_BASE_URL
+pointed at in-process stub servers, then replays conversations through
+/webhook/twilio from concurrent virtual users and reports latency per step.
+
+Usage:
+    python load_test.py --users 20 --duration 30
+    python load_test.py --bitnob-latency-ms 150 --bitnob-error-rate 0.05
+    python load_test.py --mix balance=50,send=50 --max-p95-ms 500 --json report.json
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+RECIPIENT_ADDRESS = 'bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq'
+FIRST_NAMES = ['Amara', 'Kofi', 'Wanjiru', 'Tunde', 'Zola', 'Chidi', 'Nia', 'Baraka']
+LAST_NAMES = ['Okafor', 'Mensah', 'Kamau', 'Adeyemi', 'Dlamini', 'Otieno', 'Banda', 'Diallo']
+DEFAULT_MIX = 'balance=40,history=25,send=20,address=10,help=5'
+OTP_CODE_REGEX = re.compile(r'\*(\d{6})\*')
+MAX_REGISTRATION_ATTEMPTS = 3
+
+class StubServer:
+    """Local HTTP stand-in for an external API with latency and error injection"""
+
+    name = 'stub'
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.injected_errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+
+    def route(self, method: str, path: str, body: dict):
+        """Return (status, payload) for a request; override in subclasses"""
+        return 404, {'message': 'Not found'}
+
+    def _fault(self) -> bool:
+        """Sleep for the configured latency; return True to inject an error"""
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.injected_errors += 1
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        return failed
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self, method):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length).decode('utf-8') if length else ''
+
+                if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                    body = {key: values[0] for key, values in parse_qs(raw).items()}
+                else:
+                    body = json.loads(raw) if raw else {}
+
+                with stub._lock:
+                    stub.calls[f"{method} {parsed.path}"] += 1
+
+                if stub._fault():
+                    status, payload = 503, {'message': f'{stub.name} unavailable (injected)'}
+                else:
+                    status, payload = stub.route(method, parsed.path, body)
+
+                data = json.dumps(payload).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (timeout tests)
+                    pass
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+class BitnobStub(StubServer):
+    """Stand-in for the Bitnob endpoints used on the conversation path"""
+
+    name = 'Bitnob'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ids = Counter()
+        self.wallet = {
+            'id': 'wallet-btc-1',
+            'currency': 'BTC',
+            'type': 'bitcoin',
+            'balance': {'available': 10.0}
+        }
+
+    def _next_id(self, prefix: str) -> str:
+        with self._lock:
+            self._ids[prefix] += 1
+            return f"{prefix}_{self._ids[prefix]}"
+
+    def route(self, method, path, body):
+        if method == 'POST' and path == '/api/v1/customers':
+            return 200, {'data': {'id': self._next_id('cus'), 'email': body.get('email')}}
+        if method == 'GET' and path == '/api/v1/wallets':
+            return 200, {'data': [self.wallet]}
+        if method == 'POST' and path == '/api/v1/addresses/generate':
+            address_id = self._next_id('addr')
+            return 200, {'data': {'id': address_id, 'address': f"bc1q{address_id.replace('_', '').ljust(38, 'q')}"}}
+        if method == 'POST' and path == '/api/v1/transactions/send':
+            return 200, {'data': {'id': self._next_id('tx'), 'status': 'pending'}}
+        if method == 'GET' and path.startswith('/api/v1/transactions/'):
+            return 200, {'data': {'id': path.rsplit('/', 1)[-1], 'status': 'completed'}}
+        if method == 'POST' and path == '/api/v1/transactions/estimate-fee':
+            return 200, {'data': {'fee': '0.00001'}}
+        if method == 'GET' and path == '/api/v1/rates':
+            return 200, {'data': {'rate': 65000}}
+        return super().route(method, path, body)
+
+class TwilioStub(StubServer):
+    """Stand-in for the Twilio Messages API that remembers the OTP sent to each number"""
+
+    name = 'Twilio'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sent = Counter()
+        self._otp_codes = {}
+
+    def route(self, method, path, body):
+        if method == 'POST' and path.endswith('/Messages.json'):
+            to_number = body.get('To', '').replace('whatsapp:', '')
+            match = OTP_CODE_REGEX.search(body.get('Body', ''))
+            with self._lock:
+                self._sent[to_number] += 1
+                if match:
+                    self._otp_codes[to_number] = match.group(1)
+            return 201, {
+                'sid': f"SM{abs(hash((to_number, self._sent[to_number]))):032x}"[:34],
+                'status': 'queued',
+                'to': body.get('To'),
+                'from': body.get('From'),
+                'body': body.get('Body')
+            }
+        return super().route(method, path, body)
+
+    def latest_otp(self, phone_number: str):
+        with self._lock:
+            return self._otp_codes.pop(phone_number, None)
+
+class Recorder:
+    """Thread-safe collection of per-step latencies"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = Counter()
+        self.unexpected = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, label: str, seconds: float, ok: bool, expected: bool):
+        with self._lock:
+            self.samples[label].append(seconds)
+            if not ok:
+                self.errors[label] += 1
+            elif not expected:
+                self.unexpected[label] += 1
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+class VirtualUser:
+    """One WhatsApp user replaying conversations through /webhook/twilio"""
+
+    def __init__(self, index: int, webhook_url: str, twilio_stub: TwilioStub, recorder: Recorder, rng: random.Random):
+        self.index = index
+        self.phone_number = f"+2348{index:09d}"
+        self.webhook_url = webhook_url
+        self.twilio_stub = twilio_stub
+        self.recorder = recorder
+        self.rng = rng
+        self.session = requests.Session()
+        self.registered = False
+        self.registration_attempts = 0
+        self._message_count = 0
+
+    def say(self, label: str, body: str, expect: str = None) -> str:
+        """Post one inbound message and record its latency; return the reply text"""
+        self._message_count += 1
+        data = {
+            'From': f"whatsapp:{self.phone_number}",
+            'To': 'whatsapp:+14155238886',
+            'Body': body,
+            'MessageSid': f"SMload{self.index:06d}{self._message_count:08d}"
+        }
+
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.webhook_url, data=data, timeout=60)
+            reply = response.text
+            ok = response.status_code == 200 and 'something went wrong' not in reply.lower()
+        except requests.RequestException as e:
+            reply = str(e)
+            ok = False
+        elapsed = time.perf_counter() - started
+
+        expected = expect is None or expect in reply
+        self.recorder.record(label, elapsed, ok, expected)
+        return reply if ok and expected else None
+
+    @property
+    def gave_up(self) -> bool:
+        return not self.registered and self.registration_attempts >= MAX_REGISTRATION_ATTEMPTS
+
+    def register(self):
+        self.registration_attempts += 1
+        self.say('greeting', 'Hi')
+        if self.say('registration', 'YES', expect='full name') is None:
+            return
+        name = f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+        if self.say('registration', name, expect='email') is None:
+            self.say('cancel', 'CANCEL')
+            return
+        if self.say('registration', f"loaduser{self.index}@example.com", expect='Account Created') is not None:
+            self.registered = True
+
+    def send_with_otp(self):
+        amount = self.rng.choice(['0.0001', '0.00025', '0.0005'])
+        if self.say('send', f"Send {amount} BTC to {RECIPIENT_ADDRESS}", expect='Transaction Confirmation') is None:
+            return
+        if self.say('confirm', 'YES', expect='Security Verification') is None:
+            return
+
+        code = self.twilio_stub.latest_otp(self.phone_number)
+        if not code:
+            self.say('cancel', 'CANCEL')
+            return
+        self.say('otp', code, expect='Transaction Successful')
+
+    def run_scenario(self, scenario: str):
+        if not self.registered:
+            self.register()
+        elif scenario == 'send':
+            self.send_with_otp()
+        elif scenario == 'balance':
+            self.say('balance', 'Balance', expect='Balance')
+        elif scenario == 'history':
+            self.say('history', 'transactions', expect='Transaction History')
+        elif scenario == 'address':
+            self.say('address', 'address', expect='Bitcoin Address')
+        elif scenario == 'help':
+            self.say('help', 'help')
+
+def parse_mix(mix: str):
+    """Parse 'balance=40,send=20' into (scenarios, weights)"""
+    scenarios, weights = [], []
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        scenarios.append(name.strip())
+        weights.append(float(weight or 1))
+    return scenarios, weights
+
+def start_app(bitnob_url: str, twilio_url: str, workdir: str):
+    """Import the app against the stand-ins and serve it on a local port"""
+    os.environ.update({
+        'ENVIRONMENT': 'development',
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'load_test.db')}",
+        'BITNOB_API_KEY': 'load-test-key',
+        'BITNOB_SECRET_KEY': 'load-test-secret',
+        'BITNOB_BASE_URL': bitnob_url,
+        'TWILIO_ACCOUNT_SID': 'AC00000000000000000000000000000000',
+        'TWILIO_AUTH_TOKEN': 'load-test-token',
+        'TWILIO_PHONE_NUMBER': '+14155238886',
+        'TWILIO_API_BASE_URL': twilio_url,
+        'RATE_LIMIT_PER_MINUTE': '1000000',
+        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'ERROR')
+    })
+
+    import logging
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/webhook/twilio"
+
+def build_report(recorder: Recorder, wall_seconds: float, bitnob: BitnobStub, twilio: TwilioStub) -> dict:
+    steps = {}
+    all_samples = []
+    for label in sorted(recorder.samples):
+        samples = sorted(recorder.samples[label])
+        all_samples.extend(samples)
+        steps[label] = {
+            'count': len(samples),
+            'errors': recorder.errors[label],
+            'unexpected': recorder.unexpected[label],
+            'p50_ms': round(percentile(samples, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(samples, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(samples, 0.99) * 1000, 1),
+            'max_ms': round(samples[-1] * 1000, 1),
+            'throughput_rps': round(len(samples) / wall_seconds, 2)
+        }
+
+    all_samples.sort()
+    return {
+        'wall_seconds': round(wall_seconds, 2),
+        'total': {
+            'count': len(all_samples),
+            'errors': sum(recorder.errors.values()),
+            'p50_ms': round(percentile(all_samples, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(all_samples, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(all_samples, 0.99) * 1000, 1),
+            'throughput_rps': round(len(all_samples) / wall_seconds, 2)
+        },
+        'steps': steps,
+        'bitnob_calls': dict(bitnob.calls),
+        'bitnob_injected_errors': bitnob.injected_errors,
+        'twilio_calls': sum(twilio.calls.values()),
+        'twilio_injected_errors': twilio.injected_errors
+    }
+
+def print_report(report: dict):
+    print(f"\n{'step':<14}{'count':>7}{'errors':>8}{'unexp':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'req/s':>8}")
+    for label, stats in report['steps'].items():
+        print(f"{label:<14}{stats['count']:>7}{stats['errors']:>8}{stats['unexpected']:>7}"
+              f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['max_ms']:>9}{stats['throughput_rps']:>8}")
+    total = report['total']
+    print(f"{'TOTAL':<14}{total['count']:>7}{total['errors']:>8}{'':>7}"
+          f"{total['p50_ms']:>9}{total['p95_ms']:>9}{total['p99_ms']:>9}{'':>9}{total['throughput_rps']:>8}")
+    print(f"\nWall time: {report['wall_seconds']}s")
+    print(f"Users that never registered: {report['users_not_registered']}")
+    print(f"Bitnob calls: {sum(report['bitnob_calls'].values())} ({report['bitnob_injected_errors']} injected errors)")
+    print(f"Twilio calls: {report['twilio_calls']} ({report['twilio_injected_errors']} injected errors)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the /webhook/twilio conversation pipeline')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds to run after registration')
+    parser.add_argument('--iterations', type=int, default=None, help='Scenarios per user (overrides --duration)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Scenario weights, e.g. balance=40,send=20')
+    parser.add_argument('--bitnob-latency-ms', type=float, default=50)
+    parser.add_argument('--bitnob-jitter-ms', type=float, default=20)
+    parser.add_argument('--bitnob-error-rate', type=float, default=0.0)
+    parser.add_argument('--twilio-latency-ms', type=float, default=80)
+    parser.add_argument('--twilio-jitter-ms', type=float, default=30)
+    parser.add_argument('--twilio-error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', dest='json_path', help='Also write the report to this file')
+    parser.add_argument('--max-p95-ms', type=float, default=None, help='Exit 1 if any step p95 exceeds this')
+    args = parser.parse_args()
+
+    scenarios, weights = parse_mix(args.mix)
+
+    bitnob = BitnobStub(args.bitnob_latency_ms, args.bitnob_jitter_ms, args.bitnob_error_rate, seed=args.seed).start()
+    twilio = TwilioStub(args.twilio_latency_ms, args.twilio_jitter_ms, args.twilio_error_rate, seed=args.seed + 1).start()
+    workdir = tempfile.mkdtemp(prefix='satspay-load-')
+    server, webhook_url = start_app(bitnob.url, twilio.url, workdir)
+
+    print(f"🧪 Load testing {webhook_url} with {args.users} users (mix: {args.mix})")
+    print(f"   Bitnob stub {bitnob.url}: {args.bitnob_latency_ms}ms ±{args.bitnob_jitter_ms}, {args.bitnob_error_rate:.0%} errors")
+    print(f"   Twilio stub {twilio.url}: {args.twilio_latency_ms}ms ±{args.twilio_jitter_ms}, {args.twilio_error_rate:.0%} errors")
+
+    recorder = Recorder()
+    users = [
+        VirtualUser(i, webhook_url, twilio, recorder, random.Random(args.seed * 1000 + i))
+        for i in range(args.users)
+    ]
+
+    def run_user(user: VirtualUser):
+        user.register()
+        deadline = time.monotonic() + args.duration
+        done = 0
+        while (done < args.iterations) if args.iterations is not None else (time.monotonic() < deadline):
+            if user.gave_up:
+                break
+            user.run_scenario(user.rng.choices(scenarios, weights)[0])
+            done += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as executor:
+        list(executor.map(run_user, users))
+    wall_seconds = time.perf_counter() - started
+
+    server.shutdown()
+    bitnob.stop()
+    twilio.stop()
+
+    report = build_report(recorder, wall_seconds, bitnob, twilio)
+    report['users_not_registered'] = sum(1 for user in users if not user.registered)
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json_path}")
+
+    if args.max_p95_ms is not None:
+        slow = {label: stats['p95_ms'] for label, stats in report['steps'].items() if stats['p95_ms'] > args.max_p95_ms}
+        if slow:
+            print(f"\n❌ p95 above {args.max_p95_ms}ms: {slow}")
+            sys.exit(1)
+        print(f"\n✅ All steps within p95 {args.max_p95_ms}ms")
+
+if __name__ == '__main__':
+    main()
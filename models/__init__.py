@@ -1,9 +1,12 @@
 # Models package
 from .database import db, init_db, BaseModel
 from .user import User, Transaction, OTP, UserStatus, TransactionStatus, TransactionType
+from .rate_limit import RateLimitCounter
+from .session import ConversationSession
+from .stats import StatsCounter
 
 __all__ = [
     'db', 'init_db', 'BaseModel',
-    'User', 'Transaction', 'OTP',
+    'User', 'Transaction', 'OTP', 'RateLimitCounter', 'ConversationSession', 'StatsCounter',
     'UserStatus', 'TransactionStatus', 'TransactionType'
 ]
\ No newline at end of file
@@ -1,6 +1,13 @@
+from flask import g, got_request_exception, has_app_context, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
+from contextlib import contextmanager
 from datetime import datetime
 import uuid
+import logging
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
 
 db = SQLAlchemy()
 
@@ -10,11 +17,127 @@ def init_db(app):
     
     with app.app_context():
         db.create_all()
+        ensure_indexes()
+    
+    # Each request runs as a single unit of work committed once at the end
+    app.before_request(begin_unit_of_work)
+    app.after_request(_commit_request_unit_of_work)
+    app.teardown_request(_end_request_unit_of_work)
+    # Flask still runs after_request for the 500 reply to an unhandled error, so roll back first
+    got_request_exception.connect(_end_request_unit_of_work, app)
+
+def ensure_indexes():
+    """Create model indexes that are missing from existing tables
+
+    db.create_all() skips tables that already exist, so indexes added to a
+    model later are created here instead.
+    """
+    inspector = inspect(db.engine)
+    
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info(f"Creating missing index {index.name} on {table.name}")
+                try:
+                    index.create(bind=db.engine)
+                except Exception as e:
+                    # Another worker may have created it first
+                    logger.warning(f"Could not create index {index.name}: {e}")
 
 def get_uuid():
     """Generate a unique UUID string"""
     return str(uuid.uuid4())
 
+def in_unit_of_work():
+    """Check if commits are currently deferred to the end of a unit of work"""
+    return has_app_context() and g.get('unit_of_work_depth', 0) > 0
+
+def begin_unit_of_work():
+    """Start deferring commits until the unit of work ends"""
+    g.unit_of_work_depth = g.get('unit_of_work_depth', 0) + 1
+
+def end_unit_of_work(success=True):
+    """End a unit of work, committing or rolling back when the outermost one ends"""
+    g.unit_of_work_depth = g.get('unit_of_work_depth', 1) - 1
+    if g.unit_of_work_depth > 0:
+        return
+    
+    if success:
+        try:
+            with tracer.start_as_current_span('db.commit'):
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    else:
+        db.session.rollback()
+
+def commit_unit_of_work():
+    """Commit the open unit of work now, so a reply is only built once its changes are saved
+
+    The unit of work stays open, so later changes are still deferred to its end.
+    On failure the session is rolled back and the error raised.
+    """
+    try:
+        with tracer.start_as_current_span('db.commit'):
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+@contextmanager
+def unit_of_work():
+    """Run a block as one database transaction"""
+    begin_unit_of_work()
+    try:
+        yield
+    except Exception:
+        end_unit_of_work(success=False)
+        raise
+    end_unit_of_work()
+
+def commit_session(commit=None):
+    """Commit pending changes, or only flush them while a unit of work is open
+
+    commit=True forces a commit and commit=False forces a flush.
+    """
+    if commit is None:
+        commit = not in_unit_of_work()
+    
+    with tracer.start_as_current_span('db.commit' if commit else 'db.flush'):
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+
+def _commit_request_unit_of_work(response):
+    if in_unit_of_work():
+        try:
+            end_unit_of_work()
+        except Exception as e:
+            # The body was rendered as if the changes were saved, so it must not be sent
+            logger.error(f"Request commit failed: {e}")
+            return _commit_failed_response(response)
+    return response
+
+def _commit_failed_response(response):
+    if response.is_json:
+        failed = jsonify({'error': 'Internal server error'})
+    else:
+        failed = response.__class__('Internal server error', mimetype='text/plain')
+    failed.status_code = 500
+    return failed
+
+def _end_request_unit_of_work(sender=None, error=None, **extra):
+    # The request failed, so nothing it changed is committed
+    if in_unit_of_work():
+        g.unit_of_work_depth = 1
+        end_unit_of_work(success=False)
+
 class BaseModel(db.Model):
     """Base model with common fields"""
     __abstract__ = True
@@ -23,16 +146,20 @@ class BaseModel(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def save(self):
-        """Save instance to database"""
+    def save(self, commit=None):
+        """Save instance to database
+
+        Inside a unit of work the commit is deferred to the end of the unit;
+        pass commit=True to commit now or commit=False to only flush.
+        """
         db.session.add(self)
-        db.session.commit()
+        commit_session(commit)
         return self
     
-    def delete(self):
+    def delete(self, commit=None):
         """Delete instance from database"""
         db.session.delete(self)
-        db.session.commit()
+        commit_session(commit)
     
     def to_dict(self):
         """Convert model instance to dictionary"""
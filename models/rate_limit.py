@@ -0,0 +1,14 @@
+from .database import db
+
+class RateLimitCounter(db.Model):
+    """Sliding-window rate limit counter shared across workers and hosts"""
+    __tablename__ = 'rate_limits'
+
+    key = db.Column(db.String(255), primary_key=True)
+    window = db.Column(db.BigInteger, nullable=False)
+    current = db.Column(db.Integer, nullable=False)
+    previous = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<RateLimitCounter {self.key}>'
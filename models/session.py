@@ -0,0 +1,13 @@
+from .database import db
+
+class ConversationSession(db.Model):
+    """Expiring conversation state for one phone number, kept off the users table"""
+    __tablename__ = 'conversation_sessions'
+
+    key = db.Column(db.String(255), primary_key=True)
+    state = db.Column(db.String(50), nullable=False)
+    data = db.Column(db.Text, nullable=True)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ConversationSession {self.key} {self.state}>'
@@ -0,0 +1,185 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from decimal import Decimal
+import logging
+from sqlalchemy import case, event, func, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from .database import commit_session, db
+from .user import User, Transaction, TransactionStatus, TransactionType
+
+logger = logging.getLogger(__name__)
+
+SATOSHIS_PER_BTC = 100_000_000
+
+class StatsCounter(db.Model):
+    """Running total behind /api/stats, kept up to date as users and transactions are written"""
+    __tablename__ = 'stats_counters'
+
+    name = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<StatsCounter {self.name}={self.value}>'
+
+def _previous(row, attribute):
+    """Value of an attribute before the changes being flushed"""
+    history = inspect(row).attrs[attribute].history
+    return history.deleted[0] if history.deleted else getattr(row, attribute)
+
+def _user_counts(is_kyc_completed):
+    return {'users': 1, 'users.kyc_completed': 1 if is_kyc_completed else 0}
+
+def _transaction_counts(status, transaction_type, amount, created_at):
+    counts = {
+        'transactions': 1,
+        f'transactions.status.{status.value}': 1,
+        f'transactions.type.{transaction_type.value}': 1,
+    }
+    # Daily volume is completed transactions by the day they were created
+    if status == TransactionStatus.COMPLETED:
+        day = created_at.date().isoformat()
+        counts[f'volume.{day}.count'] = 1
+        counts[f'volume.{day}.sats'] = int(round(Decimal(str(amount)) * SATOSHIS_PER_BTC))
+    return counts
+
+def _counts_of(row, value=getattr):
+    if isinstance(row, User):
+        return _user_counts(value(row, 'is_kyc_completed'))
+    return _transaction_counts(
+        value(row, 'status'), value(row, 'transaction_type'), value(row, 'amount'), value(row, 'created_at')
+    )
+
+def _record(row, new=None, old=None):
+    deltas = inspect(row).session.info.setdefault('stats_deltas', Counter())
+    for name, count in (new or {}).items():
+        deltas[name] += count
+    for name, count in (old or {}).items():
+        deltas[name] -= count
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(Transaction, 'after_insert')
+def _count_inserted(mapper, connection, row):
+    _record(row, new=_counts_of(row))
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(Transaction, 'after_update')
+def _count_updated(mapper, connection, row):
+    _record(row, new=_counts_of(row), old=_counts_of(row, _previous))
+
+@event.listens_for(User, 'after_delete')
+@event.listens_for(Transaction, 'after_delete')
+def _count_deleted(mapper, connection, row):
+    _record(row, old=_counts_of(row, _previous))
+
+@event.listens_for(db.session, 'before_commit')
+def _apply_stats_deltas(session):
+    # Flush first so every change in this transaction is counted, then add the
+    # deltas last so the counter rows are only locked for the commit itself
+    session.flush()
+    deltas = session.info.pop('stats_deltas', None)
+    if deltas:
+        increment_counters(session, {name: delta for name, delta in deltas.items() if delta})
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_stats(session):
+    session.info.pop('stats_deltas', None)
+
+def increment_counters(session, deltas):
+    """Add deltas to the named counters, creating missing ones"""
+    table = StatsCounter.__table__
+    dialect = session.get_bind().dialect.name
+
+    for name, delta in sorted(deltas.items()):
+        if dialect in ('sqlite', 'postgresql'):
+            insert = (sqlite if dialect == 'sqlite' else postgresql).insert(table)
+            session.execute(insert.values(name=name, value=delta).on_conflict_do_update(
+                index_elements=[table.c.name], set_={'value': table.c.value + delta}
+            ))
+            continue
+
+        result = session.execute(table.update().where(table.c.name == name).values(value=table.c.value + delta))
+        if result.rowcount == 0:
+            session.execute(table.insert().values(name=name, value=delta))
+
+def rebuild_stats_counters():
+    """Recompute every counter from the users and transactions tables; returns the number of counters"""
+    counts = Counter()
+
+    total, completed = db.session.query(
+        func.count(User.id), func.count(case((User.is_kyc_completed == True, 1)))
+    ).one()
+    counts.update({'users': total, 'users.kyc_completed': completed})
+
+    rows = db.session.query(
+        Transaction.status, Transaction.transaction_type, func.count(Transaction.id)
+    ).group_by(Transaction.status, Transaction.transaction_type)
+    for status, transaction_type, count in rows:
+        counts['transactions'] += count
+        counts[f'transactions.status.{status.value}'] += count
+        counts[f'transactions.type.{transaction_type.value}'] += count
+
+    day = func.date(Transaction.created_at)
+    rows = db.session.query(day, func.count(Transaction.id), func.sum(Transaction.amount)).filter(
+        Transaction.status == TransactionStatus.COMPLETED
+    ).group_by(day)
+    for created_on, count, amount in rows:
+        created_on = created_on if isinstance(created_on, str) else created_on.isoformat()
+        counts[f'volume.{created_on}.count'] = count
+        counts[f'volume.{created_on}.sats'] = int(round(Decimal(str(amount or 0)) * SATOSHIS_PER_BTC))
+
+    db.session.query(StatsCounter).delete()
+    db.session.add_all(StatsCounter(name=name, value=value) for name, value in counts.items())
+    db.session.info.pop('stats_deltas', None)
+    commit_session()
+
+    logger.info(f"Rebuilt {len(counts)} stats counters")
+    return len(counts)
+
+def ensure_stats_counters():
+    """Build the counters once for a database that has none yet
+
+    Workers starting together on a fresh database can race to build them; the
+    one whose rows conflict rolls back and keeps the other's.
+    """
+    if StatsCounter.query.first() is not None:
+        return
+
+    try:
+        rebuild_stats_counters()
+    except IntegrityError:
+        db.session.rollback()
+        logger.info("Stats counters were built by another worker")
+
+def get_stats_summary(volume_days=30, today=None):
+    """Read the stats counters: a single primary-key lookup whatever the table sizes"""
+    today = today or datetime.utcnow().date()
+    days = [(today - timedelta(days=offset)).isoformat() for offset in range(volume_days)]
+
+    names = ['users', 'users.kyc_completed', 'transactions']
+    names += [f'transactions.status.{status.value}' for status in TransactionStatus]
+    names += [f'transactions.type.{transaction_type.value}' for transaction_type in TransactionType]
+    names += [f'volume.{day}.{part}' for day in days for part in ('count', 'sats')]
+
+    values = dict(db.session.query(StatsCounter.name, StatsCounter.value).filter(StatsCounter.name.in_(names)))
+
+    return {
+        'total_users': values.get('users', 0),
+        'active_users': values.get('users.kyc_completed', 0),
+        'total_transactions': values.get('transactions', 0),
+        'transactions_by_status': {
+            status.value: values.get(f'transactions.status.{status.value}', 0) for status in TransactionStatus
+        },
+        'transactions_by_type': {
+            transaction_type.value: values.get(f'transactions.type.{transaction_type.value}', 0)
+            for transaction_type in TransactionType
+        },
+        'daily_volume': [
+            {
+                'date': day,
+                'count': values.get(f'volume.{day}.count', 0),
+                'amount': values.get(f'volume.{day}.sats', 0) / SATOSHIS_PER_BTC
+            }
+            for day in days
+        ]
+    }
@@ -1,5 +1,10 @@
 from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from sqlalchemy import event, and_, or_
+from sqlalchemy.orm import object_session
 from .database import db, BaseModel
+from utils.cache import TTLCache
+from utils.session_store import session_store
 import enum
 
 class UserStatus(enum.Enum):
@@ -31,11 +36,12 @@ class User(BaseModel):
     
     # Account status
     status = db.Column(db.Enum(UserStatus), default=UserStatus.PENDING, nullable=False)
-    is_kyc_completed = db.Column(db.Boolean, default=False)
+    # active_history loads the old value before an overwrite, for the stats counters
+    is_kyc_completed = db.column_property(db.Column(db.Boolean, default=False), active_history=True)
     
     # Bitnob integration
     bitnob_customer_id = db.Column(db.String(100), nullable=True)
-    bitnob_wallet_id = db.Column(db.String(100), nullable=True)
+    bitnob_wallet_id = db.Column(db.String(100), nullable=True, index=True)
     bitcoin_address = db.Column(db.String(100), nullable=True)
     
     # Security
@@ -44,9 +50,7 @@ class User(BaseModel):
     is_locked = db.Column(db.Boolean, default=False)
     locked_until = db.Column(db.DateTime, nullable=True)
     
-    # Session management
-    current_session_state = db.Column(db.String(50), nullable=True)
-    session_data = db.Column(db.Text, nullable=True)  # JSON string
+    # Conversation state lives in the session store (see current_session_state)
     last_activity = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -91,28 +95,73 @@ class User(BaseModel):
         self.last_failed_otp = None
         self.save()
     
+    @property
+    def _conversation_session(self):
+        # Read from the session store once per instance
+        session = self.__dict__.get('_session_cache')
+        if session is None:
+            session = session_store.get(self.phone_number) or (None, None)
+            self._session_cache = session
+        return session
+    
+    def prime_session(self, session):
+        """Use a (state, data) already read from the session store instead of reading it again"""
+        self._session_cache = session or (None, None)
+    
+    @property
+    def current_session_state(self):
+        """Current conversation step, e.g. 'awaiting_otp', or None"""
+        return self._conversation_session[0]
+    
+    @property
+    def session_data(self):
+        """JSON data saved with the current conversation step"""
+        return self._conversation_session[1]
+    
     def update_session(self, state, data=None):
         """Update user session state"""
-        self.current_session_state = state
-        self.session_data = data
-        self.last_activity = datetime.utcnow()
-        self.save()
+        session_store.set(self.phone_number, state, data)
+        self._session_cache = (state, data)
     
     def clear_session(self):
         """Clear user session"""
-        self.current_session_state = None
-        self.session_data = None
+        session_store.delete(self.phone_number)
+        self._session_cache = (None, None)
+    
+    @property
+    def bitnob_progress(self):
+        """Bitnob account steps already finished for this user"""
+        return {
+            'customer_id': self.bitnob_customer_id,
+            'wallet_id': self.bitnob_wallet_id,
+            'bitcoin_address': self.bitcoin_address
+        }
+    
+    def record_bitnob_progress(self, customer_id=None, wallet_id=None, bitcoin_address=None):
+        """Save a finished Bitnob account step so a retry can resume from it"""
+        if customer_id:
+            self.bitnob_customer_id = customer_id
+        if wallet_id:
+            self.bitnob_wallet_id = wallet_id
+        if bitcoin_address:
+            self.bitcoin_address = bitcoin_address
         self.save()
 
 class Transaction(BaseModel):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Per-user history, newest first, with id as the keyset pagination tiebreaker
+        db.Index('ix_transactions_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        # Reconciler scan of stale unsettled transactions
+        db.Index('ix_transactions_status_created_at', 'status', 'created_at'),
+    )
     
     # User relationship
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
     
     # Transaction details
-    transaction_type = db.Column(db.Enum(TransactionType), nullable=False)
-    amount = db.Column(db.Numeric(precision=18, scale=8), nullable=False)
+    transaction_type = db.column_property(db.Column(db.Enum(TransactionType), nullable=False), active_history=True)
+    amount = db.column_property(db.Column(db.Numeric(precision=18, scale=8), nullable=False), active_history=True)
     currency = db.Column(db.String(10), default='BTC', nullable=False)
     
     # Recipient/Sender details
@@ -121,8 +170,9 @@ class Transaction(BaseModel):
     sender_address = db.Column(db.String(100), nullable=True)
     
     # Transaction status and tracking
-    status = db.Column(db.Enum(TransactionStatus), default=TransactionStatus.PENDING)
-    bitnob_transaction_id = db.Column(db.String(100), nullable=True)
+    status = db.column_property(db.Column(db.Enum(TransactionStatus), default=TransactionStatus.PENDING),
+                               active_history=True)
+    bitnob_transaction_id = db.Column(db.String(100), nullable=True, index=True)
     blockchain_hash = db.Column(db.String(100), nullable=True)
     reference_number = db.Column(db.String(50), nullable=False, unique=True)
     
@@ -138,23 +188,44 @@ class Transaction(BaseModel):
     def __repr__(self):
         return f'<Transaction {self.reference_number}>'
     
-    def mark_completed(self, blockchain_hash=None):
+    def to_api_dict(self):
+        """Convert to the shape returned by the transactions API"""
+        return {
+            'id': self.id,
+            'type': self.transaction_type.value,
+            'status': self.status.value if self.status else None,
+            'amount': float(self.amount),
+            'currency': self.currency,
+            'fee': float(self.fee) if self.fee is not None else None,
+            'reference': self.reference_number,
+            'recipient_address': self.recipient_address,
+            'sender_address': self.sender_address,
+            'blockchain_hash': self.blockchain_hash,
+            'created_at': self.created_at.isoformat(),
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+    
+    def mark_completed(self, blockchain_hash=None, commit=None):
         """Mark transaction as completed"""
         self.status = TransactionStatus.COMPLETED
         self.completed_at = datetime.utcnow()
         if blockchain_hash:
             self.blockchain_hash = blockchain_hash
-        self.save()
+        self.save(commit)
     
-    def mark_failed(self, reason=None):
+    def mark_failed(self, reason=None, commit=None):
         """Mark transaction as failed"""
         self.status = TransactionStatus.FAILED
         if reason:
             self.description = f"{self.description or ''}\nFailure reason: {reason}"
-        self.save()
+        self.save(commit)
 
 class OTP(BaseModel):
     __tablename__ = 'otps'
+    __table_args__ = (
+        # Latest unused OTP for a user and purpose
+        db.Index('ix_otps_user_purpose_used_created', 'user_id', 'purpose', 'is_used', 'created_at'),
+    )
     
     # User relationship
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
@@ -167,14 +238,15 @@ class OTP(BaseModel):
     max_attempts = db.Column(db.Integer, default=3)
     
     # Expiry
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Periodic expiry sweep
     
     # Related transaction (if applicable)
     transaction_id = db.Column(db.String(36), db.ForeignKey('transactions.id'), nullable=True)
     transaction = db.relationship('Transaction', backref='otps')
     
     def __repr__(self):
-        return f'<OTP {self.code} for {self.user.phone_number}>'
+        # Only this row's columns: no lazy load of the user, and no code in logs
+        return f'<OTP {self.purpose} for user {self.user_id}>'
     
     @property
     def is_expired(self):
@@ -201,11 +273,84 @@ class OTP(BaseModel):
         
         return False
 
+class UserIdentity(NamedTuple):
+    """Fields of a registered user that do not change, safe to share between requests"""
+    id: str
+    phone_number: str
+    bitnob_wallet_id: Optional[str]
+    bitcoin_address: Optional[str]
+    is_kyc_completed: bool
+
+# Per-process identities of registered users, keyed by normalized phone number.
+# Only completed registrations are cached, so entries cannot go stale in another worker.
+user_identity_cache = TTLCache(ttl_seconds=60, max_size=10000)
+
+def configure_user_identity_cache(ttl_seconds, max_size=10000):
+    """Set how long and how many identities are kept"""
+    user_identity_cache.ttl_seconds = ttl_seconds
+    user_identity_cache.max_size = max_size
+    user_identity_cache.clear()
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user_identity(mapper, connection, user):
+    user_identity_cache.invalidate(user.phone_number)
+    # Invalidate again once committed, in case a reader cached the old row in between
+    object_session(user).info.setdefault('changed_phone_numbers', set()).add(user.phone_number)
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed_user_identities(session):
+    for phone_number in session.info.pop('changed_phone_numbers', ()):
+        user_identity_cache.invalidate(phone_number)
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_user_changes(session):
+    session.info.pop('changed_phone_numbers', None)
+
 # Utility functions
 def get_user_by_phone(phone_number):
     """Get user by phone number"""
     return User.query.filter_by(phone_number=phone_number).first()
 
+def _identity_of(user):
+    return UserIdentity(user.id, user.phone_number, user.bitnob_wallet_id,
+                        user.bitcoin_address, bool(user.is_kyc_completed))
+
+def get_user_identity(phone_number):
+    """Get a user's identity by phone number, from cache once they have registered"""
+    def load():
+        user = get_user_by_phone(phone_number)
+        return _identity_of(user) if user else None
+    
+    return user_identity_cache.get_or_load(
+        phone_number, load, cache_if=lambda identity: identity is not None and identity.is_kyc_completed
+    )
+
+def get_cached_user_identity(phone_number):
+    """Get a registered user's identity only if it is already cached; never queries"""
+    return user_identity_cache.get(phone_number)
+
+def remember_user_identity(user):
+    """Cache the identity of a registered user whose row was just loaded"""
+    if user is not None and user.is_kyc_completed:
+        user_identity_cache.set(user.phone_number, _identity_of(user))
+
+def get_user_identities(phone_numbers=(), user_ids=()):
+    """Get the identities of many users by phone number or id in one query"""
+    if not phone_numbers and not user_ids:
+        return []
+    
+    conditions = []
+    if phone_numbers:
+        conditions.append(User.phone_number.in_(set(phone_numbers)))
+    if user_ids:
+        conditions.append(User.id.in_(set(user_ids)))
+    
+    rows = db.session.query(
+        User.id, User.phone_number, User.bitnob_wallet_id, User.bitcoin_address, User.is_kyc_completed
+    ).filter(or_(*conditions))
+    return [_identity_of(row) for row in rows]
+
 def create_user(phone_number, full_name=None, email=None):
     """Create new user"""
     user = User(
@@ -221,6 +366,41 @@ def get_user_transactions(user_id, limit=10):
         Transaction.created_at.desc()
     ).limit(limit).all()
 
+def get_user_transactions_page(user_id, limit=50, after=None, status=None, transaction_type=None,
+                               since=None, until=None):
+    """Get a page of user transactions, newest first, after an optional (created_at, id) position"""
+    query = Transaction.query.filter(Transaction.user_id == user_id)
+    
+    if status:
+        query = query.filter(Transaction.status == status)
+    if transaction_type:
+        query = query.filter(Transaction.transaction_type == transaction_type)
+    if since:
+        query = query.filter(Transaction.created_at >= since)
+    if until:
+        query = query.filter(Transaction.created_at < until)
+    
+    if after:
+        created_at, transaction_id = after
+        # The first condition bounds the index range, the second breaks created_at ties by id
+        query = query.filter(
+            Transaction.created_at <= created_at,
+            or_(Transaction.created_at < created_at,
+                and_(Transaction.created_at == created_at, Transaction.id < transaction_id))
+        )
+    
+    return query.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(limit).all()
+
+def iter_user_transactions(user_id, page_size=500, after=None, **filters):
+    """Yield all matching user transactions, newest first, one page in memory at a time"""
+    while True:
+        page = get_user_transactions_page(user_id, page_size, after, **filters)
+        yield from page
+        
+        if len(page) < page_size:
+            return
+        after = (page[-1].created_at, page[-1].id)
+
 def create_transaction(user_id, transaction_type, amount, **kwargs):
     """Create new transaction"""
     transaction = Transaction(
@@ -2,9 +2,19 @@
 from .bitnob_service import BitnobService, create_bitnob_account
 from .twilio_service import TwilioService, MessageFormatter, create_twilio_service
 from .otp_service import OTPService, OTPPurpose, create_otp_service
+from .message_queue import MessageQueue, ReplyWorkerPool
+from .message_dedup import MemoryDedupStore, SQLiteDedupStore, create_message_dedup_store
+from .reconciler import TransactionReconciler, create_transaction_reconciler
+from .async_bitnob_service import AsyncBitnobService, create_async_bitnob_service
+from .rates_service import RatesService, create_rates_service
 
 __all__ = [
     'BitnobService', 'create_bitnob_account',
     'TwilioService', 'MessageFormatter', 'create_twilio_service',
-    'OTPService', 'OTPPurpose', 'create_otp_service'
+    'OTPService', 'OTPPurpose', 'create_otp_service',
+    'MessageQueue', 'ReplyWorkerPool',
+    'MemoryDedupStore', 'SQLiteDedupStore', 'create_message_dedup_store',
+    'TransactionReconciler', 'create_transaction_reconciler',
+    'AsyncBitnobService', 'create_async_bitnob_service',
+    'RatesService', 'create_rates_service'
 ]
\ No newline at end of file
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+import httpx
+from services.bitnob_service import (
+    create_bitnob_retry_policy, endpoint_group, bitnob_error_reason, sign_request, customer_payload,
+    payload_idempotency_key, send_payload, build_wallet_index, usable_stale_index, wallet_balance_result
+)
+from utils.circuit_breaker import circuit_breakers
+from utils.metrics import record_bitnob_call
+from utils.retry import IDEMPOTENT_METHODS, RetryPolicy
+from utils.side_effects import record_side_effect
+
+logger = logging.getLogger(__name__)
+
+class AsyncBitnobService:
+    """asyncio Bitnob client with the same signing, retry policy and circuit breakers as BitnobService
+
+    One instance holds one connection pool; max_concurrency caps requests in flight
+    so bulk jobs can fan out without overwhelming Bitnob. Use it as an async
+    context manager, or call aclose() when done.
+    """
+
+    def __init__(self, api_key: str, secret_key: str, base_url: str, max_connections: int = 100,
+                 max_concurrency: int = 50, wallet_cache_ttl: int = 30,
+                 retry_policy: Optional[RetryPolicy] = None, max_stale_balance_age: float = 300):
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.wallet_cache_ttl = wallet_cache_ttl
+        self.max_stale_balance_age = max_stale_balance_age
+        self.retry_policy = retry_policy or create_bitnob_retry_policy()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._wallet_index: Optional[Dict[str, Any]] = None
+        self._wallet_index_expires = 0.0
+        self._wallet_lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool and semaphore bind to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={'Accept': 'application/json'},
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._wallet_lock = asyncio.Lock()
+        return self._client
+
+    async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None,
+                            idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Make authenticated request to Bitnob API, failing fast while its circuit is open"""
+        client = self._get_client()
+        breaker = circuit_breakers.get(endpoint_group(endpoint))
+
+        if not breaker.allow_request():
+            logger.warning(f"Circuit {breaker.name} open, skipping {method} {endpoint}")
+            record_bitnob_call(breaker.name, method, error='circuit_open')
+            return {
+                'error': True,
+                'circuit_open': True,
+                'message': 'Bitnob is temporarily unavailable. Please try again in a few minutes.'
+            }
+
+        # Once sent, a write may have been applied whatever the response
+        if method.upper() not in IDEMPOTENT_METHODS:
+            record_side_effect(f"Bitnob {method.upper()} {endpoint}")
+
+        try:
+            async with self._semaphore:
+                started = time.perf_counter()
+                result, upstream_ok = await self._request_with_retries(client, method, endpoint, data, idempotency_key)
+        except Exception:
+            breaker.record_failure()
+            record_bitnob_call(breaker.name, method, error='exception')
+            raise
+
+        if upstream_ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+        elapsed = time.perf_counter() - started
+        record_bitnob_call(breaker.name, method, elapsed, error=bitnob_error_reason(result, upstream_ok))
+        return result
+
+    async def _request_with_retries(self, client: httpx.AsyncClient, method: str, endpoint: str,
+                                    data: Optional[Dict], idempotency_key: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+        """Send a request, retrying transient failures; return (result, whether Bitnob was healthy)"""
+        method = method.upper()
+        body = json.dumps(data) if data else ''
+        policy = self.retry_policy
+        connect_timeout, read_timeout = policy.timeout_for(endpoint)
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        retryable = policy.is_retryable(method, idempotency_key)
+
+        policy.budget.record_request()
+        attempt = 0
+        waited = 0.0
+
+        while True:
+            # Sign every attempt with a fresh timestamp
+            timestamp = str(int(time.time()))
+            headers = {
+                'Authorization': f'Bearer {self.api_key}',
+                'X-Timestamp': timestamp,
+                'X-Signature': sign_request(self.secret_key, timestamp, method, endpoint, body)
+            }
+            if idempotency_key:
+                headers['Idempotency-Key'] = idempotency_key
+
+            # Send exactly the bytes that were signed
+            request_kwargs = {'headers': headers, 'timeout': timeout}
+            if method == 'GET':
+                request_kwargs['params'] = data
+            elif body:
+                headers['Content-Type'] = 'application/json'
+                request_kwargs['content'] = body.encode('utf-8')
+
+            try:
+                response = await client.request(method, endpoint, **request_kwargs)
+
+                if retryable and response.status_code in policy.retry_statuses:
+                    delay = policy.backoff(attempt, response.headers.get('Retry-After'), waited)
+                    if delay is not None and policy.budget.try_spend():
+                        logger.warning(
+                            f"Bitnob {method} {endpoint} returned {response.status_code}, "
+                            f"retrying in {delay:.2f}s (attempt {attempt + 2})"
+                        )
+                        await asyncio.sleep(delay)
+                        waited += delay
+                        attempt += 1
+                        continue
+
+                response.raise_for_status()
+                return response.json(), True
+
+            except httpx.TransportError as e:
+                if retryable:
+                    delay = policy.backoff(attempt, waited=waited)
+                    if delay is not None and policy.budget.try_spend():
+                        logger.warning(f"Bitnob {method} {endpoint} failed ({e!r}), retrying in {delay:.2f}s")
+                        await asyncio.sleep(delay)
+                        waited += delay
+                        attempt += 1
+                        continue
+
+                logger.error(f"Bitnob API request failed: {e!r}")
+                return {'error': True, 'message': str(e) or type(e).__name__}, False
+
+            except httpx.HTTPStatusError as e:
+                logger.error(f"Bitnob API request failed: {e}")
+
+                # Client errors (bad address, insufficient funds) do not mean Bitnob is down
+                status = e.response.status_code
+                upstream_ok = status < 500 and status != 429
+                try:
+                    error_data = e.response.json()
+                    return {'error': True, 'message': error_data.get('message', str(e))}, upstream_ok
+                except ValueError:
+                    logger.error(f"Raw response content: {e.response.text}")
+                    return {'error': True, 'message': str(e)}, upstream_ok
+
+    async def create_customer(self, full_name: str, email: str, phone_number: str) -> Dict[str, Any]:
+        """Create a new customer account"""
+        logger.info(f"Creating Bitnob customer for {phone_number}")
+        data = customer_payload(full_name, email, phone_number)
+        return await self._make_request(
+            'POST', '/api/v1/customers', data,
+            idempotency_key=payload_idempotency_key(f"customer-{phone_number}", data)
+        )
+
+    async def get_wallet_index(self) -> Dict[str, Any]:
+        """Get the cached wallet index, refreshing it once when expired"""
+        self._get_client()
+        async with self._wallet_lock:
+            if self._wallet_index is not None and time.monotonic() < self._wallet_index_expires:
+                return self._wallet_index
+
+            result = await self._make_request('GET', '/api/v1/wallets')
+            if result.get('error'):
+                logger.error(f"Failed to get wallets: {result.get('message')}")
+                return result
+
+            self._wallet_index = build_wallet_index(result.get('data', []))
+            self._wallet_index_expires = time.monotonic() + self.wallet_cache_ttl
+            return self._wallet_index
+
+    async def get_wallet_balance(self, wallet_id: str) -> Dict[str, Any]:
+        """Get wallet balance, serving a recent enough last known balance as stale if Bitnob fails"""
+        index = await self.get_wallet_index()
+        stale = False
+
+        if index.get('error'):
+            if not usable_stale_index(self._wallet_index, self.max_stale_balance_age):
+                return index
+            index = self._wallet_index
+            stale = True
+
+        return wallet_balance_result(index, wallet_id, stale)
+
+    async def send_bitcoin(self, wallet_id: str, recipient_address: str, amount: float, description: str = '',
+                           reference: Optional[str] = None) -> Dict[str, Any]:
+        """Send Bitcoin to an address (retried on transient errors only when a reference is given)"""
+        logger.info(f"Sending {amount} BTC from wallet {wallet_id} to {recipient_address}")
+        return await self._make_request(
+            'POST', '/api/v1/transactions/send', send_payload(wallet_id, recipient_address, amount, description),
+            idempotency_key=f"send-{reference}" if reference else None
+        )
+
+    async def get_transaction(self, transaction_id: str) -> Dict[str, Any]:
+        """Get transaction details"""
+        return await self._make_request('GET', f'/api/v1/transactions/{transaction_id}')
+
+    async def get_transactions(self, transaction_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """Get many transactions concurrently, in the order given"""
+        return await asyncio.gather(*(self.get_transaction(tx_id) for tx_id in transaction_ids))
+
+    async def estimate_fee(self, amount: float) -> Dict[str, Any]:
+        """Estimate transaction fee"""
+        return await self._make_request(
+            'POST', '/api/v1/transactions/estimate-fee', {'amount': str(amount), 'currency': 'BTC'}
+        )
+
+    async def get_btc_rate(self, currency: str = 'USD') -> Dict[str, Any]:
+        """Get current BTC exchange rate"""
+        return await self._make_request('GET', '/api/v1/rates', {'from': 'BTC', 'to': currency})
+
+# Factory function
+def create_async_bitnob_service(api_key: str, secret_key: str, base_url: str, max_connections: int = 100,
+                                max_concurrency: int = 50, retry_policy: Optional[RetryPolicy] = None) -> AsyncBitnobService:
+    """Create async Bitnob client instance"""
+    return AsyncBitnobService(api_key, secret_key, base_url, max_connections, max_concurrency,
+                              retry_policy=retry_policy)
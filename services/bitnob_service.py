@@ -3,18 +3,145 @@ import hmac
 import hashlib
 import json
 import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Tuple
 import logging
+from utils.bitcoin_address import check_address, UNSUPPORTED_FORMAT
+from utils.cache import TTLCache
+from utils.circuit_breaker import circuit_breakers
+from utils.metrics import record_bitnob_call
+from utils.tracing import tracer
+from utils.retry import IDEMPOTENT_METHODS, RetryPolicy, RetryBudget
+from utils.side_effects import record_side_effect
 
 logger = logging.getLogger(__name__)
 
+WALLET_INDEX_KEY = 'wallets'
+
+# Read timeouts for slower endpoints; everything else uses the default read timeout
+SLOW_ENDPOINT_READ_TIMEOUTS = {
+    '/api/v1/customers': 20.0,
+    '/api/v1/addresses/generate': 20.0
+}
+
+# Endpoint prefixes that share a circuit breaker, so one failing API area does not block the others
+ENDPOINT_GROUPS = (
+    ('/api/v1/wallets', 'wallets'),
+    ('/api/v1/transactions/estimate-fee', 'rates'),
+    ('/api/v1/transactions', 'transactions'),
+    ('/api/v1/customers', 'accounts'),
+    ('/api/v1/addresses', 'accounts'),
+    ('/api/v1/rates', 'rates'),
+)
+
+def endpoint_group(endpoint: str) -> str:
+    """Circuit breaker name for a Bitnob endpoint"""
+    for prefix, group in ENDPOINT_GROUPS:
+        if endpoint.startswith(prefix):
+            return f"bitnob.{group}"
+    return 'bitnob.other'
+
+def bitnob_error_reason(result: Dict[str, Any], upstream_ok: bool) -> Optional[str]:
+    """Metrics label for a failed call: 'upstream' when Bitnob itself failed, 'rejected' for client errors"""
+    if not result.get('error'):
+        return None
+    return 'rejected' if upstream_ok else 'upstream'
+
+def sign_request(secret_key: str, timestamp: str, method: str, path: str, body: str = '') -> str:
+    """HMAC-SHA256 signature Bitnob expects over timestamp, method, path and body"""
+    message = f"{timestamp}{method.upper()}{path}{body}"
+    return hmac.new(
+        secret_key.encode('utf-8'),
+        message.encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+
+def payload_idempotency_key(prefix: str, data: Dict[str, Any]) -> str:
+    """Idempotency key for a write: retries of the same request share it, a changed request gets a new one"""
+    digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return f"{prefix}-{digest}"
+
+def customer_payload(full_name: str, email: str, phone_number: str) -> Dict[str, Any]:
+    """Request body for creating a customer"""
+    return {
+        'firstName': full_name.split()[0] if full_name else '',
+        'lastName': ' '.join(full_name.split()[1:]) if len(full_name.split()) > 1 else '',
+        'email': email,
+        'phoneNumber': phone_number,
+        'type': 'individual'
+    }
+
+def send_payload(wallet_id: str, recipient_address: str, amount: float, description: str = '') -> Dict[str, Any]:
+    """Request body for sending Bitcoin"""
+    return {
+        'walletId': wallet_id,
+        'address': recipient_address,
+        'amount': str(amount),
+        'currency': 'BTC',
+        'description': description
+    }
+
+def build_wallet_index(wallets: list) -> Dict[str, Any]:
+    """Index a wallet list by wallet id"""
+    return {
+        'error': False,
+        'wallets': wallets,
+        'by_id': {wallet.get('id'): wallet for wallet in wallets},
+        'fetched_at': datetime.utcnow()
+    }
+
+def usable_stale_index(index: Optional[Dict[str, Any]], max_stale_age: float) -> bool:
+    """Whether a last known wallet index is recent enough to serve while Bitnob is unavailable"""
+    if index is None:
+        return False
+    age = (datetime.utcnow() - index['fetched_at']).total_seconds()
+    if age > max_stale_age:
+        logger.warning(f"Last known balances are {age:.0f}s old, too old to serve")
+        return False
+    return True
+
+def wallet_balance_result(index: Dict[str, Any], wallet_id: str, stale: bool = False) -> Dict[str, Any]:
+    """Balance response for one wallet in a wallet index"""
+    wallet = index['by_id'].get(wallet_id)
+    if not wallet:
+        logger.error(f"Wallet {wallet_id} not found")
+        return {
+            'error': True,
+            'message': f'Wallet {wallet_id} not found'
+        }
+    
+    logger.info("Balance retrieved successfully for wallet %s", wallet_id)
+    balance = wallet.get('balance', {})
+    return {
+        'error': False,
+        'data': {
+            'balance': balance,
+            'available': balance.get('available', 0) if isinstance(balance, dict) else balance,
+            'currency': wallet.get('currency'),
+            'wallet_id': wallet_id,
+            'stale': stale,
+            'as_of': index['fetched_at'].isoformat()
+        }
+    }
+
 class BitnobService:
-    def __init__(self, api_key: str, secret_key: str, base_url: str):
+    def __init__(self, api_key: str, secret_key: str, base_url: str, wallet_cache_ttl: int = 30,
+                 retry_policy: Optional[RetryPolicy] = None, max_stale_balance_age: float = 300):
         self.api_key = api_key
         self.secret_key = secret_key
         self.base_url = base_url.rstrip('/')
         self.session = requests.Session()
+        self.retry_policy = retry_policy or create_bitnob_retry_policy()
+        
+        # Shared index of the company wallet list, keyed by wallet id
+        self.wallet_cache = TTLCache(ttl_seconds=wallet_cache_ttl, max_size=1)
+        self.last_wallet_index: Optional[Dict[str, Any]] = None
+        self.max_stale_balance_age = max_stale_balance_age
+        
+        # The company BTC wallet never changes, so it is looked up once per process
+        self.company_wallet_id: Optional[str] = None
         
         # Set default headers
         self.session.headers.update({
@@ -24,84 +151,162 @@ class BitnobService:
     
     def _generate_signature(self, timestamp: str, method: str, path: str, body: str = '') -> str:
         """Generate HMAC signature for Bitnob API"""
-        message = f"{timestamp}{method.upper()}{path}{body}"
-        signature = hmac.new(
-            self.secret_key.encode('utf-8'),
-            message.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-        return signature
+        return sign_request(self.secret_key, timestamp, method, path, body)
     
-    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict[str, Any]:
-        """Make authenticated request to Bitnob API"""
-        url = f"{self.base_url}{endpoint}"
-        timestamp = str(int(time.time()))
-        body = json.dumps(data) if data else ''
+    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None,
+                      idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Make authenticated request to Bitnob API, failing fast while its circuit is open"""
+        breaker = circuit_breakers.get(endpoint_group(endpoint))
+        
+        if not breaker.allow_request():
+            logger.warning(f"Circuit {breaker.name} open, skipping {method} {endpoint}")
+            record_bitnob_call(breaker.name, method, error='circuit_open')
+            return {
+                'error': True,
+                'circuit_open': True,
+                'message': 'Bitnob is temporarily unavailable. Please try again in a few minutes.'
+            }
         
-        # Generate signature
-        signature = self._generate_signature(timestamp, method, endpoint, body)
+        # Once sent, a write may have been applied whatever the response
+        if method.upper() not in IDEMPOTENT_METHODS:
+            record_side_effect(f"Bitnob {method.upper()} {endpoint}")
         
-        # Set authentication headers
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'X-Timestamp': timestamp,
-            'X-Signature': signature
-        }
+        started = time.perf_counter()
+        try:
+            with tracer.start_as_current_span(f"{breaker.name} {method.upper()}", {'http.path': endpoint}) as span:
+                result, upstream_ok = self._request_with_retries(method, endpoint, data, idempotency_key)
+                if result.get('error'):
+                    span.set_attribute('error', bitnob_error_reason(result, upstream_ok))
+        except Exception:
+            breaker.record_failure()
+            record_bitnob_call(breaker.name, method, time.perf_counter() - started, error='exception')
+            raise
+        
+        if upstream_ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
         
-        # Add debug logging
-        logger.debug(f"Making {method} request to: {url}")
+        elapsed = time.perf_counter() - started
+        record_bitnob_call(breaker.name, method, elapsed, error=bitnob_error_reason(result, upstream_ok))
+        return result
+    
+    def _request_with_retries(self, method: str, endpoint: str, data: Optional[Dict],
+                              idempotency_key: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+        """Send a request, retrying transient failures; return (result, whether Bitnob was healthy)
+
+        Transient failures are retried per the retry policy, but only for GETs and
+        requests sent with an idempotency key, so a payment is never sent twice.
+        """
+        url = f"{self.base_url}{endpoint}"
+        body = json.dumps(data) if data else ''
+        policy = self.retry_policy
+        timeout = policy.timeout_for(endpoint)
+        retryable = policy.is_retryable(method, idempotency_key)
+        
+        # Arguments are only formatted if debug logging is on
+        logger.debug("Making %s request to: %s", method, url)
         if body:
-            logger.debug(f"Request body: {body}")
+            logger.debug("Request body: %s", body)
         
-        try:
-            if method.upper() == 'GET':
-                response = self.session.get(url, headers=headers, params=data)
-            elif method.upper() == 'POST':
-                # Ensure content-type is set correctly for JSON
-                if body:
-                    headers['Content-Type'] = 'application/json'
-                response = self.session.post(url, headers=headers, json=data if data else None)
-            elif method.upper() == 'PUT':
-                if body:
-                    headers['Content-Type'] = 'application/json'
-                response = self.session.put(url, headers=headers, json=data if data else None)
-            elif method.upper() == 'DELETE':
-                response = self.session.delete(url, headers=headers)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
-            
-            logger.debug(f"Response status: {response.status_code}")
-            
-            response.raise_for_status()
-            return response.json()
+        policy.budget.record_request()
+        attempt = 0
+        waited = 0.0
+        
+        while True:
+            # Sign every attempt with a fresh timestamp
+            timestamp = str(int(time.time()))
+            signature = self._generate_signature(timestamp, method, endpoint, body)
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Bitnob API request failed: {e}")
+            # Set authentication headers
+            headers = {
+                'Authorization': f'Bearer {self.api_key}',
+                'X-Timestamp': timestamp,
+                'X-Signature': signature
+            }
+            if idempotency_key:
+                headers['Idempotency-Key'] = idempotency_key
             
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_data = e.response.json()
-                    logger.error(f"Error response: {error_data}")
-                    return {'error': True, 'message': error_data.get('message', str(e))}
-                except:
-                    logger.error(f"Raw response content: {e.response.text}")
-                    pass
-            return {'error': True, 'message': str(e)}
+            try:
+                response = self._send(method, url, headers, data, body, timeout)
+                
+                logger.debug("Response status: %s", response.status_code)
+                
+                if retryable and response.status_code in policy.retry_statuses:
+                    delay = policy.backoff(attempt, response.headers.get('Retry-After'), waited)
+                    if delay is not None and policy.budget.try_spend():
+                        logger.warning(
+                            f"Bitnob {method} {endpoint} returned {response.status_code}, "
+                            f"retrying in {delay:.2f}s (attempt {attempt + 2})"
+                        )
+                        time.sleep(delay)
+                        waited += delay
+                        attempt += 1
+                        continue
+                
+                response.raise_for_status()
+                return response.json(), True
+                
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if retryable:
+                    delay = policy.backoff(attempt, waited=waited)
+                    if delay is not None and policy.budget.try_spend():
+                        logger.warning(f"Bitnob {method} {endpoint} failed ({e}), retrying in {delay:.2f}s")
+                        time.sleep(delay)
+                        waited += delay
+                        attempt += 1
+                        continue
+                
+                logger.error(f"Bitnob API request failed: {e}")
+                return {'error': True, 'message': str(e)}, False
+                
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Bitnob API request failed: {e}")
+                
+                # Client errors (bad address, insufficient funds) do not mean Bitnob is down
+                upstream_ok = False
+                
+                if hasattr(e, 'response') and e.response is not None:
+                    status = e.response.status_code
+                    upstream_ok = status < 500 and status != 429
+                    try:
+                        error_data = e.response.json()
+                        logger.error(f"Error response: {error_data}")
+                        return {'error': True, 'message': error_data.get('message', str(e))}, upstream_ok
+                    except:
+                        logger.error(f"Raw response content: {e.response.text}")
+                        pass
+                return {'error': True, 'message': str(e)}, upstream_ok
+    
+    def _send(self, method: str, url: str, headers: Dict[str, str], data: Optional[Dict], body: str,
+              timeout) -> requests.Response:
+        """Send one HTTP request"""
+        if method.upper() == 'GET':
+            return self.session.get(url, headers=headers, params=data, timeout=timeout)
+        elif method.upper() == 'POST':
+            # Ensure content-type is set correctly for JSON
+            if body:
+                headers['Content-Type'] = 'application/json'
+            return self.session.post(url, headers=headers, json=data if data else None, timeout=timeout)
+        elif method.upper() == 'PUT':
+            if body:
+                headers['Content-Type'] = 'application/json'
+            return self.session.put(url, headers=headers, json=data if data else None, timeout=timeout)
+        elif method.upper() == 'DELETE':
+            return self.session.delete(url, headers=headers, timeout=timeout)
+        else:
+            raise ValueError(f"Unsupported HTTP method: {method}")
     
     def create_customer(self, full_name: str, email: str, phone_number: str) -> Dict[str, Any]:
         """Create a new customer account"""
-        data = {
-            'firstName': full_name.split()[0] if full_name else '',
-            'lastName': ' '.join(full_name.split()[1:]) if len(full_name.split()) > 1 else '',
-            'email': email,
-            'phoneNumber': phone_number,
-            'type': 'individual'
-        }
+        data = customer_payload(full_name, email, phone_number)
         
         logger.info(f"Creating Bitnob customer for {phone_number}")
         
-        # Use the correct API endpoint
-        result = self._make_request('POST', '/api/v1/customers', data)
+        # Keyed by phone and payload, so a retried create returns the same customer
+        # while corrected registration details are sent as a new request
+        result = self._make_request('POST', '/api/v1/customers', data,
+                                    idempotency_key=payload_idempotency_key(f"customer-{phone_number}", data))
         
         if not result.get('error'):
             logger.info(f"Customer created successfully: {result.get('data', {}).get('id')}")
@@ -110,27 +315,57 @@ class BitnobService:
         
         return result
     
-    def get_bitcoin_wallet(self) -> Dict[str, Any]:
-        """Get the company's Bitcoin wallet (wallets are at company level, not customer level)"""
-        logger.info("Getting company Bitcoin wallet")
-        
+    def _load_wallet_index(self) -> Dict[str, Any]:
+        """Download the wallet list and index it by wallet id"""
         result = self._make_request('GET', '/api/v1/wallets')
         
         if result.get('error'):
             logger.error(f"Failed to get wallets: {result.get('message')}")
             return result
         
+        index = build_wallet_index(result.get('data', []))
+        
+        # Kept past the cache TTL as a fallback while Bitnob is unavailable
+        self.last_wallet_index = index
+        return index
+    
+    def get_wallet_index(self) -> Dict[str, Any]:
+        """Get the cached wallet index, refreshing it once when expired"""
+        return self.wallet_cache.get_or_load(
+            WALLET_INDEX_KEY,
+            self._load_wallet_index,
+            cache_if=lambda index: not index.get('error')
+        )
+    
+    def is_available(self, group: str) -> bool:
+        """Whether calls to an endpoint group ('wallets', 'transactions', ...) are currently allowed"""
+        return not circuit_breakers.is_open(f"bitnob.{group}")
+    
+    def invalidate_wallet_cache(self):
+        """Drop the cached wallet index so the next lookup refetches it"""
+        self.wallet_cache.invalidate(WALLET_INDEX_KEY)
+        logger.info("Wallet cache invalidated")
+    
+    def get_bitcoin_wallet(self) -> Dict[str, Any]:
+        """Get the company's Bitcoin wallet (wallets are at company level, not customer level)"""
+        logger.info("Getting company Bitcoin wallet")
+        
+        index = self.get_wallet_index()
+        
+        if index.get('error'):
+            return index
+        
         # Find the Bitcoin wallet
-        wallets = result.get('data', [])
         bitcoin_wallet = None
         
-        for wallet in wallets:
+        for wallet in index['wallets']:
             if wallet.get('currency', '').lower() == 'btc' or wallet.get('type') == 'bitcoin':
                 bitcoin_wallet = wallet
                 break
         
         if bitcoin_wallet:
             logger.info(f"Found Bitcoin wallet: {bitcoin_wallet['id']}")
+            self.company_wallet_id = bitcoin_wallet['id']
             return {
                 'error': False,
                 'data': bitcoin_wallet
@@ -142,35 +377,51 @@ class BitnobService:
                 'message': 'No Bitcoin wallet found for this company'
             }
     
+    def get_bitcoin_wallet_id(self) -> Dict[str, Any]:
+        """Get the company's Bitcoin wallet id, only calling Bitnob the first time"""
+        if self.company_wallet_id:
+            return {'error': False, 'data': {'id': self.company_wallet_id}}
+        
+        return self.get_bitcoin_wallet()
+    
+    def _balance_index(self):
+        """Get (wallet index, stale), falling back to the last known index while Bitnob is unavailable
+
+        The fallback is only served up to max_stale_balance_age seconds old; past
+        that the error is returned instead.
+        """
+        index = self.get_wallet_index()
+        
+        if index.get('error') and usable_stale_index(self.last_wallet_index, self.max_stale_balance_age):
+            # Serve the last known balances, flagged as possibly stale
+            logger.warning(f"Serving stale balances: {index.get('message')}")
+            return self.last_wallet_index, True
+        
+        return index, False
+    
     def get_wallet_balance(self, wallet_id: str) -> Dict[str, Any]:
         """Get wallet balance"""
         logger.info(f"Getting balance for wallet {wallet_id}")
         
-        # Get all wallets and find the specified one
-        wallets_result = self._make_request('GET', '/api/v1/wallets')
-        
-        if wallets_result.get('error'):
-            logger.error(f"Failed to get wallets: {wallets_result.get('message')}")
-            return wallets_result
-        
-        # Find the specific wallet
-        wallets = wallets_result.get('data', [])
-        for wallet in wallets:
-            if wallet.get('id') == wallet_id:
-                logger.info(f"Balance retrieved successfully for wallet {wallet_id}")
-                return {
-                    'error': False,
-                    'data': {
-                        'balance': wallet.get('balance', {}),
-                        'currency': wallet.get('currency'),
-                        'wallet_id': wallet_id
-                    }
-                }
+        index, stale = self._balance_index()
+        
+        if index.get('error'):
+            return index
+        
+        return wallet_balance_result(index, wallet_id, stale)
+    
+    def get_wallet_balances(self, wallet_ids: List[str]) -> Dict[str, Any]:
+        """Get balances for many wallets from a single wallet list, keyed by wallet id"""
+        logger.info(f"Getting balances for {len(wallet_ids)} wallets")
+        
+        index, stale = self._balance_index()
+        
+        if index.get('error'):
+            return index
         
-        logger.error(f"Wallet {wallet_id} not found")
         return {
-            'error': True,
-            'message': f'Wallet {wallet_id} not found'
+            'error': False,
+            'data': {wallet_id: wallet_balance_result(index, wallet_id, stale) for wallet_id in wallet_ids}
         }
     
     def generate_customer_address(self, customer_email: str) -> Dict[str, Any]:
@@ -181,7 +432,8 @@ class BitnobService:
             'customerEmail': customer_email
         }
         
-        result = self._make_request('POST', '/api/v1/addresses/generate', data)
+        result = self._make_request('POST', '/api/v1/addresses/generate', data,
+                                    idempotency_key=payload_idempotency_key(f"address-{customer_email}", data))
         
         if not result.get('error'):
             logger.info(f"Address generated successfully: {result.get('data', {}).get('address')}")
@@ -190,18 +442,14 @@ class BitnobService:
         
         return result
     
-    def send_bitcoin(self, wallet_id: str, recipient_address: str, amount: float, description: str = '') -> Dict[str, Any]:
-        """Send Bitcoin to an address"""
-        data = {
-            'walletId': wallet_id,
-            'address': recipient_address,
-            'amount': str(amount),
-            'currency': 'BTC',
-            'description': description
-        }
+    def send_bitcoin(self, wallet_id: str, recipient_address: str, amount: float, description: str = '',
+                     reference: Optional[str] = None) -> Dict[str, Any]:
+        """Send Bitcoin to an address (retried on transient errors only when a reference is given)"""
+        data = send_payload(wallet_id, recipient_address, amount, description)
         
         logger.info(f"Sending {amount} BTC from wallet {wallet_id} to {recipient_address}")
-        result = self._make_request('POST', '/api/v1/transactions/send', data)
+        idempotency_key = f"send-{reference}" if reference else None
+        result = self._make_request('POST', '/api/v1/transactions/send', data, idempotency_key=idempotency_key)
         
         if not result.get('error'):
             logger.info(f"Transaction initiated successfully: {result.get('data', {}).get('id')}")
@@ -235,14 +483,29 @@ class BitnobService:
         
         return result
     
-    def validate_bitcoin_address(self, address: str) -> Dict[str, Any]:
-        """Validate Bitcoin address"""
+    def validate_bitcoin_address(self, address: str, remote_fallback: bool = False) -> Dict[str, Any]:
+        """Validate Bitcoin address locally, asking Bitnob only about formats the local check does not know"""
+        address = address.strip()
+        info = check_address(address)
+        
+        if info.valid or info.error != UNSUPPORTED_FORMAT or not remote_fallback:
+            return {
+                'error': False,
+                'data': {
+                    'address': address,
+                    'valid': info.valid,
+                    'type': info.type,
+                    'network': info.network,
+                    'message': info.error
+                }
+            }
+        
         data = {
             'address': address,
             'currency': 'BTC'
         }
         
-        logger.info(f"Validating Bitcoin address: {address}")
+        logger.info(f"Validating Bitcoin address with Bitnob: {address}")
         result = self._make_request('POST', '/api/v1/addresses/validate', data)
         
         if result.get('error'):
@@ -332,35 +595,73 @@ class BitnobService:
         
         return results
 
+def create_bitnob_retry_policy(max_retries: int = 2, connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                               send_timeout: float = 30.0, budget_ratio: float = 0.2) -> RetryPolicy:
+    """Create the retry and timeout policy for Bitnob API calls"""
+    endpoint_timeouts = {
+        endpoint: (connect_timeout, timeout) for endpoint, timeout in SLOW_ENDPOINT_READ_TIMEOUTS.items()
+    }
+    endpoint_timeouts['/api/v1/transactions/send'] = (connect_timeout, send_timeout)
+    
+    return RetryPolicy(
+        max_retries=max_retries,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        endpoint_timeouts=endpoint_timeouts,
+        budget=RetryBudget(ratio=budget_ratio)
+    )
+
 # Utility functions for common operations
-def create_bitnob_account(bitnob_service: BitnobService, full_name: str, email: str, phone_number: str) -> Optional[Dict]:
-    """Complete account creation flow"""
-    try:
-        # Create customer
-        customer_result = bitnob_service.create_customer(full_name, email, phone_number)
-        if customer_result.get('error'):
-            return None
-        
-        customer_id = customer_result['data']['id']
-        
-        # Get the company's Bitcoin wallet (wallets are at company level)
-        wallet_result = bitnob_service.get_bitcoin_wallet()
-        if wallet_result.get('error'):
-            return None
-        
-        wallet_id = wallet_result['data']['id']
+def create_bitnob_account(bitnob_service: BitnobService, full_name: str, email: str, phone_number: str,
+                          progress: Optional[Dict[str, Any]] = None,
+                          on_progress: Optional[Callable[..., None]] = None) -> Optional[Dict]:
+    """Complete account creation flow
+    
+    The company wallet lookup does not depend on the customer, so it runs
+    concurrently with customer creation. The address is generated for the
+    customer, so it only runs once the customer exists. Each finished step is
+    passed to on_progress (e.g. customer_id=...) as soon as it lands, so a retry
+    given the saved progress only redoes the steps that failed.
+    """
+    account = {key: value for key, value in (progress or {}).items() if value}
+    
+    steps = {
+        'customer_id': lambda: bitnob_service.create_customer(full_name, email, phone_number),
+        'wallet_id': bitnob_service.get_bitcoin_wallet_id
+    }
+    pending = {key: step for key, step in steps.items() if key not in account}
+    failed = False
+    
+    def record(key: str, result: Dict[str, Any]) -> bool:
+        if result.get('error'):
+            logger.error(f"Account creation step {key} failed for {phone_number}: {result.get('message')}")
+            return False
         
-        # Generate Bitcoin address for this customer
-        address_result = bitnob_service.generate_customer_address(email)
-        if address_result.get('error'):
+        data = result['data']
+        account[key] = data['address'] if key == 'bitcoin_address' else data['id']
+        if on_progress:
+            on_progress(**{key: account[key]})
+        return True
+    
+    try:
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix='bitnob-registration') as executor:
+                # Each step runs in a copy of this context so its spans join the current trace
+                futures = {executor.submit(contextvars.copy_context().run, step): key for key, step in pending.items()}
+                
+                # Record results on this thread, in the order they finish
+                for future in as_completed(futures):
+                    if not record(futures[future], future.result()):
+                        failed = True
+        
+        if 'customer_id' in account and 'bitcoin_address' not in account:
+            if not record('bitcoin_address', bitnob_service.generate_customer_address(email)):
+                failed = True
+        
+        if failed:
             return None
         
-        return {
-            'customer_id': customer_id,
-            'wallet_id': wallet_id,
-            'bitcoin_address': address_result['data']['address'],
-            'address_id': address_result['data']['id']
-        }
+        return account
         
     except Exception as e:
         logger.error(f"Account creation failed: {e}")
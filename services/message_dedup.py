@@ -0,0 +1,88 @@
+import time
+from typing import Optional, Tuple
+import logging
+from utils.cache import TTLCache
+from utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+class MemoryDedupStore:
+    """Per-process record of processed Twilio MessageSids (bounded LRU with TTL)"""
+
+    def __init__(self, ttl_seconds: int = 3600, max_size: int = 10000):
+        self.cache = TTLCache(ttl_seconds=ttl_seconds, max_size=max_size)
+
+    def claim(self, message_sid: str) -> Tuple[bool, Optional[str]]:
+        """Claim a message for processing; return (claimed, cached reply)"""
+        if self.cache.add(message_sid, None):
+            return True, None
+        return False, self.cache.get(message_sid)
+
+    def record_reply(self, message_sid: str, reply: Optional[str]):
+        """Remember the reply sent for a processed message"""
+        self.cache.set(message_sid, reply)
+
+    def release(self, message_sid: str):
+        """Forget a claim so a retry can process the message again"""
+        self.cache.invalidate(message_sid)
+
+class SQLiteDedupStore(SQLiteStore):
+    """Record of processed Twilio MessageSids shared by all workers on a host"""
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS processed_messages (
+        message_sid TEXT PRIMARY KEY,
+        reply TEXT,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_processed_messages_expires_at ON processed_messages (expires_at);
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 3600, purge_every: int = 500):
+        self.ttl_seconds = ttl_seconds
+        self.purge_every = purge_every
+        self._claims = 0
+        super().__init__(path)
+
+    def claim(self, message_sid: str) -> Tuple[bool, Optional[str]]:
+        """Claim a message for processing; return (claimed, cached reply)"""
+        now = time.time()
+
+        self._claims += 1
+        if self._claims % self.purge_every == 0:
+            self.execute("DELETE FROM processed_messages WHERE expires_at < ?", (now,))
+
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT reply, expires_at FROM processed_messages WHERE message_sid = ?",
+                (message_sid,)
+            ).fetchone()
+
+            if row is not None and row['expires_at'] >= now:
+                return False, row['reply']
+
+            conn.execute(
+                "INSERT OR REPLACE INTO processed_messages (message_sid, reply, expires_at) VALUES (?, NULL, ?)",
+                (message_sid, now + self.ttl_seconds)
+            )
+            return True, None
+
+    def record_reply(self, message_sid: str, reply: Optional[str]):
+        """Remember the reply sent for a processed message"""
+        self.execute(
+            "UPDATE processed_messages SET reply = ? WHERE message_sid = ?",
+            (reply, message_sid)
+        )
+
+    def release(self, message_sid: str):
+        """Forget a claim so a retry can process the message again"""
+        self.execute("DELETE FROM processed_messages WHERE message_sid = ?", (message_sid,))
+
+# Factory function
+def create_message_dedup_store(backend: str = 'memory', ttl_seconds: int = 3600, path: Optional[str] = None):
+    """Create MessageSid dedup store for the configured backend"""
+    if backend == 'sqlite':
+        return SQLiteDedupStore(path, ttl_seconds=ttl_seconds)
+    if backend != 'memory':
+        logger.warning(f"Unknown dedup backend '{backend}', using in-memory store")
+    return MemoryDedupStore(ttl_seconds=ttl_seconds)
@@ -0,0 +1,219 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+import logging
+from models.database import unit_of_work
+from utils.side_effects import track_side_effects
+from utils.sqlite_store import SQLiteStore
+from utils.tracing import tracer
+from utils.query_profiler import query_profiler
+
+logger = logging.getLogger(__name__)
+
+class MessageQueue(SQLiteStore):
+    """Durable queue of inbound WhatsApp messages awaiting a reply"""
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS inbound_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        phone_number TEXT NOT NULL,
+        body TEXT NOT NULL,
+        message_sid TEXT,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        claimed_at REAL,
+        side_effect TEXT
+    );
+    CREATE INDEX IF NOT EXISTS ix_inbound_messages_status_id ON inbound_messages (status, id);
+    CREATE INDEX IF NOT EXISTS ix_inbound_messages_phone_status ON inbound_messages (phone_number, status);
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+
+        # Queue files created before side effects were recorded on the row
+        columns = {row['name'] for row in self.execute("PRAGMA table_info(inbound_messages)")}
+        if 'side_effect' not in columns:
+            self.execute("ALTER TABLE inbound_messages ADD COLUMN side_effect TEXT")
+
+    def enqueue(self, phone_number: str, body: str, message_sid: Optional[str] = None) -> int:
+        """Persist an inbound message and return its queue id"""
+        cursor = self.execute(
+            "INSERT INTO inbound_messages (phone_number, body, message_sid, created_at) VALUES (?, ?, ?, ?)",
+            (phone_number, body, message_sid, time.time())
+        )
+        return cursor.lastrowid
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Claim the oldest message whose sender has no message in flight
+
+        Messages from the same phone number are handed out one at a time and
+        in arrival order, so each user's turns are processed sequentially.
+        """
+        with self.transaction() as conn:
+            row = conn.execute(
+                """
+                SELECT id, phone_number, body, message_sid, attempts, created_at
+                FROM inbound_messages q
+                WHERE status = 'queued'
+                  AND NOT EXISTS (
+                      SELECT 1 FROM inbound_messages p
+                      WHERE p.phone_number = q.phone_number AND p.status = 'processing'
+                  )
+                ORDER BY id
+                LIMIT 1
+                """
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            conn.execute(
+                "UPDATE inbound_messages SET status = 'processing', attempts = attempts + 1, claimed_at = ? WHERE id = ?",
+                (time.time(), row['id'])
+            )
+            return dict(row)
+
+    def mark_side_effect(self, message_id: int, description: str):
+        """Record, before it is sent, that a claimed message's turn is about to make an outbound write"""
+        self.execute(
+            "UPDATE inbound_messages SET side_effect = COALESCE(side_effect, ?) WHERE id = ?",
+            (description, message_id)
+        )
+
+    def complete(self, message_id: int):
+        """Remove a processed message"""
+        self.execute("DELETE FROM inbound_messages WHERE id = ?", (message_id,))
+
+    def fail(self, message_id: int, max_attempts: int = 3, requeue: bool = True):
+        """Requeue a message, or park it as failed once attempts are used up (or requeue is False)"""
+        self.execute(
+            "UPDATE inbound_messages SET status = CASE WHEN ? OR attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "claimed_at = NULL WHERE id = ?",
+            (not requeue, max_attempts, message_id)
+        )
+
+    def release_stale(self, timeout_seconds: float) -> int:
+        """Requeue messages claimed by a worker that never finished them
+
+        A message whose turn had started an outbound write (a Bitnob payment or
+        a Twilio reply) may already have taken effect, so it is parked as failed
+        instead of being run again. Returns the number requeued.
+        """
+        cutoff = time.time() - timeout_seconds
+        with self.transaction() as conn:
+            parked = conn.execute(
+                "UPDATE inbound_messages SET status = 'failed', claimed_at = NULL "
+                "WHERE status = 'processing' AND claimed_at < ? AND side_effect IS NOT NULL",
+                (cutoff,)
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE inbound_messages SET status = 'queued', claimed_at = NULL "
+                "WHERE status = 'processing' AND claimed_at < ?",
+                (cutoff,)
+            ).rowcount
+
+        if parked:
+            logger.error(f"Parked {parked} stale inbound messages that had started an outbound write")
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale inbound messages")
+        return requeued
+
+    def depth(self) -> Dict[str, int]:
+        """Count messages by status"""
+        counts = {'queued': 0, 'processing': 0, 'failed': 0}
+        for row in self.execute("SELECT status, COUNT(*) AS total FROM inbound_messages GROUP BY status"):
+            counts[row['status']] = row['total']
+        return counts
+
+class ReplyWorkerPool:
+    """Background threads that run queued conversation turns and send the replies"""
+
+    def __init__(self, queue: MessageQueue, app, handle_message: Callable[[str, str], str],
+                 send_reply: Callable[[str, str], Dict[str, Any]], workers: int = 4,
+                 poll_interval: float = 1.0, visibility_timeout: float = 300, max_attempts: int = 3):
+        self.queue = queue
+        self.app = app
+        self.handle_message = handle_message
+        self.send_reply = send_reply
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start worker threads"""
+        self.queue.release_stale(self.visibility_timeout)
+
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"reply-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        logger.info(f"Started {self.workers} reply workers")
+
+    def stop(self, timeout: float = 5):
+        """Ask worker threads to exit and wait for them"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake idle workers after a message was enqueued"""
+        self._wakeup.set()
+
+    def _run(self):
+        last_sweep = time.monotonic()
+
+        while not self._stopping.is_set():
+            try:
+                if time.monotonic() - last_sweep > self.visibility_timeout:
+                    self.queue.release_stale(self.visibility_timeout)
+                    last_sweep = time.monotonic()
+
+                message = self.queue.claim()
+                if message is None:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+
+                self._process(message)
+
+            except Exception as e:
+                logger.error(f"Reply worker error: {e}")
+                time.sleep(self.poll_interval)
+
+    def _process(self, message: Dict[str, Any]):
+        """Run one conversation turn and deliver its reply"""
+        # One trace and query profile per queued turn, covering its commit and the reply delivery
+        with tracer.start_as_current_span('reply_worker.process'), query_profiler.profile('reply_worker.process'):
+            try:
+                mark_side_effect = lambda description: self.queue.mark_side_effect(message['id'], description)
+                with track_side_effects(mark_side_effect) as side_effects, self.app.app_context(), unit_of_work():
+                    reply = self.handle_message(message['phone_number'], message['body'])
+            except Exception as e:
+                # A turn that already sent a payment or a message must not run again
+                if side_effects:
+                    logger.error(f"Queued message {message['id']} failed after {', '.join(side_effects)}, "
+                                 f"not retrying: {e}")
+                    self.queue.fail(message['id'], requeue=False)
+                else:
+                    logger.error(f"Queued message {message['id']} failed: {e}")
+                    self.queue.fail(message['id'], self.max_attempts)
+                return
+
+            # The turn has run, so never re-run it just because delivery failed.
+            # The message stays claimed until the reply is out to keep replies in order.
+            try:
+                self.queue.mark_side_effect(message['id'], 'reply')
+                result = self.send_reply(message['phone_number'], reply)
+                if not result.get('success'):
+                    logger.error(f"Failed to deliver reply for queued message {message['id']}: {result.get('error')}")
+            finally:
+                self.queue.complete(message['id'])
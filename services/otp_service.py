@@ -1,9 +1,11 @@
 import random
 import string
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict
 import logging
+from models.database import db, commit_session
 from models.user import OTP, User
+from utils.metrics import OTP_VERIFICATIONS
 
 logger = logging.getLogger(__name__)
 
@@ -18,16 +20,8 @@ class OTPService:
     
     def create_otp(self, user: User, purpose: str, transaction_id: Optional[str] = None) -> OTP:
         """Create new OTP for user"""
-        # Invalidate any existing OTPs for the same purpose
-        existing_otps = OTP.query.filter_by(
-            user_id=user.id,
-            purpose=purpose,
-            is_used=False
-        ).all()
-        
-        for otp in existing_otps:
-            otp.is_used = True
-            otp.save()
+        # Invalidate any existing OTPs for the same purpose (committed with the new OTP)
+        self._mark_user_otps_used(user, purpose)
         
         # Generate new OTP
         code = self.generate_otp()
@@ -56,26 +50,31 @@ class OTPService:
         
         if not otp:
             logger.warning(f"No valid OTP found for user {user.phone_number}, purpose: {purpose}")
+            OTP_VERIFICATIONS.labels('not_found').inc()
             return False, "No valid OTP found"
         
         # Check if OTP is expired
         if otp.is_expired:
             logger.warning(f"OTP expired for user {user.phone_number}")
+            OTP_VERIFICATIONS.labels('expired').inc()
             return False, "OTP has expired"
         
         # Check if max attempts exceeded
         if otp.attempts >= otp.max_attempts:
             logger.warning(f"Max OTP attempts exceeded for user {user.phone_number}")
+            OTP_VERIFICATIONS.labels('locked').inc()
             return False, "Maximum attempts exceeded"
         
         # Verify the code
         if otp.verify(code):
             logger.info(f"OTP verified successfully for user {user.phone_number}")
             user.reset_failed_otp()  # Reset failed attempts on successful verification
+            OTP_VERIFICATIONS.labels('verified').inc()
             return True, None
         else:
             logger.warning(f"Invalid OTP code for user {user.phone_number}")
             user.increment_failed_otp()  # Increment failed attempts
+            OTP_VERIFICATIONS.labels('invalid').inc()
             
             remaining_attempts = otp.max_attempts - otp.attempts
             if remaining_attempts > 0:
@@ -91,32 +90,55 @@ class OTPService:
             is_used=False
         ).filter(OTP.expires_at > datetime.utcnow()).first()
     
-    def invalidate_user_otps(self, user: User, purpose: str = None):
-        """Invalidate all OTPs for user"""
+    def _mark_user_otps_used(self, user: User, purpose: Optional[str] = None) -> int:
+        """Mark a user's unused OTPs as used with a single UPDATE"""
         query = OTP.query.filter_by(user_id=user.id, is_used=False)
         
         if purpose:
             query = query.filter_by(purpose=purpose)
         
-        otps = query.all()
-        for otp in otps:
-            otp.is_used = True
-            otp.save()
+        return query.update({OTP.is_used: True}, synchronize_session='evaluate')
+    
+    def invalidate_user_otps(self, user: User, purpose: str = None) -> int:
+        """Invalidate all OTPs for user"""
+        count = self._mark_user_otps_used(user, purpose)
+        commit_session()
         
-        logger.info(f"Invalidated {len(otps)} OTPs for user {user.phone_number}")
+        logger.info(f"Invalidated {count} OTPs for user {user.phone_number}")
+        return count
     
-    def cleanup_expired_otps(self):
-        """Clean up expired OTPs (run periodically)"""
-        expired_otps = OTP.query.filter(
-            OTP.expires_at < datetime.utcnow(),
+    def cleanup_expired_otps(self, retention_days: Optional[int] = None, batch_size: int = 1000) -> Dict[str, int]:
+        """Clean up expired OTPs (run periodically)
+        
+        Expired OTPs are marked used with one UPDATE. When retention_days is
+        given, OTPs created before the retention window are deleted in chunks
+        of batch_size, committing after each chunk to keep transactions short.
+        """
+        now = datetime.utcnow()
+        
+        expired_count = OTP.query.filter(
+            OTP.expires_at < now,
             OTP.is_used == False
-        ).all()
+        ).update({OTP.is_used: True}, synchronize_session=False)
+        commit_session(commit=True)
         
-        for otp in expired_otps:
-            otp.is_used = True
-            otp.save()
+        deleted_count = 0
+        if retention_days is not None:
+            cutoff = now - timedelta(days=retention_days)
+            
+            while True:
+                batch_ids = [
+                    row.id for row in
+                    db.session.query(OTP.id).filter(OTP.created_at < cutoff).limit(batch_size).all()
+                ]
+                if not batch_ids:
+                    break
+                
+                deleted_count += OTP.query.filter(OTP.id.in_(batch_ids)).delete(synchronize_session=False)
+                commit_session(commit=True)
         
-        logger.info(f"Cleaned up {len(expired_otps)} expired OTPs")
+        logger.info(f"Cleaned up {expired_count} expired OTPs, deleted {deleted_count} old OTPs")
+        return {'expired': expired_count, 'deleted': deleted_count}
 
 # OTP purposes constants
 class OTPPurpose:
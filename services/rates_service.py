@@ -0,0 +1,141 @@
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+import logging
+from services.bitnob_service import BitnobService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEE_BTC = 0.00001  # 1000 satoshis
+DEFAULT_FEE_TIERS = (0.001, 0.01, 0.1, 1.0)  # BTC amounts to estimate fees for
+
+class RatesService:
+    """BTC exchange rates and fee estimates kept in memory and refreshed in the background
+
+    Reads never call Bitnob. A failed refresh keeps the last good values;
+    snapshot() flags them as stale once they are older than max_age seconds,
+    and estimate_fee() stops using fee tiers that old.
+    """
+
+    def __init__(self, bitnob_service: BitnobService, currencies: Iterable[str] = ('USD',),
+                 fee_tiers: Iterable[float] = DEFAULT_FEE_TIERS, refresh_interval: float = 60,
+                 max_age: Optional[float] = None):
+        self.bitnob_service = bitnob_service
+        self.currencies = [currency.upper() for currency in currencies]
+        self.fee_tiers = sorted(fee_tiers)
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age if max_age is not None else refresh_interval * 3
+
+        # Replaced wholesale on refresh, so readers never need the lock
+        self._rates: Dict[str, Tuple[float, datetime]] = {}
+        self._fees: Dict[float, Tuple[float, datetime]] = {}
+
+        self._refresh_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the background refresh thread; the first refresh runs at once"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='rates-refresh', daemon=True)
+        self._thread.start()
+        logger.info(f"Refreshing rates for {', '.join(self.currencies)} every {self.refresh_interval}s")
+
+    def stop(self, timeout: float = 5):
+        """Stop the background refresh thread"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Rates refresh failed: {e}")
+            self._stopping.wait(self.refresh_interval)
+
+    def refresh(self) -> Dict[str, int]:
+        """Fetch every rate and fee tier once; return how many of each were updated"""
+        with self._refresh_lock:
+            rates = dict(self._rates)
+            fees = dict(self._fees)
+            updated = {'rates': 0, 'fees': 0}
+
+            for currency in self.currencies:
+                result = self.bitnob_service.get_btc_rate(currency)
+                rate = _number(result, 'rate')
+                if rate is None:
+                    logger.warning(f"BTC/{currency} rate refresh failed: {result.get('message')}")
+                    continue
+                rates[currency] = (rate, datetime.utcnow())
+                updated['rates'] += 1
+
+            for tier in self.fee_tiers:
+                result = self.bitnob_service.estimate_fee(tier)
+                fee = _number(result, 'fee')
+                if fee is None:
+                    logger.warning(f"Fee estimate refresh for {tier} BTC failed: {result.get('message')}")
+                    continue
+                fees[tier] = (fee, datetime.utcnow())
+                updated['fees'] += 1
+
+            self._rates = rates
+            self._fees = fees
+            return updated
+
+    def get_rate(self, currency: str = 'USD') -> Optional[float]:
+        """Last known BTC price in currency, or None if never fetched"""
+        entry = self._rates.get(currency.upper())
+        return entry[0] if entry else None
+
+    def estimate_fee(self, amount: float) -> Optional[float]:
+        """Fee of the smallest fresh tier covering amount, or None if no fee is younger than max_age"""
+        now = datetime.utcnow()
+        fees = {tier: entry for tier, entry in self._fees.items()
+                if (now - entry[1]).total_seconds() <= self.max_age}
+        if not fees:
+            return None
+
+        tiers = sorted(fees)
+        for tier in tiers:
+            if amount <= tier:
+                return fees[tier][0]
+        return fees[tiers[-1]][0]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current values with their age, for health checks and the rates API"""
+        now = datetime.utcnow()
+
+        def describe(value: float, fetched_at: datetime) -> Dict[str, Any]:
+            age = (now - fetched_at).total_seconds()
+            return {
+                'value': value,
+                'as_of': fetched_at.isoformat(),
+                'age_seconds': round(age, 1),
+                'stale': age > self.max_age
+            }
+
+        return {
+            'rates': {currency: describe(*entry) for currency, entry in self._rates.items()},
+            'fees': {str(tier): describe(*entry) for tier, entry in sorted(self._fees.items())},
+            'refresh_interval_seconds': self.refresh_interval
+        }
+
+def _number(result: Dict[str, Any], key: str) -> Optional[float]:
+    """Pull a numeric field out of a Bitnob response, or None on error"""
+    if result.get('error'):
+        return None
+    try:
+        return float(result.get('data', {})[key])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+# Factory function
+def create_rates_service(bitnob_service: BitnobService, currencies: Iterable[str] = ('USD',),
+                         refresh_interval: float = 60, max_age: Optional[float] = None) -> RatesService:
+    """Create rates service instance"""
+    return RatesService(bitnob_service, currencies=currencies, refresh_interval=refresh_interval, max_age=max_age)
@@ -0,0 +1,157 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+from sqlalchemy import and_, or_
+from models.database import commit_session
+from models.user import Transaction, TransactionStatus
+from services.bitnob_service import BitnobService
+from utils.metrics import record_reconciler_run
+
+logger = logging.getLogger(__name__)
+
+UNSETTLED_STATUSES = (TransactionStatus.PENDING, TransactionStatus.PROCESSING)
+
+class RateBudget:
+    """Spaces out calls so they never exceed a fixed rate, across threads"""
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the next call slot is available"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+class TransactionReconciler:
+    """Settle stale PENDING/PROCESSING transactions against Bitnob"""
+
+    def __init__(self, bitnob_service: BitnobService, stale_after_minutes: int = 10, page_size: int = 100,
+                 max_workers: int = 8, requests_per_second: float = 5.0):
+        self.bitnob_service = bitnob_service
+        self.stale_after_minutes = stale_after_minutes
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.rate_budget = RateBudget(requests_per_second)
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def reconcile(self, max_pages: Optional[int] = None) -> Dict[str, Any]:
+        """Scan stale unsettled transactions page by page and apply Bitnob's status"""
+        started = time.monotonic()
+        now = datetime.utcnow()
+        cutoff = now - timedelta(minutes=self.stale_after_minutes)
+
+        stats = {
+            'run_at': now.isoformat(),
+            'scanned': 0,
+            'completed': 0,
+            'failed': 0,
+            'unchanged': 0,
+            'errors': 0,
+            'without_bitnob_id': self._count_without_bitnob_id(cutoff),
+            'max_lag_seconds': 0,
+            'drift': 0,
+            'drift_by_status': {}
+        }
+
+        cursor = None
+        pages = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while max_pages is None or pages < max_pages:
+                page = self._next_page(cutoff, cursor)
+                if not page:
+                    break
+
+                pages += 1
+                cursor = (page[-1].created_at, page[-1].id)
+                stats['scanned'] += len(page)
+                stats['max_lag_seconds'] = max(
+                    stats['max_lag_seconds'],
+                    int((now - page[0].created_at).total_seconds())
+                )
+
+                results = list(executor.map(self._fetch_status, [tx.bitnob_transaction_id for tx in page]))
+                self._apply(page, results, stats)
+
+        stats['pages'] = pages
+        stats['duration_seconds'] = round(time.monotonic() - started, 3)
+
+        record_reconciler_run(stats['max_lag_seconds'], stats['drift_by_status'])
+        self.last_run = stats
+        logger.info(f"Transaction reconciliation finished: {stats}")
+        return stats
+
+    def _next_page(self, cutoff: datetime, cursor) -> List[Transaction]:
+        """Get the next page of stale unsettled transactions, oldest first (keyset pagination)"""
+        query = Transaction.query.filter(
+            Transaction.status.in_(UNSETTLED_STATUSES),
+            Transaction.bitnob_transaction_id.isnot(None),
+            Transaction.created_at < cutoff
+        )
+
+        if cursor:
+            last_created_at, last_id = cursor
+            query = query.filter(or_(
+                Transaction.created_at > last_created_at,
+                and_(Transaction.created_at == last_created_at, Transaction.id > last_id)
+            ))
+
+        return query.order_by(Transaction.created_at, Transaction.id).limit(self.page_size).all()
+
+    def _count_without_bitnob_id(self, cutoff: datetime) -> int:
+        """Count stale unsettled rows that never reached Bitnob and so cannot be reconciled"""
+        return Transaction.query.filter(
+            Transaction.status.in_(UNSETTLED_STATUSES),
+            Transaction.bitnob_transaction_id.is_(None),
+            Transaction.created_at < cutoff
+        ).count()
+
+    def _fetch_status(self, bitnob_transaction_id: str) -> Dict[str, Any]:
+        """Look up one transaction on Bitnob within the rate budget"""
+        self.rate_budget.acquire()
+        try:
+            return self.bitnob_service.get_transaction(bitnob_transaction_id)
+        except Exception as e:
+            logger.error(f"Reconciler lookup failed for {bitnob_transaction_id}: {e}")
+            return {'error': True, 'message': str(e)}
+
+    def _apply(self, page: List[Transaction], results: List[Dict[str, Any]], stats: Dict[str, Any]):
+        """Apply a page of Bitnob statuses and commit them together"""
+        for transaction, result in zip(page, results):
+            if result.get('error'):
+                stats['errors'] += 1
+                continue
+
+            tx_data = result.get('data', {})
+            bitnob_status = (tx_data.get('status') or '').lower()
+
+            # Rows whose local status disagrees with Bitnob, including ones left unchanged below
+            if bitnob_status and bitnob_status != transaction.status.value:
+                stats['drift'] += 1
+                stats['drift_by_status'][bitnob_status] = stats['drift_by_status'].get(bitnob_status, 0) + 1
+
+            if bitnob_status == 'completed':
+                transaction.mark_completed(tx_data.get('hash'), commit=False)
+                stats['completed'] += 1
+            elif bitnob_status == 'failed':
+                transaction.mark_failed(tx_data.get('failureReason', 'Transaction failed'), commit=False)
+                stats['failed'] += 1
+            else:
+                stats['unchanged'] += 1
+
+        commit_session(commit=True)
+
+# Factory function
+def create_transaction_reconciler(bitnob_service: BitnobService, stale_after_minutes: int = 10, page_size: int = 100,
+                                  max_workers: int = 8, requests_per_second: float = 5.0) -> TransactionReconciler:
+    """Create transaction reconciler instance"""
+    return TransactionReconciler(bitnob_service, stale_after_minutes, page_size, max_workers, requests_per_second)
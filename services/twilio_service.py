@@ -1,19 +1,60 @@
 from twilio.rest import Client
 from twilio.twiml.messaging_response import MessagingResponse
 from twilio.request_validator import RequestValidator
+from twilio.base.exceptions import TwilioRestException
 import logging
+import time
 from typing import Optional, Dict, Any
+from utils.circuit_breaker import circuit_breakers, CircuitOpenError
+from utils.metrics import record_twilio_call
+from utils.side_effects import record_side_effect
+from utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+MESSAGES_CIRCUIT = 'twilio.messages'
+
 class TwilioService:
-    def __init__(self, account_sid: str, auth_token: str, phone_number: str):
+    def __init__(self, account_sid: str, auth_token: str, phone_number: str, api_base_url: Optional[str] = None):
         self.account_sid = account_sid
         self.auth_token = auth_token
         self.phone_number = phone_number
         self.client = Client(account_sid, auth_token)
+        
+        # Point the REST client at a stand-in API (load tests)
+        if api_base_url:
+            self.client.api.base_url = api_base_url
         self.validator = RequestValidator(auth_token)
     
+    def _create_message(self, operation: str, **kwargs):
+        """Create a message through the REST API, failing fast while the circuit is open"""
+        breaker = circuit_breakers.get(MESSAGES_CIRCUIT)
+        if not breaker.allow_request():
+            record_twilio_call(operation, error='circuit_open')
+            raise CircuitOpenError("Twilio is temporarily unavailable")
+        
+        record_side_effect(f"Twilio {operation}")
+        started = time.perf_counter()
+        try:
+            with tracer.start_as_current_span(f"twilio.{operation}"):
+                message_instance = self.client.messages.create(**kwargs)
+        except TwilioRestException as e:
+            # Rejected numbers and bad requests do not mean Twilio is down
+            if e.status >= 500 or e.status == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            record_twilio_call(operation, time.perf_counter() - started, error=str(e.status))
+            raise
+        except Exception:
+            breaker.record_failure()
+            record_twilio_call(operation, time.perf_counter() - started, error='exception')
+            raise
+        
+        breaker.record_success()
+        record_twilio_call(operation, time.perf_counter() - started)
+        return message_instance
+    
     def send_message(self, to_number: str, message: str) -> Dict[str, Any]:
         """Send WhatsApp message"""
         try:
@@ -21,13 +62,14 @@ class TwilioService:
             from_whatsapp = f"whatsapp:{self.phone_number}"
             to_whatsapp = f"whatsapp:{to_number}"
             
-            message_instance = self.client.messages.create(
+            message_instance = self._create_message(
+                'send_whatsapp',
                 body=message,
                 from_=from_whatsapp,
                 to=to_whatsapp
             )
             
-            logger.info(f"WhatsApp message sent to {to_number}, SID: {message_instance.sid}")
+            logger.info("WhatsApp message sent to %s, SID: %s", to_number, message_instance.sid)
             return {
                 'success': True,
                 'message_sid': message_instance.sid,
@@ -44,13 +86,14 @@ class TwilioService:
     def send_sms(self, to_number: str, message: str) -> Dict[str, Any]:
         """Send SMS message (fallback)"""
         try:
-            message_instance = self.client.messages.create(
+            message_instance = self._create_message(
+                'send_sms',
                 body=message,
                 from_=self.phone_number,
                 to=to_number
             )
             
-            logger.info(f"SMS sent to {to_number}, SID: {message_instance.sid}")
+            logger.info("SMS sent to %s, SID: %s", to_number, message_instance.sid)
             return {
                 'success': True,
                 'message_sid': message_instance.sid,
@@ -105,6 +148,10 @@ Need help? Reply HELP"""
         response.message(message)
         return str(response)
     
+    def create_empty_twiml_response(self) -> str:
+        """Create TwiML response that acknowledges a webhook without replying"""
+        return str(MessagingResponse())
+    
     def validate_webhook(self, url: str, params: Dict, signature: str) -> bool:
         """Validate Twilio webhook signature"""
         try:
@@ -115,8 +162,10 @@ Need help? Reply HELP"""
     
     def get_message_status(self, message_sid: str) -> Dict[str, Any]:
         """Get message delivery status"""
+        started = time.perf_counter()
         try:
             message = self.client.messages(message_sid).fetch()
+            record_twilio_call('fetch_message', time.perf_counter() - started)
             return {
                 'sid': message.sid,
                 'status': message.status,
@@ -124,6 +173,7 @@ Need help? Reply HELP"""
                 'error_message': message.error_message
             }
         except Exception as e:
+            record_twilio_call('fetch_message', time.perf_counter() - started, error='exception')
             logger.error(f"Failed to get message status for {message_sid}: {e}")
             return {'error': str(e)}
 
@@ -260,6 +310,7 @@ Try:
 Reply *HELP* for more options."""
 
 # Factory function
-def create_twilio_service(account_sid: str, auth_token: str, phone_number: str) -> TwilioService:
+def create_twilio_service(account_sid: str, auth_token: str, phone_number: str,
+                          api_base_url: Optional[str] = None) -> TwilioService:
     """Create Twilio service instance"""
-    return TwilioService(account_sid, auth_token, phone_number)
\ No newline at end of file
+    return TwilioService(account_sid, auth_token, phone_number, api_base_url)
\ No newline at end of file
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test the asyncio Bitnob client against the local Bitnob stand-in
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from load_test import BitnobStub
+from services.async_bitnob_service import AsyncBitnobService
+from services.bitnob_service import customer_payload, payload_idempotency_key, sign_request
+
+async def run_client_surface(url, captured):
+    async with AsyncBitnobService('key', 'secret', url) as client:
+        transport = httpx.AsyncHTTPTransport()
+
+        async def capture(request):
+            captured.append(request)
+            return await transport.handle_async_request(request)
+
+        await client._get_client().aclose()
+        client._client = httpx.AsyncClient(base_url=url, transport=httpx.MockTransport(capture))
+
+        customer = await client.create_customer('Ada Lovelace', 'ada@example.com', '+2348000000001')
+        balance = await client.get_wallet_balance('wallet-btc-1')
+        sent = await client.send_bitcoin('wallet-btc-1', 'bc1qexample', 0.001, 'test', reference='SC1')
+        tx = await client.get_transaction(sent['data']['id'])
+        fee = await client.estimate_fee(0.001)
+        rate = await client.get_btc_rate()
+        return customer, balance, sent, tx, fee, rate
+
+def test_client_surface():
+    print("=== Testing Async Client Surface ===")
+    stub = BitnobStub().start()
+    captured = []
+    customer, balance, sent, tx, fee, rate = asyncio.run(run_client_surface(stub.url, captured))
+
+    assert customer['data']['id'] == 'cus_1'
+    assert balance['data']['available'] == 10.0 and not balance['data']['stale']
+    assert sent['data']['id'] == 'tx_1' and tx['data']['status'] == 'completed'
+    assert fee['data']['fee'] and rate['data']['rate']
+    print("✅ All methods answered")
+
+    for request in captured:
+        if request.method == 'POST':
+            expected = sign_request('secret', request.headers['X-Timestamp'], 'POST',
+                                    request.url.path, request.content.decode('utf-8'))
+            assert request.headers['X-Signature'] == expected, request.url
+    send = next(r for r in captured if r.url.path == '/api/v1/transactions/send')
+    assert send.headers['Idempotency-Key'] == 'send-SC1'
+    create = next(r for r in captured if r.url.path == '/api/v1/customers')
+    data = customer_payload('Ada Lovelace', 'ada@example.com', '+2348000000001')
+    assert create.headers['Idempotency-Key'] == payload_idempotency_key('customer-+2348000000001', data)
+    corrected = customer_payload('Ada King', 'ada@example.com', '+2348000000001')
+    assert payload_idempotency_key('customer-+2348000000001', corrected) != create.headers['Idempotency-Key']
+    print("✅ Signatures cover the exact body sent")
+    print("✅ Customer creation keyed by phone and payload, so corrected details get a new key")
+    stub.stop()
+
+async def fan_out(url, count, concurrency):
+    async with AsyncBitnobService('key', 'secret', url, max_concurrency=concurrency) as client:
+        return await client.get_transactions([f"tx{i}" for i in range(count)])
+
+def test_fan_out():
+    print("\n=== Testing Fan-Out ===")
+    stub = BitnobStub(latency_ms=100).start()
+
+    started = time.monotonic()
+    results = asyncio.run(fan_out(stub.url, 200, 50))
+    elapsed = time.monotonic() - started
+
+    assert [r['data']['id'] for r in results] == [f"tx{i}" for i in range(200)]
+    # One at a time would take 20s; leave headroom for a single shared CPU
+    assert elapsed < 5.0, elapsed
+    print(f"✅ 200 lookups at 100ms each in {elapsed:.2f}s with 50 in flight")
+    stub.stop()
+
+def main():
+    print("🧪 Testing Async Bitnob Client\n")
+
+    test_client_surface()
+    test_fan_out()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
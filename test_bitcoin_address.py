@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test local Bitcoin address validation against the BIP 173/350 vectors
+"""
+
+import os
+import sys
+import time
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.bitcoin_address import check_address, MAINNET, TESTNET
+from utils.helpers import parse_send_command
+from utils.validators import BitcoinValidator, validate_send_command
+
+VALID = [
+    ('1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa', 'legacy', MAINNET),
+    ('3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy', 'script', MAINNET),
+    ('mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn', 'legacy', TESTNET),
+    ('2MzQwSSnBHWHqSAqtTVQ6v47XtaisrJa1Vc', 'script', TESTNET),
+    ('BC1QW508D6QEJXTDG4Y5R3ZARVARY0C5XW7KV8F3T4', 'bech32', MAINNET),
+    ('bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq', 'bech32', MAINNET),
+    ('tb1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3q0sl5k7', 'bech32', TESTNET),
+    ('bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0', 'bech32m', MAINNET),
+    ('tb1pqqqqp399et2xygdj5xreqhjjvcmzhxw4aywxecjdzew6hylgvsesf3hn0c', 'bech32m', TESTNET),
+    ('BC1SW50QGDZ25J', 'bech32m', MAINNET),
+]
+
+INVALID = [
+    '1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNb',  # Base58 checksum
+    '3J98t1WpEZ73CNmQviecrnyiWrnqRhWNL0',  # '0' is not Base58
+    'bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdr',  # Bech32 checksum
+    'bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqh2y7hd',  # v1 with a Bech32 checksum
+    'bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kemeawh',  # v0 with a Bech32m checksum
+    'BC130XLXVLHEMJA6C4DQV22UAPCTQUPFHLXM9H8Z3K2E72Q4K9HCZ7VQ7ZWS8R',  # Witness version 17
+    'bc1pw5dgrnzv',  # Program too short
+    'tb1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3pjxtptv',  # Non-zero padding
+    'bc1QW508D6QEJXTDG4Y5R3ZARVARY0C5XW7KV8F3T4',  # Mixed case
+    'bc1gmk9yu',  # Empty data
+]
+
+def test_vectors():
+    print("=== Testing Address Vectors ===")
+    for address, address_type, network in VALID:
+        info = check_address(address)
+        assert info.valid and info.type == address_type and info.network == network, (address, info)
+    print(f"✅ {len(VALID)} valid addresses accepted with type and network")
+
+    for address in INVALID:
+        assert not check_address(address).valid, address
+    print(f"✅ {len(INVALID)} invalid addresses rejected")
+
+def test_network():
+    print("\n=== Testing Network Check ===")
+    assert BitcoinValidator.validate_address('bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq')['valid']
+    result = BitcoinValidator.validate_address('mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn')
+    assert not result['valid'] and 'testnet' in result['error']
+    assert BitcoinValidator.validate_address('mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn', network=TESTNET)['valid']
+    print("✅ Testnet addresses rejected on mainnet")
+
+def test_send_command_keeps_case():
+    print("\n=== Testing Send Command Parsing ===")
+    parsed = parse_send_command('Send 0.001 BTC to 1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa')
+    assert parsed['address'] == '1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa'
+    assert validate_send_command('send 0.001 btc to 1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa')['valid']
+
+    result = validate_send_command('Send 0.001 BTC to bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdr')
+    assert not result['valid'] and 'checksum' in result['errors'][0]
+    print("✅ Base58 addresses keep their case and bad checksums are refused")
+
+def test_speed():
+    print("\n=== Testing Speed ===")
+    address = 'bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0'
+    check_address.cache_clear()
+
+    started = time.perf_counter()
+    check_address(address)
+    uncached = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(10000):
+        BitcoinValidator.validate_address(address)
+    cached = (time.perf_counter() - started) / 10000
+
+    assert uncached < 0.01 and cached < 50e-6, (uncached, cached)
+    print(f"✅ {uncached * 1e6:.0f}µs first check, {cached * 1e6:.1f}µs cached")
+
+def main():
+    print("🧪 Testing Bitcoin Address Validation\n")
+
+    test_vectors()
+    test_network()
+    test_send_command_keeps_case()
+    test_speed()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test the Bitnob retry, backoff and timeout policy against a local stand-in
+"""
+
+import os
+import sys
+import time
+from email.utils import formatdate
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import StubServer
+from services.bitnob_service import BitnobService
+from utils.retry import RetryPolicy, RetryBudget, init_retry_deadline, parse_retry_after, retry_deadline
+from conftest import create_app
+
+class ScriptedStub(StubServer):
+    """Answers with the scripted statuses in order, then 200"""
+
+    def __init__(self, statuses, delay_seconds=0):
+        super().__init__()
+        self.statuses = list(statuses)
+        self.delay_seconds = delay_seconds
+
+    def route(self, method, path, body):
+        time.sleep(self.delay_seconds)
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status == 200:
+            return 200, {'data': {'id': 'ok'}}
+        return status, {'message': f'status {status}'}
+
+def make_service(stub, **policy_kwargs):
+    policy_kwargs.setdefault('backoff_base', 0.01)
+    return BitnobService('key', 'secret', stub.url, retry_policy=RetryPolicy(**policy_kwargs))
+
+def test_get_retried_on_5xx():
+    print("=== Testing GET Retries ===")
+    stub = ScriptedStub([503, 502]).start()
+    result = make_service(stub, max_retries=2).get_transaction('tx1')
+    assert not result.get('error') and sum(stub.calls.values()) == 3, (result, stub.calls)
+    print("✅ GET succeeded on third attempt")
+    stub.stop()
+
+def test_post_without_key_not_retried():
+    print("\n=== Testing Non-Idempotent POST ===")
+    stub = ScriptedStub([503]).start()
+    result = make_service(stub).send_bitcoin('w1', 'bc1qaddr', 0.001)
+    assert result.get('error') and sum(stub.calls.values()) == 1
+    print("✅ Unkeyed send attempted once")
+
+    stub.statuses = [503]
+    result = make_service(stub).send_bitcoin('w1', 'bc1qaddr', 0.001, reference='SC123')
+    assert not result.get('error') and sum(stub.calls.values()) == 3
+    print("✅ Send with reference retried under an idempotency key")
+    stub.stop()
+
+def test_retry_after():
+    print("\n=== Testing Retry-After ===")
+    assert parse_retry_after('2') == 2.0
+    assert 0 < parse_retry_after(formatdate(time.time() + 5, usegmt=True)) <= 5
+    assert parse_retry_after('soon') is None
+
+    policy = RetryPolicy(max_retries=3, backoff_base=0.01, max_retry_after=10)
+    assert policy.backoff(0, '3') >= 3
+    assert policy.backoff(0, '60') is None, "Must give up when asked to wait too long"
+    assert policy.backoff(3) is None
+    print("✅ Retry-After honoured and capped")
+
+def test_timeout():
+    print("\n=== Testing Timeouts ===")
+    stub = ScriptedStub([], delay_seconds=0.5).start()
+    service = make_service(stub, max_retries=1, read_timeout=0.1,
+                           endpoint_timeouts={'/api/v1/transactions/send': (1, 2)})
+    started = time.monotonic()
+    result = service.get_transaction('tx1')
+    assert result.get('error') and time.monotonic() - started < 1.0
+    assert sum(stub.calls.values()) == 2
+    print("✅ Hung GET timed out and was retried once")
+
+    assert service.retry_policy.timeout_for('/api/v1/transactions/send') == (1, 2)
+    assert service.retry_policy.timeout_for('/api/v1/wallets') == (3.05, 0.1)
+    print("✅ Per-endpoint timeouts")
+    time.sleep(0.5)
+    stub.stop()
+
+def test_retry_budget():
+    print("\n=== Testing Retry Budget ===")
+    budget = RetryBudget(ratio=0.1, min_retries_per_second=0, window_seconds=60)
+    for _ in range(50):
+        budget.record_request()
+    spent = sum(budget.try_spend() for _ in range(20))
+    assert spent == 5, spent
+    print("✅ Retries capped at 10% of recent requests")
+
+def test_retry_deadline():
+    print("\n=== Testing Retry Deadline ===")
+    policy = RetryPolicy(max_retries=3, backoff_base=0.01, max_retry_after=30)
+    with retry_deadline(2):
+        assert policy.backoff(0, '3') is None, "Must fail fast past the deadline"
+        assert policy.backoff(1, '1', waited=0.5) >= 1
+        assert policy.backoff(1, '1', waited=1.5) is None
+        with retry_deadline(None):
+            assert policy.backoff(0, '20') >= 20
+    assert policy.backoff(0, '20') >= 20
+    print("✅ Waits capped per call inside a deadline, full Retry-After outside it")
+
+    app = create_app(lambda app: init_retry_deadline(app, 2))
+
+    @app.route('/backoff/<retry_after>')
+    def request_backoff(retry_after):
+        return {'delay': policy.backoff(0, retry_after)}
+
+    client = app.test_client()
+    assert client.get('/backoff/20').json['delay'] is None
+    assert client.get('/backoff/1').json['delay'] >= 1
+    assert policy.backoff(0, '20') >= 20
+    print("✅ Request threads get the deadline, and it ends with the request")
+
+def main():
+    print("🧪 Testing Bitnob Retry Policy\n")
+
+    test_get_retried_on_5xx()
+    test_post_without_key_not_retried()
+    test_retry_after()
+    test_timeout()
+    test_retry_budget()
+    test_retry_deadline()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test the bulk balance API: one user query and one wallet-list fetch per batch
+"""
+
+import json
+import os
+import sys
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import BitnobStub
+from models.database import db
+from models.user import create_user, user_identity_cache
+from conftest import count_queries, import_app
+
+REGISTERED = ['+2348000000031', '+2348000000032', '+2348000000033']
+UNREGISTERED = '+2348000000034'
+
+def test_bulk_balances():
+    print("=== Testing POST /api/balances ===")
+    user_identity_cache.clear()
+    stub = BitnobStub().start()
+    app = import_app(stub.url).app
+
+    with app.app_context():
+        db.create_all()
+        users = []
+        for phone in REGISTERED:
+            user = create_user(phone)
+            user.bitnob_wallet_id = 'wallet-btc-1'
+            user.bitcoin_address = 'bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq'
+            user.is_kyc_completed = True
+            user.save()
+            users.append(user.id)
+        create_user(UNREGISTERED)
+
+        client = app.test_client()
+        calls = stub.calls['GET /api/v1/wallets']
+        with count_queries() as statements:
+            response = client.post('/api/balances', json={
+                'phone_numbers': REGISTERED[:2] + [UNREGISTERED, '+2348000000099', REGISTERED[0]],
+                'user_ids': [users[2]]
+            }, buffered=False)
+            assert response.status_code == 200 and response.is_streamed, response.status_code
+            body = response.get_data(as_text=True)
+
+        entries = json.loads(body)
+        assert [entry.get('phone_number') for entry in entries] == REGISTERED[:2] + [
+            UNREGISTERED, '+2348000000099', REGISTERED[2]
+        ]
+        assert entries[0]['balance'] == 10.0 and entries[0]['currency'] == 'BTC'
+        assert entries[2]['error'] == 'User account not complete'
+        assert entries[3]['error'] == 'User not found'
+        assert entries[4]['user_id'] == users[2] and entries[4]['balance'] == 10.0
+        print("✅ Balances streamed in request order with per-user errors")
+
+        selects = [s for s in statements if s.startswith('SELECT')]
+        assert len(selects) == 1, selects
+        assert stub.calls['GET /api/v1/wallets'] - calls == 1
+        print("✅ One user query and one wallet-list fetch for the batch")
+
+        response = client.post('/api/balances', json={'phone_numbers': ['+2348000000031'] * 1001})
+        assert response.status_code == 400
+        response = client.post('/api/balances', json={'phone_numbers': '+2348000000031'})
+        assert response.status_code == 400
+        print("✅ Oversized and malformed batches refused")
+
+    stub.stop()
+
+def main():
+    print("🧪 Testing Bulk Balance API\n")
+
+    test_bulk_balances()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test circuit breakers around Bitnob and Twilio and the degraded balance replies
+"""
+
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import BitnobStub, TwilioStub
+from services.bitnob_service import BitnobService
+from services.twilio_service import TwilioService
+from handlers.commands import CommandHandler
+from utils.circuit_breaker import CircuitBreaker, circuit_breakers, CLOSED, OPEN, HALF_OPEN
+from utils.retry import RetryPolicy
+
+def test_state_transitions():
+    print("=== Testing Breaker States ===")
+    breaker = CircuitBreaker('test', failure_threshold=3, recovery_timeout=0.1)
+
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow_request()
+    print("✅ Opens after 3 consecutive failures")
+
+    time.sleep(0.15)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request() and not breaker.allow_request(), "Only one trial call"
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    print("✅ Failed trial call re-opens")
+
+    time.sleep(0.15)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    print("✅ Successful trial call closes")
+
+def test_bitnob_fails_fast_with_stale_balance():
+    print("\n=== Testing Bitnob Circuit ===")
+    circuit_breakers.configure(failure_threshold=3, recovery_timeout=60)
+
+    stub = BitnobStub().start()
+    service = BitnobService('key', 'secret', stub.url, wallet_cache_ttl=0,
+                            retry_policy=RetryPolicy(max_retries=0))
+    handler = CommandHandler(service, None, None)
+    user = SimpleNamespace(phone_number='+2348000000001', bitnob_wallet_id='wallet-btc-1',
+                           bitcoin_address='bc1qexample', is_kyc_completed=True)
+
+    assert 'may be stale' not in handler._handle_balance_command(user)
+
+    stub.error_rate = 1.0
+    for _ in range(3):
+        reply = handler._handle_balance_command(user)
+        assert '10.00000000' in reply and 'may be stale' in reply, reply
+    calls = sum(stub.calls.values())
+    print("✅ Last known balance served with a stale note")
+
+    assert circuit_breakers.is_open('bitnob.wallets')
+    started = time.monotonic()
+    reply = handler._handle_balance_command(user)
+    assert 'may be stale' in reply and sum(stub.calls.values()) == calls
+    assert time.monotonic() - started < 0.05
+    print("✅ Open circuit skips Bitnob entirely")
+
+    assert service.is_available('transactions')
+    assert circuit_breakers.snapshot()['bitnob.wallets']['state'] == OPEN
+    print("✅ Other endpoint groups unaffected")
+
+    service.max_stale_balance_age = 0
+    reply = handler._handle_balance_command(user)
+    assert 'temporarily unavailable' in reply and '10.00000000' not in reply, reply
+    print("✅ Balances older than max_stale_balance_age are not served")
+
+    service.last_wallet_index = None
+    reply = handler._handle_balance_command(user)
+    assert 'temporarily unavailable' in reply, reply
+    assert 'Your balance' not in handler._handle_greeting(user, user.phone_number)
+    print("✅ Friendly error without a cached balance")
+    stub.stop()
+    circuit_breakers.reset()
+    circuit_breakers.configure(failure_threshold=5, recovery_timeout=30)
+
+def test_twilio_fails_fast():
+    print("\n=== Testing Twilio Circuit ===")
+    circuit_breakers.configure(failure_threshold=2, recovery_timeout=60)
+
+    stub = TwilioStub(error_rate=1.0).start()
+    service = TwilioService('AC00000000000000000000000000000000', 'token', '+14155238886', stub.url)
+
+    for _ in range(2):
+        assert not service.send_message('+2348000000001', 'hi')['success']
+    calls = sum(stub.calls.values())
+
+    result = service.send_otp('+2348000000001', '123456')
+    assert not result['success'] and sum(stub.calls.values()) == calls
+    print("✅ WhatsApp and SMS fallback skipped while the circuit is open")
+    stub.stop()
+    circuit_breakers.reset()
+    circuit_breakers.configure(failure_threshold=5, recovery_timeout=30)
+
+def main():
+    print("🧪 Testing Circuit Breakers\n")
+
+    test_state_transitions()
+    test_bitnob_fails_fast_with_stale_balance()
+    test_twilio_fails_fast()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Check that the hot OTP and Transaction lookups are served by indexes
+"""
+
+import os
+import sys
+from datetime import datetime
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from models.database import db, ensure_indexes
+from models.user import User, Transaction, OTP
+from conftest import create_app
+
+def hot_queries():
+    """The ORM queries issued on the message hot path"""
+    return {
+        'verify_otp': OTP.query.filter_by(
+            user_id='u1', purpose='transaction', is_used=False
+        ).order_by(OTP.created_at.desc()).limit(1),
+        'get_active_otp': OTP.query.filter_by(
+            user_id='u1', purpose='transaction', is_used=False
+        ).filter(OTP.expires_at > datetime.utcnow()).limit(1),
+        'expired_otp_sweep': OTP.query.filter(
+            OTP.expires_at < datetime.utcnow(), OTP.is_used == False
+        ),
+        'user_transactions': Transaction.query.filter_by(user_id='u1').order_by(
+            Transaction.created_at.desc()
+        ).limit(10),
+        'user_transactions_page': Transaction.query.filter(
+            Transaction.user_id == 'u1',
+            Transaction.created_at <= datetime(2024, 1, 1),
+            db.or_(Transaction.created_at < datetime(2024, 1, 1),
+                   db.and_(Transaction.created_at == datetime(2024, 1, 1), Transaction.id < 'tx1'))
+        ).order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(50),
+        'transaction_by_bitnob_id': Transaction.query.filter_by(bitnob_transaction_id='tx1').limit(1),
+        'user_by_wallet_id': User.query.filter_by(bitnob_wallet_id='w1').limit(1),
+    }
+
+EXPECTED_INDEXES = {
+    'verify_otp': 'ix_otps_user_purpose_used_created',
+    'get_active_otp': 'ix_otps_user_purpose_used_created',
+    'expired_otp_sweep': 'ix_otps_expires_at',
+    'user_transactions': 'ix_transactions_user_id_created_at_id',
+    'user_transactions_page': 'ix_transactions_user_id_created_at_id',
+    'transaction_by_bitnob_id': 'ix_transactions_bitnob_transaction_id',
+    'user_by_wallet_id': 'ix_users_bitnob_wallet_id',
+}
+
+def explain(query) -> str:
+    """Get SQLite query plan for an ORM query"""
+    compiled = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+def test_sqlite_query_plans():
+    """Each hot query must search an index instead of scanning the table"""
+    print("=== Testing SQLite Query Plans ===")
+
+    app = create_app()
+    with app.app_context():
+        for name, query in hot_queries().items():
+            plan = explain(query)
+            expected = EXPECTED_INDEXES[name]
+            ok = expected in plan and 'SCAN' not in plan.replace(f'INDEX {expected}', '')
+            status = "✅" if ok else "❌"
+            print(f"{status} {name}: {plan}")
+            assert ok, f"{name} is not using {expected}: {plan}"
+
+def test_postgresql_index_ddl():
+    """The same index set compiles for PostgreSQL with the expected column order"""
+    print("\n=== Testing PostgreSQL Index DDL ===")
+
+    expected_columns = {
+        'ix_otps_user_purpose_used_created': ['user_id', 'purpose', 'is_used', 'created_at'],
+        'ix_otps_expires_at': ['expires_at'],
+        'ix_transactions_user_id_created_at_id': ['user_id', 'created_at', 'id'],
+        'ix_transactions_bitnob_transaction_id': ['bitnob_transaction_id'],
+        'ix_users_bitnob_wallet_id': ['bitnob_wallet_id'],
+    }
+
+    indexes = {index.name: index for table in db.metadata.sorted_tables for index in table.indexes}
+
+    for name, columns in expected_columns.items():
+        index = indexes.get(name)
+        assert index is not None, f"Missing index {name}"
+        ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        ok = [column.name for column in index.columns] == columns
+        status = "✅" if ok else "❌"
+        print(f"{status} {ddl}")
+        assert ok, f"{name} has columns {[column.name for column in index.columns]}"
+
+def test_existing_database_migration():
+    """ensure_indexes adds missing indexes to tables created before they existed"""
+    print("\n=== Testing Index Migration For Existing Databases ===")
+
+    app = create_app()
+    with app.app_context():
+        for name in EXPECTED_INDEXES.values():
+            db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        db.session.commit()
+
+        ensure_indexes()
+
+        for name, query in hot_queries().items():
+            plan = explain(query)
+            ok = EXPECTED_INDEXES[name] in plan
+            status = "✅" if ok else "❌"
+            print(f"{status} {name} after migration: {plan}")
+            assert ok
+
+def main():
+    print("🧪 Testing Database Indexes\n")
+
+    test_sqlite_query_plans()
+    test_postgresql_index_ddl()
+    test_existing_database_migration()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Parity test and microbenchmark for the compiled intent classifier
+"""
+
+import os
+import sys
+import re
+import timeit
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.helpers import normalize_text, detect_message_intent, _classify_normalized_message
+
+def legacy_detect_message_intent(message: str) -> str:
+    """Reference copy of the original sequential re.search classifier"""
+    # First normalize the message
+    normalized = normalize_text(message)
+    
+    # Confirmation patterns (YES, yes, Yes, etc.)
+    confirm_patterns = [
+        r'^(yes|y|ok|okay|confirm|sure|yep|yeah|yup|si|oui)$',
+        r'(create|start|begin)\s+(account|wallet|bitcoin|btc)',
+        r'(i\s+want|want\s+to|please)\s+(create|start|begin)',
+        r'(create|make|generate).*wallet',
+    ]
+    
+    for pattern in confirm_patterns:
+        if re.search(pattern, normalized):
+            return 'confirm'
+    
+    # Cancel patterns
+    cancel_patterns = [
+        r'^(no|n|nope|cancel|stop|exit|quit|abort)$',
+    ]
+    
+    for pattern in cancel_patterns:
+        if re.search(pattern, normalized):
+            return 'cancel'
+    
+    # Greeting patterns
+    greeting_patterns = [
+        r'^(hi|hello|hey|good\s+(morning|afternoon|evening))$',
+        r'^\w*(hi|hello|hey)\w*$',
+    ]
+    
+    for pattern in greeting_patterns:
+        if re.search(pattern, normalized):
+            return 'greeting'
+    
+    # Send/Transfer patterns
+    send_patterns = [
+        r'(send|transfer|pay|give)\s+.*\s*(btc|bitcoin)',
+        r'(send|transfer|pay|give)\s+[\d.]+',
+        r'i\s+(want\s+to\s+|need\s+to\s+)?(send|transfer|pay)',
+        r'^(transfer|pay).*money',
+    ]
+    
+    for pattern in send_patterns:
+        if re.search(pattern, normalized):
+            return 'send'
+    
+    # Balance patterns - expanded with natural language
+    balance_patterns = [
+        r'^(balance|bal|money|funds|wallet)$',
+        r'(check|show|what.*is|how.*much).*balance',
+        r'(my|current|account)\s+(balance|money|funds)',
+        r'how\s+much\s+(do\s+i\s+have|money|bitcoin|btc)',
+        r'(what.*balance|balance.*have)',
+    ]
+    
+    for pattern in balance_patterns:
+        if re.search(pattern, normalized):
+            return 'balance'
+    
+    # History patterns
+    history_patterns = [
+        r'^(history|transactions|activity|statement)$',
+        r'(show|view|check|get).*(history|transactions)',
+        r'(my|recent|past)\s+(transactions|history|activity)',
+        r'transaction\s+(history|list)',
+    ]
+    
+    for pattern in history_patterns:
+        if re.search(pattern, normalized):
+            return 'history'
+    
+    # Address patterns - expanded with wallet creation requests
+    address_patterns = [
+        r'^(address|receive|deposit)$',
+        r'(my|bitcoin|btc|wallet)\s+(address|id)',
+        r'(receive|get)\s+(bitcoin|btc|money)',
+        r'how\s+to\s+receive',
+        r'where.*send.*me',
+    ]
+    
+    for pattern in address_patterns:
+        if re.search(pattern, normalized):
+            return 'address'
+    
+    # Help patterns
+    help_patterns = [
+        r'^(help|support|assist|info|information|\?)$',
+        r'(need|want)\s+(help|support|assistance)',
+        r'(how\s+do\s+i|what\s+can)',
+        r'commands?',
+    ]
+    
+    for pattern in help_patterns:
+        if re.search(pattern, normalized):
+            return 'help'
+    
+    # Check if it's an OTP (6 digits)
+    if re.match(r'^\d{6}$', normalized):
+        return 'otp'
+    
+    # Check if it's a valid name (for registration) - but be more restrictive
+    words = normalized.split()
+    if (len(words) == 2 and 
+        all(word.isalpha() and len(word) >= 2 for word in words) and
+        not any(word in ['want', 'need', 'can', 'how', 'what', 'where', 'when', 'random', 'gibberish', 'history', 'start', 'begin'] for word in words)):
+        return 'name_input'
+    
+    # Check if it's an email
+    if re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', normalized):
+        return 'email_input'
+    
+    # Default to unknown
+    return 'unknown'
+
+
+CORPUS = [
+    "YES", "yes", "Yes", "y", "ok", "okay", "Sure", "yup", "si", "oui", "yes please",
+    "create bitcoin wallet", "i want to create account", "please start", "make me a wallet",
+    "start account", "begin btc", "generate my wallet now",
+    "NO", "no", "n", "nope", "cancel", "stop", "exit", "quit", "abort", "no thanks",
+    "Hi", "hello", "HEY", "hey there", "good morning", "good  evening", "hiya", "ohhello", "history",
+    "send 0.001 btc", "Send 0.5 Bitcoin", "i want to send bitcoin", "transfer money",
+    "send 0.001 BTC to bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq", "pay 20", "give 1.5 btc",
+    "i need to pay", "pay my money", "transfer 0.1 to 1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2",
+    "balance", "BALANCE", "bal", "funds", "wallet", "check balance", "what is my balance",
+    "how much money do i have", "my balance", "current funds", "how much btc", "balance i have",
+    "history", "transactions", "activity", "statement", "show my history", "recent transactions",
+    "view transactions please", "transaction list", "past activity",
+    "address", "receive", "deposit", "my bitcoin address", "btc id", "get bitcoin",
+    "how to receive bitcoin", "where can people send it to me",
+    "help", "HELP", "support", "?", "info", "what can you do", "commands", "command",
+    "i need help", "how do i send", "want support",
+    "123456", "000000", "12345", "1234567", " 654321 ",
+    "John Smith", "Jane Doe", "Mary-Jane Watson", "want cake", "random gibberish",
+    "test@example.com", "user.name@domain.co.uk", "USER@EXAMPLE.COM", "not an email@",
+    "single", "", "   ", "multi\nline balance", "balance\n", "hello\nworld", "12ab34",
+    "what", "❤️", "send", "pay", "transfer", "join abc123 yes",
+]
+
+def test_intent_parity():
+    """The compiled classifier must return the same intent as the original"""
+    print("=== Testing Intent Classifier Parity ===")
+    
+    mismatches = []
+    for message in CORPUS:
+        expected = legacy_detect_message_intent(message)
+        result = detect_message_intent(message)
+        status = "✅" if result == expected else "❌"
+        print(f"{status} detect_message_intent({message!r}) = '{result}' (expected: '{expected}')")
+        if result != expected:
+            mismatches.append(message)
+    
+    assert not mismatches, f"Intent mismatches: {mismatches}"
+
+def benchmark_intent_detection(number: int = 2000):
+    """Compare per-message cost of the original and compiled classifiers"""
+    print("\n=== Benchmarking Intent Detection ===")
+    
+    def run_legacy():
+        for message in CORPUS:
+            legacy_detect_message_intent(message)
+    
+    def run_compiled_uncached():
+        for message in CORPUS:
+            _classify_normalized_message.__wrapped__(normalize_text(message))
+    
+    def run_compiled():
+        for message in CORPUS:
+            detect_message_intent(message)
+    
+    results = {}
+    for name, func in [('legacy', run_legacy), ('compiled', run_compiled_uncached), ('compiled+cache', run_compiled)]:
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        per_message_us = seconds / (number * len(CORPUS)) * 1e6
+        results[name] = per_message_us
+        print(f"{name:>15}: {per_message_us:.2f} µs/message")
+    
+    return results
+
+def test_intent_benchmark():
+    """Run a short benchmark so regressions show up in the test output"""
+    results = benchmark_intent_detection(number=50)
+    assert results['compiled+cache'] < results['legacy']
+
+def main():
+    print("🧪 Testing Intent Classifier\n")
+    
+    test_intent_parity()
+    benchmark_intent_detection()
+    
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test the queued JSON logging pipeline: lazy formatting, sampling and dropping
+"""
+
+import io
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import subprocess
+import sys
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from prometheus_client import REGISTRY
+
+from utils import helpers
+from utils.logging_setup import JsonFormatter, LazyQueueHandler, SamplingFilter, parse_sample_rates
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+class Snapshot:
+    """Counts how often it is turned into text"""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return 'snapshot'
+
+def dropped(reason):
+    return REGISTRY.get_sample_value('satchat_log_records_dropped_total', {'reason': reason}) or 0
+
+def create_pipeline(name, rates=None, queue_size=100):
+    """A logger writing JSON through the queue to a string, like configure_logging does for the root"""
+    output = io.StringIO()
+    stream = logging.StreamHandler(output)
+    stream.setFormatter(JsonFormatter())
+
+    handler = LazyQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(SamplingFilter(rates))
+    listener = logging.handlers.QueueListener(handler.queue, stream)
+
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger, handler, listener, output
+
+def test_lazy_formatting():
+    print("=== Testing Lazy Formatting ===")
+    logger, handler, listener, output = create_pipeline('test.logging.lazy')
+
+    snapshot = Snapshot()
+    logger.debug("State: %s", snapshot)
+    assert snapshot.formatted == 0
+    print("✅ Records below the level are never formatted")
+
+    logger.info("Sent %s to %s", 0.001, 'bc1q...')
+    record = handler.queue.get_nowait()
+    assert record.msg == "Sent %s to %s" and record.args == (0.001, 'bc1q...')
+    logger.info("State: %s", snapshot)
+    record = handler.queue.get_nowait()
+    assert record.msg == "State: snapshot" and record.args is None and snapshot.formatted == 1
+    print("✅ Immutable arguments are formatted on the writer thread, others when logged")
+
+    listener.start()
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logger.exception("Failed for %s", 'wallet-1', extra={'wallet_id': 'wallet-1'})
+    listener.stop()
+    entry = json.loads(output.getvalue())
+    assert entry['level'] == 'ERROR' and entry['message'] == 'Failed for wallet-1', entry
+    assert entry['wallet_id'] == 'wallet-1' and 'ValueError: boom' in entry['exception'], entry
+    print("✅ Records written as JSON with their extra fields and traceback")
+
+def test_sampling_and_dropping():
+    print("\n=== Testing Sampling ===")
+    assert parse_sample_rates('message_received=0.1, request=2,') == {'message_received': 0.1, 'request': 1.0}
+
+    logger, handler, listener, output = create_pipeline(
+        'test.logging.sampled', parse_sample_rates('message_received=0.1'), queue_size=1000
+    )
+    listener.start()
+    sampled = dropped('sampled')
+    for _ in range(20):
+        logger.info("Message received", extra={'sample_key': 'message_received'})
+        logger.warning("Slow turn", extra={'sample_key': 'message_received'})
+    logger.info("Balance checked", extra={'sample_key': 'balance_checked'})
+    listener.stop()
+
+    entries = [json.loads(line) for line in output.getvalue().splitlines()]
+    kept = [entry for entry in entries if entry['message'] == 'Message received']
+    assert len(kept) == 2 and all(entry['sample_rate'] == 0.1 for entry in kept), kept
+    assert sum(1 for entry in entries if entry['level'] == 'WARNING') == 20
+    assert any(entry['message'] == 'Balance checked' for entry in entries)
+    assert dropped('sampled') - sampled == 18
+    print("✅ 1 in 10 sampled INFO records kept; warnings and other events all kept")
+
+    for rate in (0.7, 0.4, 0.25):
+        sampler = SamplingFilter({'request': rate})
+        records = [logging.makeLogRecord({'levelno': logging.INFO, 'sample_key': 'request'}) for _ in range(100)]
+        kept = [record for record in records if sampler.filter(record)]
+        assert len(kept) == round(100 * rate) and all(record.sample_rate == rate for record in kept), (rate, len(kept))
+    print("✅ The kept fraction matches the stamped sample_rate for rates that are not 1/N")
+
+    helpers_logger = helpers.logger
+    handler = LazyQueueHandler(queue.Queue(maxsize=1))
+    helpers_logger.addHandler(handler)
+    previous_level = helpers_logger.level
+    helpers_logger.setLevel(logging.INFO)
+    full = dropped('queue_full')
+    try:
+        helpers.log_user_action('+2348000000081', 'balance_checked')
+        helpers.log_user_action('+2348000000081', 'history_checked', 'page 1')
+    finally:
+        helpers_logger.removeHandler(handler)
+        helpers_logger.setLevel(previous_level)
+    record = handler.queue.get_nowait()
+    assert record.action == 'balance_checked' and record.phone == '**********0081', vars(record)
+    assert dropped('queue_full') - full == 1
+    print("✅ A full queue drops records instead of blocking the request")
+
+def test_configure_logging():
+    print("\n=== Testing configure_logging ===")
+    script = (
+        "import logging\n"
+        "from utils.logging_setup import configure_logging\n"
+        "configure_logging('INFO', 'json', {'request': 0.5})\n"
+        "for path in ('/a', '/b', '/c', '/d'):\n"
+        "    logging.getLogger('app').info('GET %s', path, extra={'sample_key': 'request'})\n"
+        "logging.getLogger('app').debug('hidden')\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, check=True, capture_output=True, text=True)
+    entries = [json.loads(line) for line in result.stderr.splitlines()]
+    assert [entry['message'] for entry in entries] == ['GET /a', 'GET /c'], result.stderr
+    assert entries[0]['logger'] == 'app' and entries[0]['level'] == 'INFO'
+    print("✅ Root logger writes sampled JSON from its own thread, flushed at exit")
+
+def main():
+    print("🧪 Testing Logging\n")
+
+    test_lazy_formatting()
+    test_sampling_and_dropping()
+    test_configure_logging()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test the Twilio MessageSid dedup stores and their use by the webhook
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.database import db
+from models.user import User, create_user
+from services.message_dedup import MemoryDedupStore, SQLiteDedupStore
+from conftest import import_app
+
+PHONE = '+2348000000401'
+
+def check_store(store):
+    assert store.claim('SM-1') == (True, None)
+    assert store.claim('SM-1') == (False, None)
+    store.record_reply('SM-1', 'Your balance is 0.001 BTC')
+    assert store.claim('SM-1') == (False, 'Your balance is 0.001 BTC')
+
+    assert store.claim('SM-2') == (True, None)
+    store.release('SM-2')
+    assert store.claim('SM-2') == (True, None)
+
+def test_memory_store():
+    print("=== Testing Memory Store ===")
+    check_store(MemoryDedupStore())
+    print("✅ Claim, duplicate with and without a reply, and release")
+
+    store = MemoryDedupStore(ttl_seconds=0.05)
+    store.claim('SM-3')
+    time.sleep(0.1)
+    assert store.claim('SM-3') == (True, None)
+    print("✅ Expired claims can be taken again")
+
+def test_sqlite_store():
+    print("\n=== Testing SQLite Store ===")
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'dedup.db')
+        check_store(SQLiteDedupStore(path))
+        print("✅ Claim, duplicate with and without a reply, and release")
+
+        # Another worker on the same host opens its own store on the file
+        other = SQLiteDedupStore(path)
+        assert other.claim('SM-1') == (False, 'Your balance is 0.001 BTC')
+        assert other.claim('SM-2') == (False, None)
+        print("✅ Claims shared between workers")
+
+        store = SQLiteDedupStore(path, ttl_seconds=0, purge_every=2)
+        assert store.claim('SM-4') == (True, None)
+        time.sleep(0.01)
+        assert store.claim('SM-4') == (True, None)
+        rows = store.execute("SELECT COUNT(*) FROM processed_messages WHERE message_sid = 'SM-4'").fetchone()[0]
+        assert rows == 1
+        print("✅ Expired claims taken again and purged")
+
+def test_webhook_commit_failure():
+    print("\n=== Testing Webhook Commit Failure ===")
+    app_module = import_app()
+    client = app_module.app.test_client()
+    with app_module.app.app_context():
+        if not User.query.filter_by(phone_number=PHONE).first():
+            create_user(PHONE)
+
+    handle_message = app_module.command_handler.handle_message
+
+    def duplicate_user_turn(phone_number, message):
+        # Only flushed at the commit, after the reply text exists
+        db.session.add(User(phone_number=PHONE))
+        return 'Saved!'
+
+    form = {'From': f'whatsapp:{PHONE}', 'Body': 'balance', 'MessageSid': 'SM-commit-1'}
+    app_module.command_handler.handle_message = duplicate_user_turn
+    try:
+        response = client.post('/webhook/twilio', data=form)
+    finally:
+        app_module.command_handler.handle_message = handle_message
+    body = response.get_data(as_text=True)
+    assert response.status_code == 500 and 'Saved!' not in body and 'something went wrong' in body, body
+    print("✅ A turn that fails to commit is answered with an error")
+
+    app_module.command_handler.handle_message = lambda phone_number, message: 'Saved on retry'
+    try:
+        response = client.post('/webhook/twilio', data=form)
+        assert response.status_code == 200 and 'Saved on retry' in response.get_data(as_text=True)
+        app_module.command_handler.handle_message = lambda phone_number, message: 'Processed twice'
+        response = client.post('/webhook/twilio', data=form)
+        assert response.status_code == 200 and 'Saved on retry' in response.get_data(as_text=True)
+    finally:
+        app_module.command_handler.handle_message = handle_message
+    print("✅ Its claim was released, so Twilio's retry ran the turn and later retries get that reply")
+
+def main():
+    print("🧪 Testing Message Dedup\n")
+
+    test_memory_store()
+    test_sqlite_store()
+    test_webhook_commit_failure()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
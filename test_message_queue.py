@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test the inbound message queue and the reply workers that drain it
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import BitnobStub
+from services.bitnob_service import BitnobService
+from services.message_queue import MessageQueue, ReplyWorkerPool
+from utils.retry import RetryPolicy
+from conftest import create_app
+
+ALICE = '+2348000000501'
+BOB = '+2348000000502'
+
+def make_queue(workdir):
+    return MessageQueue(os.path.join(workdir, 'queue.db'))
+
+def test_per_phone_ordering():
+    print("=== Testing Per-Phone Ordering ===")
+    with tempfile.TemporaryDirectory() as workdir:
+        queue = make_queue(workdir)
+        first = queue.enqueue(ALICE, 'balance')
+        second = queue.enqueue(ALICE, 'history')
+        other = queue.enqueue(BOB, 'help')
+
+        assert queue.claim()['id'] == first
+        assert queue.claim()['id'] == other, "A sender's next message waits for the one in flight"
+        assert queue.claim() is None
+        assert queue.depth() == {'queued': 1, 'processing': 2, 'failed': 0}
+        print("✅ One message per sender in flight, other senders not held up")
+
+        queue.complete(first)
+        claimed = queue.claim()
+        assert claimed['id'] == second and claimed['body'] == 'history' and claimed['attempts'] == 0
+        assert queue.depth() == {'queued': 0, 'processing': 2, 'failed': 0}
+        print("✅ Completing a message releases the sender's next one, in arrival order")
+
+def test_stale_claims_and_failures():
+    print("\n=== Testing Stale Claims and Failures ===")
+    with tempfile.TemporaryDirectory() as workdir:
+        queue = make_queue(workdir)
+        message_id = queue.enqueue(ALICE, 'balance')
+        queue.claim()
+
+        assert queue.release_stale(60) == 0
+        queue.execute("UPDATE inbound_messages SET claimed_at = claimed_at - 120 WHERE id = ?", (message_id,))
+        assert queue.release_stale(60) == 1
+        assert queue.depth()['queued'] == 1
+        print("✅ Claims older than the visibility timeout are requeued")
+
+        claimed = queue.claim()
+        assert claimed['id'] == message_id and claimed['attempts'] == 1
+        queue.fail(message_id, max_attempts=3)
+        assert queue.depth() == {'queued': 1, 'processing': 0, 'failed': 0}
+        queue.claim()
+        queue.fail(message_id, max_attempts=3)
+        assert queue.depth() == {'queued': 0, 'processing': 0, 'failed': 1}
+        assert queue.claim() is None
+        print("✅ Failed messages requeued until max_attempts, then parked")
+
+        other = queue.enqueue(BOB, 'send')
+        queue.claim()
+        queue.fail(other, max_attempts=3, requeue=False)
+        assert queue.depth() == {'queued': 0, 'processing': 0, 'failed': 2}
+        print("✅ requeue=False parks a message on its first failure")
+
+def test_stale_claims_after_side_effects():
+    print("\n=== Testing Stale Claims After Side Effects ===")
+    with tempfile.TemporaryDirectory() as workdir:
+        queue = make_queue(workdir)
+        sent = queue.enqueue(ALICE, 'send 0.001 to bob')
+        read = queue.enqueue(BOB, 'balance')
+        queue.claim()
+        queue.claim()
+
+        queue.mark_side_effect(sent, 'Bitnob POST /api/v1/wallets/send_bitcoin')
+        queue.execute("UPDATE inbound_messages SET claimed_at = claimed_at - 120")
+        assert queue.release_stale(60) == 1
+        assert queue.depth() == {'queued': 1, 'processing': 0, 'failed': 1}
+        assert queue.claim()['id'] == read
+        print("✅ A stale claim whose turn had started an outbound write is parked, not requeued")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'queue.db')
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE inbound_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, phone_number TEXT NOT NULL, "
+                     "body TEXT NOT NULL, message_sid TEXT, status TEXT NOT NULL DEFAULT 'queued', "
+                     "attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, claimed_at REAL)")
+        conn.close()
+
+        queue = MessageQueue(path)
+        message_id = queue.enqueue(ALICE, 'balance')
+        queue.claim()
+        queue.mark_side_effect(message_id, 'reply')
+        print("✅ Queue files from before side effects were recorded are migrated")
+
+def test_worker_retries():
+    print("\n=== Testing Reply Workers ===")
+    stub = BitnobStub().start()
+    bitnob = BitnobService('key', 'secret', stub.url, retry_policy=RetryPolicy(max_retries=0))
+    sent = []
+    marked = []
+
+    def handle_message(phone_number, body):
+        if body == 'lookup then fail':
+            bitnob.get_transaction('tx-1')
+            raise RuntimeError('failed after a read')
+        if body == 'register then fail':
+            bitnob.create_customer('Amara Okafor', 'amara@example.com', phone_number)
+            marked.append(queue.execute("SELECT side_effect FROM inbound_messages WHERE phone_number = ?",
+                                        (phone_number,)).fetchone()[0])
+            raise RuntimeError('failed after a write')
+        return f"Reply to {body}"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        queue = make_queue(workdir)
+        pool = ReplyWorkerPool(queue, create_app(), handle_message,
+                               lambda phone_number, reply: sent.append((phone_number, reply)) or {'success': True},
+                               max_attempts=3)
+
+        queue.enqueue(ALICE, 'balance')
+        pool._process(queue.claim())
+        assert sent == [(ALICE, 'Reply to balance')] and queue.depth() == {'queued': 0, 'processing': 0, 'failed': 0}
+        print("✅ Turn run, reply sent and message removed")
+
+        queue.enqueue(ALICE, 'lookup then fail')
+        pool._process(queue.claim())
+        assert queue.depth()['queued'] == 1
+        print("✅ A turn that failed after only reading from Bitnob is retried")
+
+        queue.execute("DELETE FROM inbound_messages")
+        queue.enqueue(BOB, 'register then fail')
+        pool._process(queue.claim())
+        assert queue.depth() == {'queued': 0, 'processing': 0, 'failed': 1}
+        assert stub.calls['POST /api/v1/customers'] == 1 and len(sent) == 1
+        assert marked == ['Bitnob POST /api/v1/customers'], marked
+        print("✅ A turn that failed after a Bitnob write is parked, not run again")
+        print("✅ The write was recorded on the queue row before the turn finished")
+
+    stub.stop()
+
+def main():
+    print("🧪 Testing Message Queue\n")
+
+    test_per_phone_ordering()
+    test_stale_claims_and_failures()
+    test_stale_claims_after_side_effects()
+    test_worker_retries()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test the /metrics endpoint and the hot-path instrumentation behind it
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from prometheus_client import REGISTRY
+
+from load_test import BitnobStub
+from models.user import create_user
+from services.bitnob_service import BitnobService
+from services.otp_service import OTPService
+from handlers.commands import CommandHandler
+from utils.retry import RetryPolicy
+from utils.session_store import MemorySessionBackend, session_store
+from conftest import create_app, import_app
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def test_metrics_endpoint():
+    print("=== Testing /metrics ===")
+    app = import_app().app
+
+    client = app.test_client()
+    before = sample('satchat_db_queries_per_request_count', route='/api/stats')
+    assert client.get('/api/stats').status_code == 200
+    assert client.get('/api/stats').status_code == 200
+    assert sample('satchat_db_queries_per_request_count', route='/api/stats') - before == 2
+
+    response = client.get('/metrics')
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    assert 'satchat_http_request_duration_seconds_bucket{' in body
+    assert 'route="/api/stats"' in body and 'status="200"' in body
+    print("✅ Route latency and per-request query counts exported")
+
+def test_hot_path_metrics():
+    print("\n=== Testing Hot Path Instrumentation ===")
+    session_store.use_backend(MemorySessionBackend())
+    stub = BitnobStub().start()
+    bitnob = BitnobService('key', 'secret', stub.url, retry_policy=RetryPolicy(max_retries=0))
+    handler = CommandHandler(bitnob, None, None)
+
+    app = create_app()
+    with app.app_context():
+        greetings = sample('satchat_message_duration_seconds_count', intent='greeting')
+        handler.handle_message('+2348000000061', 'Hi')
+        assert sample('satchat_message_duration_seconds_count', intent='greeting') - greetings == 1
+
+        handler.handle_message('+2348000000061', 'YES')
+        steps = sample('satchat_message_duration_seconds_count', intent='awaiting_name')
+        handler.handle_message('+2348000000061', 'Amara Okafor')
+        assert sample('satchat_message_duration_seconds_count', intent='awaiting_name') - steps == 1
+        print("✅ Messages timed by intent and conversation step")
+
+        calls = sample('satchat_bitnob_request_duration_seconds_count', endpoint='bitnob.wallets', method='GET')
+        bitnob.invalidate_wallet_cache()
+        bitnob.get_wallet_index()
+        assert sample('satchat_bitnob_request_duration_seconds_count',
+                      endpoint='bitnob.wallets', method='GET') - calls == 1
+
+        errors = sample('satchat_bitnob_errors_total', endpoint='bitnob.other', method='GET', reason='rejected')
+        bitnob._make_request('GET', '/api/v1/unknown')
+        assert sample('satchat_bitnob_errors_total',
+                      endpoint='bitnob.other', method='GET', reason='rejected') - errors == 1
+        print("✅ Bitnob latency and errors by endpoint group")
+
+        otp_service = OTPService()
+        user = create_user('+2348000000062')
+        otp = otp_service.create_otp(user, 'transaction')
+        outcomes = {outcome: sample('satchat_otp_verifications_total', outcome=outcome)
+                    for outcome in ('invalid', 'verified', 'not_found')}
+        otp_service.verify_otp(user, '000000' if otp.code != '000000' else '111111', 'transaction')
+        otp_service.verify_otp(user, otp.code, 'transaction')
+        otp_service.verify_otp(user, otp.code, 'transaction')
+        for outcome, before in outcomes.items():
+            assert sample('satchat_otp_verifications_total', outcome=outcome) - before == 1, outcome
+        print("✅ OTP outcomes counted")
+
+    stub.stop()
+
+def test_multiprocess_collection():
+    print("\n=== Testing Multiprocess Collection ===")
+    with tempfile.TemporaryDirectory() as metrics_dir:
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=metrics_dir)
+        worker = "from utils.metrics import OTP_VERIFICATIONS; OTP_VERIFICATIONS.labels('verified').inc()"
+        for _ in range(2):
+            subprocess.run([sys.executable, '-c', worker], cwd=ROOT, env=env, check=True)
+
+        scrape = "from utils.metrics import render_metrics; print(render_metrics()[0].decode())"
+        output = subprocess.run([sys.executable, '-c', scrape], cwd=ROOT, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        assert 'satchat_otp_verifications_total{outcome="verified"} 2.0' in output, output
+    print("✅ Samples from separate worker processes are summed")
+
+def main():
+    print("🧪 Testing Metrics\n")
+
+    test_metrics_endpoint()
+    test_hot_path_metrics()
+    test_multiprocess_collection()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
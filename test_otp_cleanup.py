@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test the periodic OTP cleanup: expiring stale codes and purging old ones in batches
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+
+from models.database import db
+from models.user import OTP, create_user, get_user_by_phone
+from services.otp_service import OTPService
+from conftest import create_app, import_app
+
+def seed(user):
+    """Two live codes, three expired ones and five from before a 30-day retention window"""
+    now = datetime.utcnow()
+    codes = [
+        (now, now + timedelta(minutes=5), False),
+        (now, now + timedelta(minutes=5), True),
+        (now - timedelta(minutes=10), now - timedelta(minutes=5), False),
+        (now - timedelta(minutes=10), now - timedelta(minutes=5), False),
+        (now - timedelta(minutes=10), now - timedelta(minutes=5), True),
+    ]
+    codes += [(now - timedelta(days=40), now - timedelta(days=40) + timedelta(minutes=5), index % 2 == 0)
+              for index in range(5)]
+    for created_at, expires_at, is_used in codes:
+        db.session.add(OTP(user_id=user.id, code='123456', purpose='transaction', is_used=is_used,
+                           created_at=created_at, expires_at=expires_at))
+    db.session.commit()
+
+def test_expire_then_delete():
+    print("=== Testing OTP Cleanup ===")
+    app = create_app()
+    with app.app_context():
+        seed(create_user('+2348000000701'))
+
+        result = OTPService().cleanup_expired_otps()
+        assert result == {'expired': 4, 'deleted': 0}, result
+        assert OTP.query.count() == 10 and OTP.query.filter_by(is_used=False).count() == 1
+        print("✅ Without retention_days, expired codes are only marked used")
+
+        commits = []
+        record_commit = lambda session: commits.append(session)
+        event.listen(db.session, 'after_commit', record_commit)
+        try:
+            result = OTPService().cleanup_expired_otps(retention_days=30, batch_size=2)
+        finally:
+            event.remove(db.session, 'after_commit', record_commit)
+        assert result == {'expired': 0, 'deleted': 5}, result
+        assert OTP.query.count() == 5
+        assert OTP.query.filter(OTP.created_at < datetime.utcnow() - timedelta(days=30)).count() == 0
+        print("✅ Codes created before the retention window deleted, newer ones kept")
+
+        # One commit for the expiry update, then one per batch of at most 2 deletes
+        assert len(commits) == 1 + 3, commits
+        print("✅ Deletes committed in batches of batch_size")
+
+def test_cli():
+    print("\n=== Testing cleanup-otps ===")
+    app = import_app().app
+    runner = app.test_cli_runner()
+    runner.invoke(args=['cleanup-otps', '--retention-days', '30'])
+
+    with app.app_context():
+        seed(get_user_by_phone('+2348000000702') or create_user('+2348000000702'))
+
+    result = runner.invoke(args=['cleanup-otps', '--retention-days', '30', '--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == 'Expired 4 OTPs, deleted 5 OTPs', result.output
+    print("✅ CLI reports the expired and deleted counts")
+
+def main():
+    print("🧪 Testing OTP Cleanup\n")
+
+    test_expire_then_delete()
+    test_cli()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test the SQL profiler's repeated (N+1) and slow statement detection
+"""
+
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import jsonify
+
+from models.user import OTP, Transaction, TransactionType, create_transaction, create_user
+from handlers.transaction import handle_bitnob_webhook
+from services.bitnob_service import BitnobService
+from utils.query_profiler import init_query_profiling, query_profiler
+from conftest import create_app
+
+def add_routes(app):
+    @app.route('/transactions/phones')
+    def transaction_phones():
+        # One lazy load of the user per transaction
+        return jsonify([transaction.user.phone_number for transaction in Transaction.query.all()])
+
+    @app.route('/webhook/completed/<bitnob_tx_id>', methods=['POST'])
+    def transaction_completed(bitnob_tx_id):
+        bitnob = BitnobService('key', 'secret', 'http://127.0.0.1:9')
+        return jsonify(handle_bitnob_webhook({'event': 'transaction.completed', 'data': {'id': bitnob_tx_id}}, bitnob))
+
+def seed(app):
+    with app.app_context():
+        for index in range(3):
+            user = create_user(f'+23480000001{index}')
+            create_transaction(user.id, TransactionType.SEND, 0.001, reference_number=f'TXN-PROFILE-{index}',
+                               bitnob_transaction_id=f'bitnob-profile-{index}')
+        OTP(user_id=user.id, code='123456', purpose='transaction',
+            expires_at=datetime.utcnow() + timedelta(minutes=5)).save()
+
+def test_repeated_queries_flagged():
+    print("=== Testing N+1 Detection ===")
+    report_path = os.path.join(tempfile.mkdtemp(), 'queries-{pid}.json')
+    query_profiler.configure(report_path, slow_query_ms=1000, repeat_threshold=2)
+    try:
+        app = create_app(init_query_profiling, add_routes)
+        seed(app)
+        client = app.test_client()
+
+        assert client.get('/transactions/phones').status_code == 200
+        endpoint = query_profiler.report()['endpoints']['GET /transactions/phones']
+        assert endpoint['requests'] == 1 and endpoint['queries'] == 4, endpoint
+        (statement, repeated), = endpoint['repeated'].items()
+        assert 'FROM users' in statement and repeated['max_per_request'] == 3, repeated
+        (call_site, count), = repeated['call_sites'].items()
+        assert call_site.startswith('test_query_profiler.py:') and count == 3, repeated
+        print("✅ Lazy loads in a loop flagged with their call site")
+
+        assert client.post('/webhook/completed/bitnob-profile-0').get_json()['success']
+        endpoint = query_profiler.report()['endpoints']['POST /webhook/completed/<bitnob_tx_id>']
+        selects = [statement for statement in endpoint['statements'] if statement.startswith('SELECT')]
+        assert len(selects) == 1 and 'JOIN users' in selects[0], selects
+        assert not endpoint['repeated'], endpoint['repeated']
+        print("✅ Transaction webhooks load the user in the same query")
+
+        with app.app_context():
+            otp = OTP.query.first()
+            with query_profiler.profile('otp repr'):
+                assert 'for user' in repr(otp) and otp.code not in repr(otp)
+        assert query_profiler.report()['endpoints']['otp repr']['queries'] == 0
+        print("✅ OTP repr issues no query")
+
+        query_profiler.configure(report_path, slow_query_ms=0, repeat_threshold=2)
+        assert client.get('/transactions/phones').status_code == 200
+        slow = query_profiler.report()['endpoints']['GET /transactions/phones']['slow']
+        assert len(slow) == 2 and sum(entry['count'] for entry in slow.values()) == 4, slow
+        print("✅ Statements over the slow threshold reported")
+
+        query_profiler.write_report()
+        with open(report_path.replace('{pid}', str(os.getpid()))) as report_file:
+            written = json.load(report_file)
+        assert 'GET /transactions/phones' in written['endpoints'] and written['pid'] == os.getpid()
+        print("✅ Per-endpoint report written per worker")
+    finally:
+        query_profiler.configure(None)
+
+    client.get('/transactions/phones')
+    assert query_profiler.report()['endpoints'] == {}
+    print("✅ Nothing recorded while profiling is off")
+
+def main():
+    print("🧪 Testing Query Profiler\n")
+
+    test_repeated_queries_flagged()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
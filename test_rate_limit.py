@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test the sliding-window rate limiter and its shared backends
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from models.database import init_db
+from utils.helpers import RateLimiter
+from utils.rate_limit import (
+    slide_window, MemoryRateLimitBackend, SQLiteRateLimitBackend, DatabaseRateLimitBackend
+)
+
+def test_sliding_window():
+    """Previous window hits count in proportion to their overlap"""
+    print("=== Testing Sliding Window ===")
+
+    # Halfway through window 10 with 10 hits in window 9: 5 still count
+    allowed, state = slide_window((9, 10, 0), 10, 1.0, 10.5)
+    assert allowed and state == (10, 1, 10)
+
+    allowed, state = slide_window((10, 5, 10), 10, 1.0, 10.5)
+    assert not allowed and state == (10, 5, 10), "Denied hits must not be counted"
+
+    allowed, state = slide_window((7, 10, 10), 10, 1.0, 10.5)
+    assert allowed and state == (10, 1, 0), "Stale windows must be forgotten"
+    print("✅ Sliding window estimate")
+
+def test_memory_backend():
+    """In-process limiter enforces the limit and evicts idle keys"""
+    print("\n=== Testing Memory Backend ===")
+
+    limiter = RateLimiter(MemoryRateLimitBackend(max_keys=3))
+    results = [limiter.is_allowed('a', max_attempts=5, window_minutes=1) for _ in range(8)]
+    assert results == [True] * 5 + [False] * 3, results
+    print("✅ Limit enforced")
+
+    for key in 'bcd':
+        limiter.is_allowed(key)
+    assert 'a' not in limiter.backend._counters and len(limiter.backend._counters) == 3
+    print("✅ Least recently used key evicted at max_keys")
+
+    backend = MemoryRateLimitBackend()
+    backend.hit('idle', 5, 0.05)
+    time.sleep(0.15)
+    backend.hit('active', 5, 60)
+    assert 'idle' not in backend._counters
+    print("✅ Idle key evicted")
+
+def test_sqlite_backend_shared_by_workers():
+    """Separate SQLite backends on one file share one limit"""
+    print("\n=== Testing SQLite Backend ===")
+
+    path = os.path.join(tempfile.mkdtemp(), 'rate_limit.db')
+    workers = [SQLiteRateLimitBackend(path) for _ in range(3)]
+
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        results = list(executor.map(lambda i: workers[i % 3].hit('phone', 10, 60), range(40)))
+
+    assert sum(results) == 10, sum(results)
+    print("✅ 10 of 40 concurrent hits allowed across 3 workers")
+
+def test_database_backend():
+    """Database backend keeps one limit under concurrent updates"""
+    print("\n=== Testing Database Backend ===")
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'app.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+
+    backend = DatabaseRateLimitBackend()
+
+    def hit(_):
+        with app.app_context():
+            return backend.hit('phone', 10, 60)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(hit, range(30)))
+
+    assert sum(results) == 10, sum(results)
+    print("✅ 10 of 30 concurrent hits allowed")
+
+def main():
+    print("🧪 Testing Rate Limiter\n")
+
+    test_sliding_window()
+    test_memory_backend()
+    test_sqlite_backend_shared_by_workers()
+    test_database_backend()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test the background BTC rate and fee estimate cache
+"""
+
+import os
+import sys
+import time
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import BitnobStub
+from services.bitnob_service import BitnobService
+from services.rates_service import RatesService
+from handlers.transaction import TransactionHandler
+from utils.circuit_breaker import circuit_breakers
+from utils.retry import RetryPolicy
+
+class TieredFeeStub(BitnobStub):
+    """Charges a bigger fee for bigger amounts"""
+
+    def route(self, method, path, body):
+        if path == '/api/v1/transactions/estimate-fee':
+            return 200, {'data': {'fee': '0.00002' if float(body['amount']) > 0.01 else '0.00001'}}
+        return super().route(method, path, body)
+
+def make_service(stub):
+    return BitnobService('key', 'secret', stub.url, retry_policy=RetryPolicy(max_retries=0))
+
+def test_reads_from_memory():
+    print("=== Testing In-Memory Reads ===")
+    stub = TieredFeeStub().start()
+    rates = RatesService(make_service(stub), currencies=['usd', 'NGN'], fee_tiers=[0.01, 0.1])
+
+    assert rates.get_rate('USD') is None and rates.estimate_fee(0.001) is None
+    assert rates.refresh() == {'rates': 2, 'fees': 2}
+    calls = sum(stub.calls.values())
+
+    assert rates.get_rate('usd') == 65000
+    assert rates.estimate_fee(0.005) == 0.00001
+    assert rates.estimate_fee(0.05) == 0.00002
+    assert rates.estimate_fee(5) == 0.00002, "Amounts above every tier use the largest"
+    assert sum(stub.calls.values()) == calls
+    print("✅ Rates and tiered fees served without calling Bitnob")
+
+    started = time.perf_counter()
+    for _ in range(10000):
+        rates.estimate_fee(0.05)
+    per_read = (time.perf_counter() - started) / 10000
+    assert per_read < 50e-6, per_read
+    print(f"✅ {per_read * 1e6:.1f}µs per fee read")
+
+    handler = TransactionHandler(rates.bitnob_service, None, None, rates_service=rates)
+    assert handler._estimate_transaction_fee(0.05) == 0.00002
+    assert sum(stub.calls.values()) == calls
+    print("✅ Transaction handler uses the cached fee")
+    stub.stop()
+
+def test_failed_refresh_keeps_values():
+    print("\n=== Testing Failed Refresh ===")
+    stub = BitnobStub().start()
+    rates = RatesService(make_service(stub), fee_tiers=[0.01], max_age=0.5)
+    rates.refresh()
+
+    stub.error_rate = 1.0
+    assert rates.refresh() == {'rates': 0, 'fees': 0}
+    assert rates.get_rate() == 65000 and rates.estimate_fee(0.001) == 0.00001
+    time.sleep(0.6)
+    snapshot = rates.snapshot()
+    assert snapshot['rates']['USD']['stale'] and snapshot['fees']['0.01']['stale']
+    print("✅ Last good values kept and flagged stale")
+
+    assert rates.estimate_fee(0.001) is None
+    handler = TransactionHandler(rates.bitnob_service, None, None, rates_service=rates)
+    stub.error_rate = 0
+    calls = stub.calls['POST /api/v1/transactions/estimate-fee']
+    assert handler._estimate_transaction_fee(0.001) == 0.00001
+    assert stub.calls['POST /api/v1/transactions/estimate-fee'] == calls + 1
+    print("✅ Stale fee tiers not used; the handler asks Bitnob instead")
+    stub.stop()
+    circuit_breakers.reset()
+
+def test_background_refresh():
+    print("\n=== Testing Background Refresh ===")
+    stub = BitnobStub().start()
+    rates = RatesService(make_service(stub), fee_tiers=[0.01], refresh_interval=0.05)
+    rates.start()
+    time.sleep(0.2)
+    rates.stop()
+
+    assert rates.get_rate() == 65000
+    assert stub.calls['GET /api/v1/rates'] >= 2
+    print(f"✅ Refreshed {stub.calls['GET /api/v1/rates']} times in the background")
+    stub.stop()
+
+def main():
+    print("🧪 Testing Rates Service\n")
+
+    test_reads_from_memory()
+    test_failed_refresh_keeps_values()
+    test_background_refresh()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test the transaction reconciler: keyset paging, rate budget, commits and drift
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from prometheus_client import REGISTRY
+from sqlalchemy import event
+
+from load_test import BitnobStub
+from models.database import db
+from models.user import Transaction, TransactionStatus, TransactionType, create_transaction, create_user
+from services.bitnob_service import BitnobService
+from services.reconciler import RateBudget, create_transaction_reconciler
+from utils.retry import RetryPolicy
+from conftest import create_app
+
+class StatusStub(BitnobStub):
+    """Answers transaction lookups with the status set for each id (pending by default)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statuses = {}
+        self.looked_up = []
+
+    def route(self, method, path, body):
+        if method == 'GET' and path.startswith('/api/v1/transactions/'):
+            bitnob_id = path.rsplit('/', 1)[-1]
+            with self._lock:
+                self.looked_up.append(bitnob_id)
+            return 200, {'data': {'id': bitnob_id, 'status': self.statuses.get(bitnob_id, 'pending')}}
+        return super().route(method, path, body)
+
+def make_reconciler(stub, **kwargs):
+    service = BitnobService('key', 'secret', stub.url, retry_policy=RetryPolicy(max_retries=0))
+    kwargs.setdefault('requests_per_second', 0)
+    return create_transaction_reconciler(service, **kwargs)
+
+def seed(user, count, created_at, status=TransactionStatus.PENDING, prefix='rec'):
+    for index in range(count):
+        create_transaction(user.id, TransactionType.SEND, 0.001, reference_number=f'TXN-{prefix.upper()}-{index}',
+                           bitnob_transaction_id=f'{prefix}-{index}', status=status, created_at=created_at)
+
+def test_keyset_paging():
+    print("=== Testing Keyset Paging ===")
+    stub = StatusStub().start()
+    app = create_app()
+    with app.app_context():
+        user = create_user('+2348000000601')
+        # Rows sharing one created_at, so pages can only be told apart by id
+        seed(user, 7, datetime.utcnow() - timedelta(hours=1))
+        seed(user, 1, datetime.utcnow(), prefix='fresh')
+
+        commits = []
+        record_commit = lambda session: commits.append(session)
+        event.listen(db.session, 'after_commit', record_commit)
+        try:
+            stats = make_reconciler(stub, page_size=3).reconcile()
+        finally:
+            event.remove(db.session, 'after_commit', record_commit)
+
+        assert sorted(stub.looked_up) == [f'rec-{index}' for index in range(7)], stub.looked_up
+        assert stats['scanned'] == 7 and stats['pages'] == 3 and stats['unchanged'] == 7, stats
+        print("✅ Rows with equal created_at paged by id, each looked up once; fresh rows skipped")
+
+        assert len(commits) == stats['pages'], commits
+        print("✅ One commit per page")
+
+    stub.stop()
+
+def test_drift():
+    print("\n=== Testing Drift ===")
+    stub = StatusStub().start()
+    app = create_app()
+    with app.app_context():
+        user = create_user('+2348000000602')
+        created_at = datetime.utcnow() - timedelta(hours=1)
+        seed(user, 4, created_at)
+        seed(user, 1, created_at, status=TransactionStatus.PROCESSING, prefix='proc')
+        stub.statuses.update({'rec-1': 'processing', 'rec-2': 'completed', 'rec-3': 'failed', 'proc-0': 'processing'})
+
+        drift_before = {status: REGISTRY.get_sample_value('satchat_reconciler_drift_total', {'status': status}) or 0
+                        for status in ('processing', 'completed', 'failed')}
+        stats = make_reconciler(stub).reconcile()
+        assert (stats['completed'], stats['failed'], stats['unchanged']) == (1, 1, 3), stats
+        assert stats['drift'] == 3, stats
+        settled = {tx.bitnob_transaction_id: tx.status for tx in Transaction.query}
+        assert settled['rec-2'] == TransactionStatus.COMPLETED and settled['rec-1'] == TransactionStatus.PENDING
+        print("✅ Drift counts every row whose status differs from Bitnob's, settled or not")
+
+        assert stats['drift_by_status'] == {'processing': 1, 'completed': 1, 'failed': 1}, stats
+        for status, count in stats['drift_by_status'].items():
+            sample = REGISTRY.get_sample_value('satchat_reconciler_drift_total', {'status': status})
+            assert sample - drift_before[status] == count, (status, sample)
+        assert REGISTRY.get_sample_value('satchat_reconciler_max_lag_seconds') == stats['max_lag_seconds'] >= 3600
+        print("✅ Lag and drift by Bitnob status exported as metrics")
+
+    stub.stop()
+
+def test_rate_budget():
+    print("\n=== Testing Rate Budget ===")
+    budget = RateBudget(requests_per_second=50)
+    calls = []
+
+    def call():
+        for _ in range(3):
+            budget.acquire()
+            calls.append(time.monotonic())
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    calls.sort()
+    gaps = [later - earlier for earlier, later in zip(calls, calls[1:])]
+    assert len(calls) == 12 and calls[-1] - calls[0] >= 11 * 0.02 * 0.95, gaps
+    print("✅ Calls from several threads spaced to the shared rate")
+
+    unlimited = RateBudget(requests_per_second=0)
+    started = time.monotonic()
+    for _ in range(100):
+        unlimited.acquire()
+    assert unlimited.interval == 0 and time.monotonic() - started < 1
+    print("✅ A rate of 0 disables throttling")
+
+def main():
+    print("🧪 Testing Transaction Reconciler\n")
+
+    test_keyset_paging()
+    test_drift()
+    test_rate_budget()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test the concurrent Bitnob registration pipeline and resuming a failed registration
+"""
+
+import os
+import sys
+import threading
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import BitnobStub
+from models.user import create_user, get_user_by_phone
+from services.bitnob_service import BitnobService, create_bitnob_account
+from handlers.commands import CommandHandler
+from utils.circuit_breaker import circuit_breakers
+from utils.retry import RetryPolicy
+from conftest import create_app
+
+class FlakyAddressStub(BitnobStub):
+    """Fails address generation while fail_addresses is set"""
+
+    fail_addresses = False
+
+    def route(self, method, path, body):
+        if self.fail_addresses and path == '/api/v1/addresses/generate':
+            return 500, {'message': 'address service down'}
+        return super().route(method, path, body)
+
+class OverlapStub(BitnobStub):
+    """Holds the customer and wallet calls until both have arrived, so they only finish if they overlap
+
+    Records when each call starts and ends, to check the address waits for the customer.
+    """
+
+    STEPS = {('POST', '/api/v1/customers'), ('GET', '/api/v1/wallets')}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.barrier = threading.Barrier(len(self.STEPS))
+        self.events = []
+
+    def route(self, method, path, body):
+        self.events.append(('start', path))
+        try:
+            if (method, path) in self.STEPS:
+                try:
+                    self.barrier.wait(timeout=5)
+                except threading.BrokenBarrierError:
+                    return 504, {'message': 'steps ran one after another'}
+            return super().route(method, path, body)
+        finally:
+            self.events.append(('end', path))
+
+def make_service(stub):
+    return BitnobService('key', 'secret', stub.url, retry_policy=RetryPolicy(max_retries=0))
+
+def test_steps_overlap():
+    print("=== Testing Concurrent Steps ===")
+    stub = OverlapStub().start()
+    service = make_service(stub)
+
+    account = create_bitnob_account(service, 'Amara Okafor', 'amara@example.com', '+2348000000001')
+    assert account and account['customer_id'] and account['bitcoin_address'], account
+    assert not stub.barrier.broken
+    print("✅ Customer creation and the wallet lookup were in flight at once")
+
+    customer_done = stub.events.index(('end', '/api/v1/customers'))
+    assert stub.events.index(('start', '/api/v1/addresses/generate')) > customer_done, stub.events
+    print("✅ The address was generated only after the customer existed")
+
+    # The wallet id is cached now, so customer creation has nothing to overlap with
+    stub.barrier = threading.Barrier(1)
+    create_bitnob_account(service, 'Kofi Mensah', 'kofi@example.com', '+2348000000002')
+    assert stub.calls['GET /api/v1/wallets'] == 1
+    print("✅ Company wallet id looked up once")
+    stub.stop()
+
+def test_retry_resumes():
+    print("\n=== Testing Resumed Registration ===")
+    stub = FlakyAddressStub().start()
+    stub.fail_addresses = True
+    handler = CommandHandler(make_service(stub), None, None)
+
+    app = create_app()
+    with app.app_context():
+        user = create_user('+2348000000003', full_name='Zola Dlamini', email='zola@example.com')
+
+        reply = handler._complete_bitnob_registration(user)
+        assert 'Failed to create your Bitcoin wallet' in reply, reply
+        user = get_user_by_phone('+2348000000003')
+        assert user.bitnob_customer_id == 'cus_1' and user.bitnob_wallet_id == 'wallet-btc-1'
+        assert not user.bitcoin_address and not user.is_kyc_completed
+        print("✅ Finished steps saved after a failure")
+
+        stub.fail_addresses = False
+        reply = handler.handle_message('+2348000000003', 'YES')
+        user = get_user_by_phone('+2348000000003')
+        assert user.is_kyc_completed and user.bitcoin_address in reply, reply
+        assert stub.calls['POST /api/v1/customers'] == 1
+        assert user.bitnob_customer_id == 'cus_1'
+        print("✅ Retry only redid the failed step")
+
+    stub.stop()
+    circuit_breakers.reset()
+
+def main():
+    print("🧪 Testing Registration Pipeline\n")
+
+    test_steps_overlap()
+    test_retry_resumes()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
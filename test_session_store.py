@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test the conversation session store and that session steps no longer write the users table
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import BitnobStub
+from models.user import get_user_by_phone, user_identity_cache
+from services.bitnob_service import BitnobService
+from handlers.commands import CommandHandler
+from utils.retry import RetryPolicy
+from utils.session_store import (
+    MemorySessionBackend, SQLiteSessionBackend, DatabaseSessionBackend, session_store
+)
+from conftest import create_app, count_queries
+
+PHONE = '+2348000000020'
+
+def check_backend(backend):
+    assert backend.get('k') is None
+    backend.set('k', ('awaiting_otp', '{"transaction_id":"t1"}'), 60)
+    assert backend.get('k') == ('awaiting_otp', '{"transaction_id":"t1"}')
+    backend.set('k', ('awaiting_email', None), 60)
+    assert backend.get('k') == ('awaiting_email', None)
+    backend.delete('k')
+    assert backend.get('k') is None
+
+    backend.set('abandoned', ('awaiting_name', None), 0.05)
+    time.sleep(0.1)
+    assert backend.get('abandoned') is None
+
+def test_backends():
+    print("=== Testing Session Backends ===")
+    check_backend(MemorySessionBackend())
+    print("✅ Memory backend")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        check_backend(SQLiteSessionBackend(os.path.join(workdir, 'sessions.db')))
+    print("✅ SQLite backend")
+
+    app = create_app()
+    with app.app_context():
+        check_backend(DatabaseSessionBackend())
+    print("✅ Database backend")
+
+    backend = MemorySessionBackend(max_keys=2)
+    for key in 'abc':
+        backend.set(key, ('awaiting_name', None), 60)
+    assert backend.get('a') is None and backend.get('c')
+    print("✅ Memory backend bounded")
+
+def test_session_steps_skip_users_table():
+    print("\n=== Testing Users Table Writes ===")
+    session_store.use_backend(MemorySessionBackend())
+    user_identity_cache.clear()
+    stub = BitnobStub().start()
+    handler = CommandHandler(BitnobService('key', 'secret', stub.url, retry_policy=RetryPolicy(max_retries=0)), None, None)
+
+    app = create_app()
+    with app.app_context():
+        with count_queries() as statements:
+            handler.handle_message(PHONE, 'YES')
+            handler.handle_message(PHONE, 'Amara Okafor')
+            handler.handle_message(PHONE, 'amara@example.com')
+        user = get_user_by_phone(PHONE)
+        assert user.is_kyc_completed and user.current_session_state is None
+        user_updates = [s for s in statements if s.startswith('UPDATE users')]
+        print(f"✅ Registration issued {len(user_updates)} users updates, none for session steps")
+        assert all('current_session_state' not in s for s in user_updates)
+
+        user.update_session('awaiting_otp', '{"transaction_id":"t1"}')
+        assert session_store.get(PHONE) == ('awaiting_otp', '{"transaction_id":"t1"}')
+        assert get_user_by_phone(PHONE).session_data == '{"transaction_id":"t1"}'
+        user.clear_session()
+        print("✅ Session read and written through the User properties")
+
+        handler.handle_message(PHONE, 'Balance')
+        with count_queries() as statements:
+            reply = handler.handle_message(PHONE, 'Balance')
+            assert 'Balance' in reply or 'balance' in reply, reply
+            handler.handle_message(PHONE, 'Address')
+        assert statements == [], statements
+        print("✅ Balance and Address turns served without a database read")
+
+    stub.stop()
+
+def main():
+    print("🧪 Testing Session Store\n")
+
+    test_backends()
+    test_session_steps_skip_users_table()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test the running counters behind /api/stats
+"""
+
+import os
+import sys
+from datetime import datetime
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+
+from models.database import db, unit_of_work
+from models.stats import StatsCounter, ensure_stats_counters, get_stats_summary, rebuild_stats_counters
+from models.user import create_user, create_transaction, TransactionType
+from conftest import create_app, count_queries
+
+def counters():
+    return {row.name: row.value for row in StatsCounter.query if row.value}
+
+def test_counters_follow_writes():
+    print("=== Testing Incremental Counters ===")
+    app = create_app()
+    with app.app_context():
+        alice = create_user('+2348000000051')
+        create_user('+2348000000052')
+        alice.is_kyc_completed = True
+        alice.save()
+
+        with unit_of_work():
+            sent = create_transaction(alice.id, TransactionType.SEND, 0.0015, reference_number='TXN-STATS-1')
+            received = create_transaction(alice.id, TransactionType.RECEIVE, 0.25, reference_number='TXN-STATS-2')
+            create_transaction(alice.id, TransactionType.SEND, 0.1, reference_number='TXN-STATS-3')
+        sent.mark_completed()
+        received.mark_completed()
+        received.mark_failed('reversed')
+
+        stats = get_stats_summary()
+        assert (stats['total_users'], stats['active_users'], stats['total_transactions']) == (2, 1, 3)
+        assert stats['transactions_by_status'] == {
+            'pending': 1, 'processing': 0, 'completed': 1, 'failed': 1, 'cancelled': 0
+        }, stats['transactions_by_status']
+        assert stats['transactions_by_type'] == {'send': 2, 'receive': 1, 'buy': 0, 'sell': 0}
+        today = stats['daily_volume'][0]
+        assert today == {'date': datetime.utcnow().date().isoformat(), 'count': 1, 'amount': 0.0015}, today
+        print("✅ Users, KYC, inserts and status changes counted; failed rows leave the volume")
+
+        try:
+            with unit_of_work():
+                create_transaction(alice.id, TransactionType.SEND, 1, reference_number='TXN-STATS-4')
+                raise RuntimeError('request failed')
+        except RuntimeError:
+            pass
+        assert get_stats_summary()['total_transactions'] == 3
+        print("✅ Rolled back writes are not counted")
+
+        incremental = counters()
+        rebuild_stats_counters()
+        assert counters() == incremental, (counters(), incremental)
+        print("✅ Rebuild from the tables matches the running counters")
+
+        with count_queries() as statements:
+            get_stats_summary()
+        assert len(statements) == 1 and 'COUNT(' not in statements[0].upper(), statements
+        print("✅ Stats read with one primary-key lookup")
+
+def test_first_build_race():
+    print("\n=== Testing First Build Race ===")
+    app = create_app()
+    with app.app_context():
+        create_user('+2348000000053')
+        StatsCounter.query.delete()
+        db.session.commit()
+
+        raced = []
+
+        def other_worker_built(session, flush_context, instances):
+            # Another worker commits its counters between our delete and our insert
+            if not raced:
+                raced.append(True)
+                session.execute(StatsCounter.__table__.insert().values(name='users', value=1))
+
+        event.listen(db.session, 'before_flush', other_worker_built)
+        try:
+            ensure_stats_counters()
+        finally:
+            event.remove(db.session, 'before_flush', other_worker_built)
+        assert raced
+        assert not db.session.new
+        create_user('+2348000000054')
+        print("✅ The losing worker rolls back instead of failing to start")
+
+        ensure_stats_counters()
+        rebuild_stats_counters()
+        assert get_stats_summary()['total_users'] == 2
+        print("✅ Counters that exist are left alone")
+
+def main():
+    print("🧪 Testing Stats Counters\n")
+
+    test_counters_follow_writes()
+    test_first_build_race()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test the trace spans around message handling and the offline trace summary
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+import trace_summary
+from load_test import BitnobStub
+from services.bitnob_service import BitnobService
+from handlers.commands import CommandHandler
+from utils.retry import RetryPolicy
+from utils.session_store import MemorySessionBackend, session_store
+from utils.tracing import FileSpanExporter, get_current_span, init_tracing, tracer
+from conftest import create_app
+
+PHONE = '+2348000000071'
+
+def read_traces(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as trace_file:
+        return [json.loads(line) for line in trace_file]
+
+def span_names(trace):
+    return {span['name'] for span in trace['spans']}
+
+def test_tracing_off_by_default():
+    print("=== Testing No-op Default ===")
+    assert tracer.exporter is None
+    with tracer.start_as_current_span('handle_message') as span:
+        span.set_trace_attribute('intent', 'balance')
+        assert not span.is_recording() and not get_current_span().is_recording()
+    print("✅ Spans are no-ops until an exporter is set")
+
+def test_handle_message_spans():
+    print("\n=== Testing Message Handling Spans ===")
+    session_store.use_backend(MemorySessionBackend())
+    stub = BitnobStub().start()
+    bitnob = BitnobService('key', 'secret', stub.url, retry_policy=RetryPolicy(max_retries=0))
+    handler = CommandHandler(bitnob, None, None)
+    exporter = FileSpanExporter(os.path.join(tempfile.mkdtemp(), 'traces-{pid}.jsonl'))
+    assert str(os.getpid()) in exporter.path
+
+    app = create_app(init_tracing)
+    tracer.use_exporter(exporter)
+    try:
+        with app.app_context():
+            for message in ('Hi', 'YES', 'Amara Okafor', 'amara@example.com'):
+                handler.handle_message(PHONE, message)
+            bitnob.invalidate_wallet_cache()
+            handler.handle_message(PHONE, 'balance')
+
+        traces = read_traces(exporter.path)
+        assert [trace['name'] for trace in traces] == ['handle_message'] * 5, [trace['name'] for trace in traces]
+        greeting, _, name_step, email_step, balance = traces
+
+        assert {'normalize', 'detect_intent', 'session.get', 'db.get_user', 'handle_intent'} <= span_names(greeting)
+        assert 'handle_session_state' in span_names(name_step)
+        for span in name_step['spans']:
+            assert span['attributes']['intent'] == 'name_input', span
+            assert span['attributes']['session.state'] == 'awaiting_name', span
+        print("✅ Each stage is a span carrying the intent and session state")
+
+        spans = {span['span_id']: span for span in email_step['spans']}
+        registration = [span for span in spans.values() if span['name'] == 'bitnob.accounts POST']
+        assert registration, span_names(email_step)
+        for span in registration:
+            parent = spans[span['parent_id']]
+            while parent['parent_id']:
+                parent = spans[parent['parent_id']]
+            assert parent['name'] == 'handle_message'
+        assert 'bitnob.wallets GET' in span_names(balance), span_names(balance)
+        print("✅ Bitnob calls nest under the turn, including concurrent registration steps")
+
+        with app.test_request_context('/webhook/twilio', method='POST'):
+            app.preprocess_request()
+            handler.handle_message(PHONE, 'Hi')
+            app.do_teardown_request()
+        request_trace = read_traces(exporter.path)[-1]
+        assert request_trace['name'] == 'POST unmatched' and 'handle_message' in span_names(request_trace)
+        print("✅ Request spans wrap message handling")
+
+        handler._handle_intent = None
+        handler.handle_message(PHONE, 'help')
+        failed = [span for span in read_traces(exporter.path)[-1]['spans'] if span['name'] == 'handle_message'][0]
+        assert failed['status'] == 'error' and failed['attributes']['exception.type'] == 'TypeError', failed
+        print("✅ Exceptions are recorded on the span")
+    finally:
+        tracer.use_exporter(None)
+        stub.stop()
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        trace_summary.main([exporter.path, '--top', '2', '--name', 'handle_message'])
+    report = output.getvalue()
+    assert 'Slowest 2' in report and 'handle_session_state' in report and 'bitnob.accounts POST' in report, report
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        trace_summary.main([exporter.path, '--intent', 'email_input', '--folded'])
+    stacks = output.getvalue().splitlines()
+    assert stacks and all(line.startswith('handle_message') for line in stacks), stacks
+    assert any(line.startswith('handle_message;handle_session_state;') for line in stacks), stacks
+    print("✅ Trace summary prints the slowest turns and folded stacks")
+
+def main():
+    print("🧪 Testing Tracing\n")
+
+    test_tracing_off_by_default()
+    test_handle_message_spans()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
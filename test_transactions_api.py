@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test the keyset-paginated and NDJSON transaction history API
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.database import db
+from models.user import create_user, iter_user_transactions, Transaction, TransactionStatus, TransactionType
+from utils.helpers import decode_cursor, encode_cursor
+from conftest import import_app
+
+PHONE = '+2348000000041'
+COUNT = 25
+
+def seed(user_id):
+    """COUNT transactions, in pairs sharing a created_at so the id tiebreak matters"""
+    started = datetime(2024, 1, 1)
+    for i in range(COUNT):
+        db.session.add(Transaction(
+            user_id=user_id,
+            transaction_type=TransactionType.SEND if i % 2 else TransactionType.RECEIVE,
+            status=TransactionStatus.COMPLETED if i % 3 else TransactionStatus.FAILED,
+            amount=0.001 * (i + 1),
+            reference_number=f'TXN-API-{i:03d}',
+            created_at=started + timedelta(hours=i // 2)
+        ))
+    db.session.commit()
+
+def test_transactions_api():
+    print("=== Testing Transactions API ===")
+    app = import_app().app
+
+    with app.app_context():
+        user = create_user(PHONE)
+        user.is_kyc_completed = True
+        user.save()
+        seed(user.id)
+        expected = [tx.id for tx in Transaction.query.filter_by(user_id=user.id).order_by(
+            Transaction.created_at.desc(), Transaction.id.desc()
+        )]
+        assert [tx.id for tx in iter_user_transactions(user.id, page_size=4)] == expected
+
+    client = app.test_client()
+    url = f'/api/user/{PHONE}/transactions'
+
+    seen = []
+    cursor = None
+    while True:
+        body = client.get(url, query_string={'limit': 10, 'cursor': cursor or ''}).get_json()
+        seen += [tx['id'] for tx in body['transactions']]
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    assert seen == expected, "Pages must cover every row once, newest first"
+    assert set(body['transactions'][0]) >= {'id', 'type', 'status', 'amount', 'fee', 'reference', 'created_at'}
+    print(f"✅ {COUNT} transactions paged by cursor without gaps or repeats")
+
+    body = client.get(url, query_string={'status': 'failed', 'type': 'receive'}).get_json()
+    assert body['count'] > 0
+    assert all(tx['status'] == 'failed' and tx['type'] == 'receive' for tx in body['transactions'])
+
+    body = client.get(url, query_string={'since': '2024-01-02T00:00:00Z', 'until': '2024-01-01T06:00:00'}).get_json()
+    assert body['count'] == 0
+    body = client.get(url, query_string={'since': '2024-01-01T02:00:00', 'until': '2024-01-01T04:00:00'}).get_json()
+    assert body['count'] == 4
+    print("✅ Status, type and date range filters")
+
+    response = client.get(url, query_string={'format': 'ndjson'}, buffered=False)
+    assert response.is_streamed and response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['id'] for line in lines] == expected
+
+    resumed = client.get(url, query_string={'format': 'ndjson', 'cursor': lines[9]['cursor'], 'limit': 5})
+    assert [json.loads(line)['id'] for line in resumed.get_data(as_text=True).splitlines()] == expected[10:15]
+    print("✅ NDJSON export streams every row and resumes from a line's cursor")
+
+    assert client.get(url, query_string={'cursor': 'not-a-cursor'}).status_code == 400
+    assert client.get(url, query_string={'status': 'lost'}).status_code == 400
+    assert client.get(url, query_string={'since': 'yesterday'}).status_code == 400
+    assert client.get(url, query_string={'limit': -1}).status_code == 400
+    print("✅ Bad cursors and filters refused")
+
+def test_cursor_round_trip():
+    print("\n=== Testing Cursor Encoding ===")
+    created_at = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    assert decode_cursor(encode_cursor(created_at, 'tx-1|2')) == (created_at, 'tx-1|2')
+    print("✅ Cursor round trip")
+
+def main():
+    print("🧪 Testing Transactions API\n")
+
+    test_transactions_api()
+    test_cursor_round_trip()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
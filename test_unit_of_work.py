@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test the deferred-commit unit of work and the per-request commit
+"""
+
+import os
+import sys
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import jsonify
+from sqlalchemy import event
+
+from models.database import db, in_unit_of_work, unit_of_work
+from models.user import User, create_user, get_user_by_phone
+from conftest import create_app
+
+def count_commits(app):
+    """Record every commit made on the app's sessions"""
+    commits = []
+    with app.app_context():
+        event.listen(db.session, 'after_commit', lambda session: commits.append(session))
+    return commits
+
+def add_routes(app):
+    @app.route('/users/<phone>', methods=['POST'])
+    def add_user(phone):
+        # Added but not flushed, so a duplicate only fails at the request's commit
+        db.session.add(User(phone_number=phone))
+        return jsonify({'status': 'saved', 'phone_number': phone})
+
+    @app.route('/users/<phone>/text', methods=['POST'])
+    def add_user_text(phone):
+        db.session.add(User(phone_number=phone))
+        return f"Saved {phone}"
+
+    @app.route('/users/<phone>/fail', methods=['POST'])
+    def add_user_then_fail(phone):
+        create_user(phone)
+        raise RuntimeError('handler failed after saving')
+
+def test_deferred_commit():
+    print("=== Testing Deferred Commit ===")
+    app = create_app()
+    commits = count_commits(app)
+    with app.app_context():
+        with unit_of_work():
+            create_user('+2348000000301')
+            create_user('+2348000000302')
+            assert in_unit_of_work() and not commits
+        assert len(commits) == 1 and not in_unit_of_work()
+        assert get_user_by_phone('+2348000000302')
+        print("✅ Saves inside a unit of work are committed once at its end")
+
+        with unit_of_work():
+            create_user('+2348000000303')
+            with unit_of_work():
+                create_user('+2348000000304')
+            assert in_unit_of_work() and len(commits) == 1
+        assert len(commits) == 2
+        print("✅ A nested unit of work commits with the outermost one")
+
+def test_rollback():
+    print("\n=== Testing Rollback ===")
+    app = create_app()
+    with app.app_context():
+        try:
+            with unit_of_work():
+                create_user('+2348000000311')
+                with unit_of_work():
+                    create_user('+2348000000312')
+                raise ValueError('turn failed')
+        except ValueError:
+            pass
+        assert not in_unit_of_work()
+        assert not get_user_by_phone('+2348000000311') and not get_user_by_phone('+2348000000312')
+        print("✅ An exception rolls back the whole unit, nested saves included")
+
+    client = create_app(add_routes).test_client()
+    assert client.post('/users/+2348000000313/fail').status_code == 500
+    with client.application.app_context():
+        assert not get_user_by_phone('+2348000000313')
+    print("✅ A request that raises is rolled back")
+
+def test_request_commit_failure():
+    print("\n=== Testing Request Commit Failure ===")
+    client = create_app(add_routes).test_client()
+
+    response = client.post('/users/+2348000000321')
+    assert response.status_code == 200 and response.json['status'] == 'saved'
+    with client.application.app_context():
+        assert get_user_by_phone('+2348000000321')
+    print("✅ Request changes committed after the view returns")
+
+    response = client.post('/users/+2348000000321')
+    assert response.status_code == 500 and response.json == {'error': 'Internal server error'}, response.json
+    response = client.post('/users/+2348000000321/text')
+    assert response.status_code == 500 and 'Saved' not in response.get_data(as_text=True)
+    print("✅ A failed commit replaces the success reply with an error")
+
+    assert client.post('/users/+2348000000322').status_code == 200
+    print("✅ The session is usable again after a failed commit")
+
+def main():
+    print("🧪 Testing Unit of Work\n")
+
+    test_deferred_commit()
+    test_rollback()
+    test_request_commit_failure()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test the cached user identity lookup and its invalidation
+"""
+
+import os
+import sys
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.database import unit_of_work
+from models.user import create_user, get_user_by_phone, get_user_identity, user_identity_cache
+from conftest import create_app, count_queries
+
+PHONE = '+2348000000010'
+
+def register(user):
+    user.bitnob_wallet_id = 'wallet-btc-1'
+    user.bitcoin_address = 'bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq'
+    user.is_kyc_completed = True
+    user.save()
+
+def test_cached_after_registration():
+    print("=== Testing Identity Cache ===")
+    user_identity_cache.clear()
+    app = create_app()
+    with app.app_context():
+        user = create_user(PHONE)
+
+        with count_queries() as statements:
+            assert get_user_identity(PHONE).is_kyc_completed is False
+            assert get_user_identity(PHONE).is_kyc_completed is False
+        assert len(statements) == 2, "Incomplete registrations are not cached"
+        print("✅ Users mid-registration always read from the database")
+
+        register(user)
+        with count_queries() as statements:
+            identity = get_user_identity(PHONE)
+            assert identity.is_kyc_completed and identity.bitnob_wallet_id == 'wallet-btc-1'
+            for _ in range(10):
+                assert get_user_identity(PHONE) == identity
+        assert len(statements) == 1, statements
+        print("✅ Registered users read once, then served from memory")
+
+        user.bitcoin_address = 'bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0'
+        user.save()
+        assert get_user_identity(PHONE).bitcoin_address == user.bitcoin_address
+        print("✅ User.save() invalidates the cached identity")
+
+def test_invalidated_on_commit():
+    print("\n=== Testing Deferred Commit ===")
+    user_identity_cache.clear()
+    app = create_app()
+    with app.app_context():
+        register(create_user(PHONE))
+
+        with unit_of_work():
+            user = get_user_by_phone(PHONE)
+            user.bitnob_wallet_id = 'wallet-btc-2'
+            user.save()
+
+            # A reader caching the flushed row mid-transaction must not outlive the commit
+            user_identity_cache.set(PHONE, get_user_identity(PHONE)._replace(bitnob_wallet_id='wallet-btc-1'))
+
+        assert get_user_identity(PHONE).bitnob_wallet_id == 'wallet-btc-2'
+        print("✅ Commit invalidates identities cached during the transaction")
+
+def main():
+    print("🧪 Testing User Identity Cache\n")
+
+    test_cached_after_registration()
+    test_invalidated_on_commit()
+
+    print("\n🎉 Testing complete!")
+
+if __name__ == '__main__':
+    main()
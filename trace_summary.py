@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Summarize the traces written by the file span exporter (TRACE_EXPORT_PATH)
+
+Prints the slowest turns as span trees with their own (self) time, then the
+time spent in each span name across every trace read. With --folded it prints
+folded stacks instead, ready for flamegraph.pl or speedscope.
+
+Usage:
+    python trace_summary.py traces/*.jsonl
+    python trace_summary.py traces/*.jsonl --top 5 --name "POST /webhook/twilio"
+    python trace_summary.py traces/*.jsonl --intent balance --folded > balance.folded
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+def load_traces(paths):
+    """Read every trace line, skipping any a crashed worker left half written"""
+    traces = []
+    for path in paths:
+        with open(path) as trace_file:
+            for line in trace_file:
+                try:
+                    traces.append(json.loads(line))
+                except ValueError:
+                    continue
+    return traces
+
+def span_tree(trace):
+    """Map each span id to its children (None for the root), ordered by start, and work out self times"""
+    children = defaultdict(list)
+    for span in trace['spans']:
+        children[span['parent_id']].append(span)
+    for siblings in children.values():
+        siblings.sort(key=lambda span: span['start_ms'])
+
+    self_ms = {
+        span['span_id']: max(0.0, span['duration_ms'] - sum(child['duration_ms'] for child in children[span['span_id']]))
+        for span in trace['spans']
+    }
+    return children, self_ms
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def print_trace(trace):
+    children, self_ms = span_tree(trace)
+    attributes = trace.get('attributes') or {}
+    labels = ', '.join(f"{key}={value}" for key, value in attributes.items() if value is not None)
+    print(f"\n{trace['duration_ms']:9.1f} ms  {trace['name']}  {labels}")
+
+    def walk(span, depth):
+        status = '  ❌' if span['status'] == 'error' else ''
+        print(f"{span['duration_ms']:9.1f} ms  (self {self_ms[span['span_id']]:7.1f})  {'  ' * depth}{span['name']}{status}")
+        for child in children[span['span_id']]:
+            walk(child, depth + 1)
+
+    for root in children[None]:
+        walk(root, 0)
+
+def aggregate(traces):
+    """Count, total and self time per span name"""
+    totals = defaultdict(list)
+    selves = defaultdict(float)
+    for trace in traces:
+        _, self_ms = span_tree(trace)
+        for span in trace['spans']:
+            totals[span['name']].append(span['duration_ms'])
+            selves[span['name']] += self_ms[span['span_id']]
+    return totals, selves
+
+def print_aggregate(traces):
+    totals, selves = aggregate(traces)
+    print(f"\n{'span':<40} {'count':>7} {'total ms':>11} {'self ms':>11} {'p50 ms':>9} {'p95 ms':>9}")
+    for name in sorted(totals, key=lambda name: selves[name], reverse=True):
+        durations = totals[name]
+        print(f"{name[:40]:<40} {len(durations):>7} {sum(durations):>11.1f} {selves[name]:>11.1f} "
+              f"{percentile(durations, 0.5):>9.1f} {percentile(durations, 0.95):>9.1f}")
+
+def folded_stacks(traces):
+    """Self time per call stack in microseconds, as 'root;child;leaf value' lines"""
+    stacks = defaultdict(float)
+    for trace in traces:
+        children, self_ms = span_tree(trace)
+
+        def walk(span, path):
+            path = path + [span['name'].replace(';', ',')]
+            stacks[';'.join(path)] += self_ms[span['span_id']] * 1000
+            for child in children[span['span_id']]:
+                walk(child, path)
+
+        for root in children[None]:
+            walk(root, [])
+    return [f"{stack} {int(round(micros))}" for stack, micros in sorted(stacks.items()) if micros >= 1]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize traces written to TRACE_EXPORT_PATH')
+    parser.add_argument('paths', nargs='+', help='Trace files (one JSON trace per line)')
+    parser.add_argument('--top', type=int, default=10, help='Slowest traces to print as span trees')
+    parser.add_argument('--name', help='Only traces with this root span name, e.g. "POST /webhook/twilio"')
+    parser.add_argument('--intent', help='Only traces with this intent attribute')
+    parser.add_argument('--folded', action='store_true', help='Print folded stacks for a flame graph instead')
+    args = parser.parse_args(argv)
+
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        print(f"❌ No such trace file: {', '.join(missing)}")
+        sys.exit(1)
+
+    traces = load_traces(args.paths)
+    if args.name:
+        traces = [trace for trace in traces if trace['name'] == args.name]
+    if args.intent:
+        traces = [trace for trace in traces if (trace.get('attributes') or {}).get('intent') == args.intent]
+
+    if args.folded:
+        print('\n'.join(folded_stacks(traces)))
+        return
+
+    if not traces:
+        print("No traces matched")
+        return
+
+    durations = [trace['duration_ms'] for trace in traces]
+    print(f"📊 {len(traces)} traces: p50 {percentile(durations, 0.5):.1f} ms, "
+          f"p95 {percentile(durations, 0.95):.1f} ms, max {max(durations):.1f} ms")
+
+    print(f"\n=== Slowest {min(args.top, len(traces))} ===")
+    for trace in sorted(traces, key=lambda trace: trace['duration_ms'], reverse=True)[:args.top]:
+        print_trace(trace)
+
+    print("\n=== Time by Span ===")
+    print_aggregate(traces)
+
+if __name__ == '__main__':
+    main()
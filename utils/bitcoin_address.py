@@ -0,0 +1,148 @@
+import hashlib
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+MAINNET = 'mainnet'
+TESTNET = 'testnet'
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+BASE58_INDEX = {char: index for index, char in enumerate(BASE58_ALPHABET)}
+
+# Base58Check version byte -> (network, address type)
+BASE58_VERSIONS = {
+    0x00: (MAINNET, 'legacy'),
+    0x05: (MAINNET, 'script'),
+    0x6f: (TESTNET, 'legacy'),
+    0xc4: (TESTNET, 'script'),
+}
+
+BECH32_CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+BECH32_INDEX = {char: index for index, char in enumerate(BECH32_CHARSET)}
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+SEGWIT_HRPS = {'bc': MAINNET, 'tb': TESTNET}
+
+UNSUPPORTED_FORMAT = 'Unsupported Bitcoin address format'
+
+class AddressInfo(NamedTuple):
+    """Result of checking one address; error is set when it is not valid"""
+    valid: bool
+    type: Optional[str] = None  # legacy, script, bech32 (SegWit v0) or bech32m (v1+)
+    network: Optional[str] = None
+    witness_version: Optional[int] = None
+    error: Optional[str] = None
+
+def _invalid(error: str) -> AddressInfo:
+    return AddressInfo(False, error=error)
+
+def b58decode_check(address: str) -> Optional[bytes]:
+    """Decode a Base58Check string to its payload (version byte included), or None if malformed"""
+    number = 0
+    for char in address:
+        index = BASE58_INDEX.get(char)
+        if index is None:
+            return None
+        number = number * 58 + index
+
+    # Each leading '1' encodes a leading zero byte
+    leading_zeros = len(address) - len(address.lstrip('1'))
+    raw = number.to_bytes((number.bit_length() + 7) // 8, 'big')
+    raw = b'\x00' * leading_zeros + raw
+
+    if len(raw) < 5:
+        return None
+    payload, checksum = raw[:-4], raw[-4:]
+    if hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != checksum:
+        return None
+    return payload
+
+def _bech32_polymod(values: List[int]) -> int:
+    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+    checksum = 1
+    for value in values:
+        top = checksum >> 25
+        checksum = (checksum & 0x1ffffff) << 5 ^ value
+        for bit in range(5):
+            checksum ^= generator[bit] if (top >> bit) & 1 else 0
+    return checksum
+
+def _bech32_hrp_expand(hrp: str) -> List[int]:
+    return [ord(char) >> 5 for char in hrp] + [0] + [ord(char) & 31 for char in hrp]
+
+def bech32_decode(address: str) -> Optional[Tuple[str, List[int], int]]:
+    """Decode a Bech32 or Bech32m string to (hrp, data, checksum constant), or None if malformed"""
+    if any(ord(char) < 33 or ord(char) > 126 for char in address):
+        return None
+    if address.lower() != address and address.upper() != address:
+        return None  # Mixed case is never valid
+
+    address = address.lower()
+    separator = address.rfind('1')
+    if separator < 1 or separator + 7 > len(address) or len(address) > 90:
+        return None
+
+    hrp = address[:separator]
+    try:
+        data = [BECH32_INDEX[char] for char in address[separator + 1:]]
+    except KeyError:
+        return None
+
+    const = _bech32_polymod(_bech32_hrp_expand(hrp) + data)
+    if const not in (BECH32_CONST, BECH32M_CONST):
+        return None
+    return hrp, data[:-6], const
+
+def _convert_bits(data: List[int], from_bits: int, to_bits: int) -> Optional[List[int]]:
+    """Regroup 5-bit words into bytes, rejecting non-zero padding"""
+    accumulator = 0
+    bits = 0
+    result = []
+    max_value = (1 << to_bits) - 1
+    for value in data:
+        accumulator = (accumulator << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            result.append((accumulator >> bits) & max_value)
+    if bits >= from_bits or (accumulator << (to_bits - bits)) & max_value:
+        return None
+    return result
+
+def _check_base58(address: str) -> AddressInfo:
+    payload = b58decode_check(address)
+    if payload is None:
+        return _invalid('Invalid Bitcoin address checksum')
+    if len(payload) != 21 or payload[0] not in BASE58_VERSIONS:
+        return _invalid(UNSUPPORTED_FORMAT)
+
+    network, address_type = BASE58_VERSIONS[payload[0]]
+    return AddressInfo(True, address_type, network)
+
+def _check_segwit(address: str) -> AddressInfo:
+    decoded = bech32_decode(address)
+    if decoded is None:
+        return _invalid('Invalid Bitcoin address checksum')
+
+    hrp, data, const = decoded
+    if hrp not in SEGWIT_HRPS or not data:
+        return _invalid(UNSUPPORTED_FORMAT)
+
+    version = data[0]
+    program = _convert_bits(data[1:], 5, 8)
+    if version > 16 or program is None or not 2 <= len(program) <= 40:
+        return _invalid('Invalid SegWit address')
+    if version == 0 and len(program) not in (20, 32):
+        return _invalid('Invalid SegWit address')
+
+    # BIP 350: v0 uses Bech32, every later version Bech32m
+    if (version == 0) != (const == BECH32_CONST):
+        return _invalid('Invalid Bitcoin address checksum')
+
+    return AddressInfo(True, 'bech32' if version == 0 else 'bech32m', SEGWIT_HRPS[hrp], version)
+
+@lru_cache(maxsize=4096)
+def check_address(address: str) -> AddressInfo:
+    """Check an address's encoding and checksum and work out its type and network"""
+    if address.lower().startswith(tuple(f"{hrp}1" for hrp in SEGWIT_HRPS)):
+        return _check_segwit(address)
+    return _check_base58(address)
@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import Any, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+class CircuitBreaker:
+    """Fail fast on an upstream that keeps failing
+
+    Opens after failure_threshold consecutive failures. After recovery_timeout
+    seconds it lets half_open_max_calls trial calls through; one success closes
+    it again, one failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._trial_calls = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Whether a call may go out now"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._trial_calls < self.half_open_max_calls:
+                self._trial_calls += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuit {self.name} opened after {self._failures} failures")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            snapshot = {'state': state, 'consecutive_failures': self._failures}
+            if state == OPEN:
+                snapshot['retry_in_seconds'] = round(self.recovery_timeout - (now - self._opened_at), 1)
+            return snapshot
+
+class CircuitBreakerRegistry:
+    """Process-wide circuit breakers, one per upstream endpoint group"""
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, failure_threshold: int, recovery_timeout: float):
+        """Set thresholds for this and any breakers created later"""
+        with self._lock:
+            self.failure_threshold = failure_threshold
+            self.recovery_timeout = recovery_timeout
+            for breaker in self._breakers.values():
+                breaker.failure_threshold = failure_threshold
+                breaker.recovery_timeout = recovery_timeout
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, self.failure_threshold, self.recovery_timeout)
+                self._breakers[name] = breaker
+            return breaker
+
+    def reset(self):
+        """Forget all breakers and their state"""
+        with self._lock:
+            self._breakers.clear()
+
+    def is_open(self, name: str) -> bool:
+        return self.get(name).state == OPEN
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.snapshot() for breaker in sorted(breakers, key=lambda b: b.name)}
+
+# Global circuit breakers shared by all services in this process
+circuit_breakers = CircuitBreakerRegistry()
@@ -1,10 +1,14 @@
 import re
+import base64
 import random
 import string
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Tuple
 import hashlib
 import logging
+from utils.rate_limit import MemoryRateLimitBackend
+from utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -76,6 +80,20 @@ def format_bitcoin_amount(amount: float, decimals: int = 8) -> str:
     """Format Bitcoin amount with proper decimal places"""
     return f"{amount:.{decimals}f}"
 
+def encode_cursor(created_at: datetime, record_id: str) -> str:
+    """Encode a (created_at, id) keyset position as an opaque pagination cursor"""
+    raw = f"{created_at.isoformat()}|{record_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a pagination cursor into (created_at, id); raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, record_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), record_id
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
 def parse_bitcoin_amount(amount_str: str) -> Optional[float]:
     """Parse Bitcoin amount from string"""
     try:
@@ -98,13 +116,13 @@ def parse_bitcoin_amount(amount_str: str) -> Optional[float]:
 def extract_bitcoin_address(text: str) -> Optional[str]:
     """Extract Bitcoin address from text"""
     # Bitcoin address patterns
-    # Legacy (P2PKH): starts with 1, 26-35 characters
-    # Script (P2SH): starts with 3, 26-35 characters  
-    # Bech32 (P2WPKH/P2WSH): starts with bc1, 42 characters
+    # Legacy (P2PKH) and Script (P2SH): Base58, case-sensitive; 1/3 on mainnet, m/n/2 on testnet
+    # SegWit (Bech32/Bech32m): bc1 on mainnet, tb1 on testnet, all one case
     
     patterns = [
-        r'\b[13][a-km-zA-HJ-NP-Z1-9]{25,34}\b',  # Legacy and Script
-        r'\bbc1[a-z0-9]{39,59}\b'  # Bech32
+        r'\b[13mn2][a-km-zA-HJ-NP-Z1-9]{25,34}\b',  # Legacy and Script
+        r'\b(?:bc|tb)1[ac-hj-np-z02-9]{8,87}\b',  # SegWit, lowercase
+        r'\b(?:BC|TB)1[AC-HJ-NP-Z02-9]{8,87}\b'  # SegWit, uppercase (e.g. from QR codes)
     ]
     
     for pattern in patterns:
@@ -121,12 +139,13 @@ def parse_send_command(message: str) -> Optional[Dict[str, Any]]:
     # "Send 0.001 to 1ABC..."
     # "Transfer 0.001 BTC to 1ABC..."
     
-    # Clean message
-    message = message.strip().lower()
+    # Clean message; keep the original case for the address, which Base58 needs
+    message = message.strip()
+    lowered = message.lower()
     
     # Extract amount
     amount_pattern = r'(?:send|transfer)\s+([0-9]*\.?[0-9]+)\s*(?:btc)?\s+to'
-    amount_match = re.search(amount_pattern, message)
+    amount_match = re.search(amount_pattern, lowered)
     
     if not amount_match:
         return None
@@ -137,8 +156,8 @@ def parse_send_command(message: str) -> Optional[Dict[str, Any]]:
     if amount is None:
         return None
     
-    # Extract Bitcoin address
-    address = extract_bitcoin_address(message)
+    # Extract Bitcoin address from after the amount
+    address = extract_bitcoin_address(message[amount_match.end():])
     
     if not address:
         return None
@@ -207,117 +226,112 @@ def truncate_address(address: str, start_chars: int = 6, end_chars: int = 4) ->
     
     return f"{address[:start_chars]}...{address[-end_chars:]}"
 
-def detect_message_intent(message: str) -> str:
-    """Detect user intent from message with improved case-insensitive matching"""
-    # First normalize the message
-    normalized = normalize_text(message)
-    
+# Intent patterns, checked in priority order: the first category with a
+# matching pattern wins, and within a category the first pattern wins.
+INTENT_PATTERNS = [
     # Confirmation patterns (YES, yes, Yes, etc.)
-    confirm_patterns = [
+    ('confirm', [
         r'^(yes|y|ok|okay|confirm|sure|yep|yeah|yup|si|oui)$',
         r'(create|start|begin)\s+(account|wallet|bitcoin|btc)',
         r'(i\s+want|want\s+to|please)\s+(create|start|begin)',
         r'(create|make|generate).*wallet',
-    ]
-    
-    for pattern in confirm_patterns:
-        if re.search(pattern, normalized):
-            return 'confirm'
-    
+    ]),
     # Cancel patterns
-    cancel_patterns = [
+    ('cancel', [
         r'^(no|n|nope|cancel|stop|exit|quit|abort)$',
-    ]
-    
-    for pattern in cancel_patterns:
-        if re.search(pattern, normalized):
-            return 'cancel'
-    
+    ]),
     # Greeting patterns
-    greeting_patterns = [
+    ('greeting', [
         r'^(hi|hello|hey|good\s+(morning|afternoon|evening))$',
         r'^\w*(hi|hello|hey)\w*$',
-    ]
-    
-    for pattern in greeting_patterns:
-        if re.search(pattern, normalized):
-            return 'greeting'
-    
+    ]),
     # Send/Transfer patterns
-    send_patterns = [
+    ('send', [
         r'(send|transfer|pay|give)\s+.*\s*(btc|bitcoin)',
         r'(send|transfer|pay|give)\s+[\d.]+',
         r'i\s+(want\s+to\s+|need\s+to\s+)?(send|transfer|pay)',
         r'^(transfer|pay).*money',
-    ]
-    
-    for pattern in send_patterns:
-        if re.search(pattern, normalized):
-            return 'send'
-    
+    ]),
     # Balance patterns - expanded with natural language
-    balance_patterns = [
+    ('balance', [
         r'^(balance|bal|money|funds|wallet)$',
         r'(check|show|what.*is|how.*much).*balance',
         r'(my|current|account)\s+(balance|money|funds)',
         r'how\s+much\s+(do\s+i\s+have|money|bitcoin|btc)',
         r'(what.*balance|balance.*have)',
-    ]
-    
-    for pattern in balance_patterns:
-        if re.search(pattern, normalized):
-            return 'balance'
-    
+    ]),
     # History patterns
-    history_patterns = [
+    ('history', [
         r'^(history|transactions|activity|statement)$',
         r'(show|view|check|get).*(history|transactions)',
         r'(my|recent|past)\s+(transactions|history|activity)',
         r'transaction\s+(history|list)',
-    ]
-    
-    for pattern in history_patterns:
-        if re.search(pattern, normalized):
-            return 'history'
-    
+    ]),
     # Address patterns - expanded with wallet creation requests
-    address_patterns = [
+    ('address', [
         r'^(address|receive|deposit)$',
         r'(my|bitcoin|btc|wallet)\s+(address|id)',
         r'(receive|get)\s+(bitcoin|btc|money)',
         r'how\s+to\s+receive',
         r'where.*send.*me',
-    ]
-    
-    for pattern in address_patterns:
-        if re.search(pattern, normalized):
-            return 'address'
-    
+    ]),
     # Help patterns
-    help_patterns = [
+    ('help', [
         r'^(help|support|assist|info|information|\?)$',
         r'(need|want)\s+(help|support|assistance)',
         r'(how\s+do\s+i|what\s+can)',
         r'commands?',
-    ]
-    
-    for pattern in help_patterns:
-        if re.search(pattern, normalized):
-            return 'help'
+    ]),
+]
+
+def _compile_intent_classifier(intent_patterns):
+    """Combine all intent patterns into one regex evaluated in a single call
+
+    Each pattern becomes a lookahead anchored at the start of the message,
+    so alternatives are tried in priority order exactly like sequential
+    re.search calls, and the named group that matches identifies the intent.
+    """
+    alternatives = []
+    group_intents = {}
+    
+    for intent, patterns in intent_patterns:
+        for pattern in patterns:
+            group = f"p{len(alternatives)}"
+            group_intents[group] = intent
+            alternatives.append(f"(?=[\\s\\S]*?(?:{pattern}))(?P<{group}>)")
+    
+    return re.compile('|'.join(alternatives)), group_intents
+
+_INTENT_REGEX, _INTENT_GROUPS = _compile_intent_classifier(INTENT_PATTERNS)
+_OTP_REGEX = re.compile(r'^\d{6}$')
+_EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_NAME_STOP_WORDS = frozenset(['want', 'need', 'can', 'how', 'what', 'where', 'when', 'random', 'gibberish', 'history', 'start', 'begin'])
+
+def detect_message_intent(message: str) -> str:
+    """Detect user intent from message with improved case-insensitive matching"""
+    # First normalize the message
+    return _classify_normalized_message(normalize_text(message))
+
+@lru_cache(maxsize=4096)
+def _classify_normalized_message(normalized: str) -> str:
+    """Classify a normalized message (cached, most messages are short repeated commands)"""
+    match = _INTENT_REGEX.match(normalized)
+    if match:
+        return _INTENT_GROUPS[match.lastgroup]
     
     # Check if it's an OTP (6 digits)
-    if re.match(r'^\d{6}$', normalized):
+    if _OTP_REGEX.match(normalized):
         return 'otp'
     
     # Check if it's a valid name (for registration) - but be more restrictive
     words = normalized.split()
     if (len(words) == 2 and 
         all(word.isalpha() and len(word) >= 2 for word in words) and
-        not any(word in ['want', 'need', 'can', 'how', 'what', 'where', 'when', 'random', 'gibberish', 'history', 'start', 'begin'] for word in words)):
+        not any(word in _NAME_STOP_WORDS for word in words)):
         return 'name_input'
     
     # Check if it's an email
-    if re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', normalized):
+    if _EMAIL_REGEX.match(normalized):
         return 'email_input'
     
     # Default to unknown
@@ -328,20 +342,20 @@ def create_session_data(state: str, **kwargs) -> str:
     import json
     data = {
         'state': state,
-        'timestamp': datetime.utcnow().isoformat(),
         **kwargs
     }
-    return json.dumps(data)
+    return json.dumps(data, separators=(',', ':'))
 
 def parse_session_data(session_data: str) -> Dict[str, Any]:
     """Parse session data from JSON string"""
     import json
-    try:
-        if not session_data:
+    with tracer.start_as_current_span('session.parse'):
+        try:
+            if not session_data:
+                return {}
+            return json.loads(session_data)
+        except (json.JSONDecodeError, TypeError):
             return {}
-        return json.loads(session_data)
-    except (json.JSONDecodeError, TypeError):
-        return {}
 
 def is_rate_limited(last_activity: datetime, limit_seconds: int = 60) -> bool:
     """Check if user is rate limited"""
@@ -356,45 +370,29 @@ def generate_secure_token(length: int = 32) -> str:
     return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
 
 class RateLimiter:
-    """Simple in-memory rate limiter"""
+    """Sliding-window rate limiter over a pluggable counter backend"""
     
-    def __init__(self):
-        self.attempts = {}
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryRateLimitBackend()
+    
+    def use_backend(self, backend):
+        """Swap the counter backend, e.g. for one shared by all workers"""
+        self.backend = backend
     
     def is_allowed(self, key: str, max_attempts: int = 5, window_minutes: int = 5) -> bool:
         """Check if action is allowed within rate limit"""
-        now = datetime.utcnow()
-        window_start = now - timedelta(minutes=window_minutes)
-        
-        # Clean old entries
-        if key in self.attempts:
-            self.attempts[key] = [
-                timestamp for timestamp in self.attempts[key]
-                if timestamp > window_start
-            ]
-        
-        # Check current attempts
-        current_attempts = len(self.attempts.get(key, []))
-        
-        if current_attempts >= max_attempts:
-            return False
-        
-        # Record this attempt
-        if key not in self.attempts:
-            self.attempts[key] = []
-        
-        self.attempts[key].append(now)
-        return True
+        return self.backend.hit(key, max_attempts, window_minutes * 60)
 
 # Global rate limiter instance
 rate_limiter = RateLimiter()
 
 def log_user_action(phone_number: str, action: str, details: str = None):
-    """Log user action for monitoring"""
+    """Log user action for monitoring (sampled per action, see LOG_SAMPLE_RATES)"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     masked_phone = mask_sensitive_data(phone_number, 4)
-    log_message = f"User {masked_phone} performed action: {action}"
-    
-    if details:
-        log_message += f" - {details}"
-    
-    logger.info(log_message)
\ No newline at end of file
+    logger.info(
+        "User %s performed action: %s%s", masked_phone, action, f" - {details}" if details else '',
+        extra={'phone': masked_phone, 'action': action, 'details': details, 'sample_key': action}
+    )
\ No newline at end of file
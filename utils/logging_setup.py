@@ -0,0 +1,153 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import math
+import queue
+import sys
+import threading
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from enum import Enum
+from typing import Dict, Optional
+from uuid import UUID
+from utils.metrics import LOG_RECORDS_DROPPED
+from utils.tracing import get_current_span
+
+# Attributes every LogRecord has; anything else was passed through extra=
+STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'sample_key'}
+
+# Immutable argument types, safe to format later on the listener thread
+SAFE_ARG_TYPES = (str, int, float, bool, type(None), bytes, Decimal, datetime, date, UUID, Enum)
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse 'message_received=0.1,request=0.5' into {event: fraction of records kept}"""
+    rates = {}
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        key, _, rate = part.partition('=')
+        rates[key.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with any extra= fields alongside the message"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+def _kept(seen: int, rate: float) -> int:
+    # Rounded first so float error (10 * 0.7 == 7.000000000000001) cannot keep an extra record
+    return math.ceil(round(seen * rate, 9))
+
+class SamplingFilter(logging.Filter):
+    """Keep a fixed fraction of the INFO-and-below records logged with extra={'sample_key': ...}
+
+    Kept records carry sample_rate so counts can be scaled back up downstream.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.rates = rates or {}
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, 'sample_key', None))
+        if rate is None or rate >= 1 or record.levelno > logging.INFO:
+            return True
+
+        # Deterministic rather than random, so low rates still log steadily: the nth
+        # record is kept when it raises ceil(n * rate), the number kept so far
+        with self._lock:
+            seen = self._seen.get(record.sample_key, 0) + 1
+            self._seen[record.sample_key] = seen
+        if rate <= 0 or _kept(seen, rate) == _kept(seen - 1, rate):
+            LOG_RECORDS_DROPPED.labels('sampled').inc()
+            return False
+        record.sample_rate = rate
+        return True
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the listener thread without formatting them on the calling thread
+
+    The stock QueueHandler formats every message before enqueueing it. This one
+    only stringifies arguments that could change before the listener formats
+    them, and drops records instead of blocking when the queue is full.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not isinstance(record.msg, str):
+            record.msg = str(record.msg)
+        if record.args:
+            args = record.args if isinstance(record.args, tuple) else (record.args,)
+            if not all(isinstance(arg, SAFE_ARG_TYPES) for arg in args):
+                record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            # Tracebacks hold frames alive, so render them now
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        span = get_current_span()
+        if span.is_recording():
+            record.trace_id = span.trace_id
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels('queue_full').inc()
+
+# Listener of the current configuration, stopped when logging is reconfigured and at exit
+_listener = None
+_queue_handler = None
+
+def configure_logging(level: str = 'INFO', log_format: str = 'json', sample_rates: Optional[Dict[str, float]] = None,
+                      queue_size: int = 10000):
+    """Route the root logger through a bounded queue to a background thread that writes to stderr"""
+    global _listener, _queue_handler
+
+    root = logging.getLogger()
+    if _listener is not None:
+        _listener.stop()
+        root.removeHandler(_queue_handler)
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    _queue_handler = LazyQueueHandler(queue.Queue(maxsize=queue_size))
+    _queue_handler.addFilter(SamplingFilter(sample_rates))
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+    root.addHandler(_queue_handler)
+    root.setLevel(getattr(logging, level.upper()))
+    return _listener
+
+def stop_logging():
+    """Write out queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener = None
+
+atexit.register(stop_logging)
@@ -0,0 +1,127 @@
+import os
+import time
+from typing import Dict, Optional, Tuple
+import logging
+from flask import g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Set PROMETHEUS_MULTIPROC_DIR before the app starts so every gunicorn worker
+# writes its samples there and /metrics reports the sum across workers
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+
+REQUEST_LATENCY = Histogram(
+    'satchat_http_request_duration_seconds', 'Time to build a response, by route',
+    ['method', 'route', 'status']
+)
+MESSAGE_LATENCY = Histogram(
+    'satchat_message_duration_seconds', 'Time to handle an inbound WhatsApp message, by intent or conversation step',
+    ['intent']
+)
+DB_QUERIES = Histogram(
+    'satchat_db_queries_per_request', 'SQL statements issued while handling one request, by route',
+    ['route'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+BITNOB_LATENCY = Histogram(
+    'satchat_bitnob_request_duration_seconds', 'Bitnob API call time including retries, by endpoint group',
+    ['endpoint', 'method']
+)
+BITNOB_ERRORS = Counter(
+    'satchat_bitnob_errors_total', 'Failed Bitnob API calls, by endpoint group and reason',
+    ['endpoint', 'method', 'reason']
+)
+TWILIO_LATENCY = Histogram(
+    'satchat_twilio_request_duration_seconds', 'Twilio API call time, by operation',
+    ['operation']
+)
+TWILIO_ERRORS = Counter(
+    'satchat_twilio_errors_total', 'Failed Twilio API calls, by operation and reason',
+    ['operation', 'reason']
+)
+OTP_VERIFICATIONS = Counter(
+    'satchat_otp_verifications_total', 'OTP verification attempts, by outcome',
+    ['outcome']
+)
+LOG_RECORDS_DROPPED = Counter(
+    'satchat_log_records_dropped_total', 'Log records not written: sampled out, or the log queue was full',
+    ['reason']
+)
+QUEUE_DEPTH = Gauge(
+    'satchat_message_queue_depth', 'Inbound messages in the async reply queue, by status',
+    ['status'], multiprocess_mode='livemostrecent'
+)
+RECONCILER_LAG = Gauge(
+    'satchat_reconciler_max_lag_seconds', 'Age of the oldest unsettled transaction seen by the last reconciler run',
+    multiprocess_mode='mostrecent'
+)
+RECONCILER_DRIFT = Counter(
+    'satchat_reconciler_drift_total', "Transactions whose local status disagreed with Bitnob's, by Bitnob status",
+    ['status']
+)
+
+def is_multiprocess() -> bool:
+    """Whether samples are shared between worker processes through PROMETHEUS_MULTIPROC_DIR"""
+    return bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Get the /metrics body and content type, merged across workers in multiprocess mode"""
+    registry = REGISTRY
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_process_dead(pid: int):
+    """Drop a finished worker's live gauges (call from gunicorn's child_exit hook)"""
+    if is_multiprocess():
+        multiprocess.mark_process_dead(pid)
+
+def record_bitnob_call(endpoint: str, method: str, seconds: Optional[float] = None, error: Optional[str] = None):
+    """Record one Bitnob API call; seconds is None when it was never sent"""
+    if seconds is not None:
+        BITNOB_LATENCY.labels(endpoint, method.upper()).observe(seconds)
+    if error:
+        BITNOB_ERRORS.labels(endpoint, method.upper(), error).inc()
+
+def record_twilio_call(operation: str, seconds: Optional[float] = None, error: Optional[str] = None):
+    """Record one Twilio API call; seconds is None when it was never sent"""
+    if seconds is not None:
+        TWILIO_LATENCY.labels(operation).observe(seconds)
+    if error:
+        TWILIO_ERRORS.labels(operation, error).inc()
+
+def record_reconciler_run(max_lag_seconds: float, drift_by_status: Dict[str, int]):
+    """Record the lag and drift found by one reconciler run"""
+    RECONCILER_LAG.set(max_lag_seconds)
+    for status, count in drift_by_status.items():
+        RECONCILER_DRIFT.labels(status).inc(count)
+
+def _route() -> str:
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.db_queries = 0
+
+def _observe_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = _route()
+        REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+        DB_QUERIES.labels(route).observe(g.pop('db_queries', 0))
+    return response
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'db_queries' in g:
+        g.db_queries += 1
+
+def init_metrics(app):
+    """Time every request and count its SQL statements"""
+    app.before_request(_start_request)
+    app.after_request(_observe_request)
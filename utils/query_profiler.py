@@ -0,0 +1,250 @@
+import atexit
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import logging
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Frames skipped when looking for the code that issued a statement
+PLUMBING_FILES = {
+    os.path.abspath(__file__),
+    os.path.join(PROJECT_ROOT, 'models', 'database.py'),
+    os.path.join(PROJECT_ROOT, 'utils', 'tracing.py'),
+}
+
+# The report file is rewritten at most this often (and once more at exit)
+REPORT_INTERVAL_SECONDS = 1.0
+
+# Profile of the request or queued turn running on this thread or asyncio task
+_current_profile = contextvars.ContextVar('query_profile', default=None)
+
+def _call_site() -> str:
+    """The innermost project frame outside the database plumbing, as 'path:line in function'"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        # Generated code reports pseudo file names such as '<string>'
+        filename = frame.f_code.co_filename
+        filename = filename if filename.startswith('<') else os.path.abspath(filename)
+        if (filename.startswith(PROJECT_ROOT + os.sep) and filename not in PLUMBING_FILES
+                and 'site-packages' not in filename):
+            return f"{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+def _normalize(statement: str) -> str:
+    return ' '.join(statement.split())
+
+class QueryProfile:
+    """Statements issued while handling one request"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.queries = []
+
+    def record(self, statement: str, parameters: Any, duration_ms: float, call_site: str):
+        self.queries.append((_normalize(statement), repr(parameters), duration_ms, call_site))
+
+    def repeated(self, threshold: int) -> List[Dict[str, Any]]:
+        """SELECTs run at least threshold times: N+1 lazy loads, or the same lookup done twice"""
+        groups = defaultdict(list)
+        for query in self.queries:
+            if query[0].upper().startswith('SELECT'):
+                groups[query[0]].append(query)
+
+        return [
+            {
+                'statement': statement,
+                'count': len(queries),
+                'distinct_parameters': len({query[1] for query in queries}),
+                'total_ms': round(sum(query[2] for query in queries), 3),
+                'call_sites': dict(Counter(query[3] for query in queries))
+            }
+            for statement, queries in groups.items() if len(queries) >= threshold
+        ]
+
+    def slow(self, slow_query_ms: float) -> List[Dict[str, Any]]:
+        return [
+            {'statement': statement, 'duration_ms': round(duration_ms, 3), 'call_site': call_site}
+            for statement, _, duration_ms, call_site in self.queries if duration_ms >= slow_query_ms
+        ]
+
+class QueryProfiler:
+    """Record every SQL statement per request and report repeats and slow queries by endpoint
+
+    Meant for development and staging: off until a report path is set, and
+    then each statement costs a stack walk to find its call site.
+    """
+
+    def __init__(self, report_path: Optional[str] = None, slow_query_ms: float = 100, repeat_threshold: int = 2):
+        self._lock = threading.Lock()
+        self.configure(report_path, slow_query_ms, repeat_threshold)
+
+    def configure(self, report_path: Optional[str], slow_query_ms: float = 100, repeat_threshold: int = 2):
+        """Start (or, with no path, stop) profiling; '{pid}' in the path gives every worker its own report"""
+        self.report_path = report_path.replace('{pid}', str(os.getpid())) if report_path else None
+        self.slow_query_ms = slow_query_ms
+        self.repeat_threshold = repeat_threshold
+        self.endpoints = {}
+        self._written_at = 0.0
+        if self.report_path and os.path.dirname(self.report_path):
+            os.makedirs(os.path.dirname(self.report_path), exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.report_path is not None
+
+    def start(self, endpoint: str):
+        """Profile statements on this thread under endpoint until finish is called with the returned token"""
+        if not self.enabled:
+            return None
+        profile = QueryProfile(endpoint)
+        return profile, _current_profile.set(profile)
+
+    def finish(self, token):
+        if token is None:
+            return
+        profile, context_token = token
+        _current_profile.reset(context_token)
+        self._collect(profile)
+
+    @contextmanager
+    def profile(self, endpoint: str):
+        """Profile a block outside a request, such as a queued reply"""
+        token = self.start(endpoint)
+        try:
+            yield
+        finally:
+            self.finish(token)
+
+    def _collect(self, profile: QueryProfile):
+        repeated = profile.repeated(self.repeat_threshold)
+        slow = profile.slow(self.slow_query_ms)
+        for finding in repeated:
+            logger.warning(
+                f"Repeated query in {profile.endpoint}: {finding['count']}x "
+                f"({finding['distinct_parameters']} distinct parameters) from "
+                f"{', '.join(finding['call_sites'])}: {finding['statement'][:200]}"
+            )
+        for finding in slow:
+            logger.warning(
+                f"Slow query in {profile.endpoint}: {finding['duration_ms']:.1f}ms from "
+                f"{finding['call_site']}: {finding['statement'][:200]}"
+            )
+
+        with self._lock:
+            stats = self.endpoints.setdefault(profile.endpoint, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'query_ms': 0.0,
+                'flagged_requests': 0, 'statements': {}, 'repeated': {}, 'slow': {}
+            })
+            stats['requests'] += 1
+            stats['queries'] += len(profile.queries)
+            stats['max_queries'] = max(stats['max_queries'], len(profile.queries))
+            stats['query_ms'] = round(stats['query_ms'] + sum(query[2] for query in profile.queries), 3)
+            stats['flagged_requests'] += 1 if repeated or slow else 0
+
+            for statement, _, duration_ms, call_site in profile.queries:
+                entry = stats['statements'].setdefault(statement, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                                   'call_sites': {}})
+                entry['count'] += 1
+                entry['total_ms'] = round(entry['total_ms'] + duration_ms, 3)
+                entry['max_ms'] = max(entry['max_ms'], round(duration_ms, 3))
+                entry['call_sites'][call_site] = entry['call_sites'].get(call_site, 0) + 1
+
+            for finding in repeated:
+                entry = stats['repeated'].setdefault(finding['statement'], {'requests': 0, 'max_per_request': 0,
+                                                                            'call_sites': {}})
+                entry['requests'] += 1
+                entry['max_per_request'] = max(entry['max_per_request'], finding['count'])
+                for call_site, count in finding['call_sites'].items():
+                    entry['call_sites'][call_site] = entry['call_sites'].get(call_site, 0) + count
+
+            for finding in slow:
+                entry = stats['slow'].setdefault(finding['statement'], {'count': 0, 'max_ms': 0.0, 'call_sites': {}})
+                entry['count'] += 1
+                entry['max_ms'] = max(entry['max_ms'], finding['duration_ms'])
+                entry['call_sites'][finding['call_site']] = entry['call_sites'].get(finding['call_site'], 0) + 1
+
+            if time.monotonic() - self._written_at >= REPORT_INTERVAL_SECONDS:
+                self._write_report()
+
+    def report(self) -> Dict[str, Any]:
+        """Per-endpoint statement counts and times, with the repeated and slow statements flagged"""
+        with self._lock:
+            return json.loads(json.dumps(self._report()))
+
+    def _report(self) -> Dict[str, Any]:
+        return {
+            'pid': os.getpid(),
+            'generated_at': time.time(),
+            'slow_query_ms': self.slow_query_ms,
+            'repeat_threshold': self.repeat_threshold,
+            'endpoints': self.endpoints
+        }
+
+    def write_report(self):
+        with self._lock:
+            self._write_report()
+
+    def _write_report(self):
+        if not self.enabled or not self.endpoints:
+            return
+        self._written_at = time.monotonic()
+        temporary_path = f"{self.report_path}.tmp"
+        try:
+            with open(temporary_path, 'w') as report_file:
+                json.dump(self._report(), report_file, indent=2, sort_keys=True)
+            os.replace(temporary_path, self.report_path)
+        except OSError as e:
+            logger.warning(f"Could not write query report {self.report_path}: {e}")
+
+# Global profiler
+query_profiler = QueryProfiler()
+atexit.register(query_profiler.write_report)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault('query_profiler_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    started = conn.info.get('query_profiler_started')
+    if profile is None or not started:
+        return
+    duration_ms = (time.perf_counter() - started.pop()) * 1000
+    profile.record(statement, parameters, duration_ms, _call_site())
+
+@event.listens_for(Engine, 'handle_error')
+def _end_failed_query(context):
+    # Failed statements (lock timeouts included) are recorded too, or their start would be left behind
+    connection = context.connection
+    started = connection.info.get('query_profiler_started') if connection is not None else None
+    if started:
+        _end_query(connection, context.cursor, context.statement, context.parameters,
+                   context.execution_context, False)
+
+def init_query_profiling(app):
+    """Profile the statements of each request, by route template"""
+    from flask import g, request
+
+    def start_request_profile():
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.query_profile_token = query_profiler.start(f"{request.method} {route}")
+
+    def end_request_profile(error=None):
+        query_profiler.finish(g.pop('query_profile_token', None))
+
+    app.before_request(start_request_profile)
+    app.teardown_request(end_request_profile)
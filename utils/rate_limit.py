@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+import logging
+from utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+def slide_window(state: Optional[Tuple[int, int, int]], limit: int, window_seconds: float,
+                 now: float) -> Tuple[bool, Tuple[int, int, int]]:
+    """Apply one hit to a sliding-window counter
+
+    state is (window index, hits in current window, hits in previous window).
+    The previous window's hits are weighted by how much of it still overlaps
+    the sliding window. Returns (allowed, new state); denied hits are not counted.
+    """
+    window = int(now // window_seconds)
+
+    if state is None or state[0] < window - 1:
+        current, previous = 0, 0
+    elif state[0] == window - 1:
+        current, previous = 0, state[1]
+    else:
+        current, previous = state[1], state[2]
+
+    elapsed = (now - window * window_seconds) / window_seconds
+    estimated = previous * (1 - elapsed) + current
+
+    if estimated >= limit:
+        return False, (window, current, previous)
+    return True, (window, current + 1, previous)
+
+class MemoryRateLimitBackend:
+    """Sliding-window counters held in this process"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, window_seconds: float) -> bool:
+        """Record a hit for key; return whether it is within the limit"""
+        now = time.time()
+        with self._lock:
+            entry = self._counters.get(key)
+            allowed, state = slide_window(entry[0] if entry else None, limit, window_seconds, now)
+            self._counters[key] = (state, now + 2 * window_seconds)
+            self._counters.move_to_end(key)
+            self._evict_idle(now)
+        return allowed
+
+    def _evict_idle(self, now: float):
+        # Entries are ordered by last use, so idle keys collect at the front
+        while self._counters:
+            key, (state, expires_at) = next(iter(self._counters.items()))
+            if expires_at > now and len(self._counters) <= self.max_keys:
+                break
+            del self._counters[key]
+
+class SQLiteRateLimitBackend(SQLiteStore):
+    """Sliding-window counters in a SQLite file shared by all workers on a host"""
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS rate_limits (
+        key TEXT PRIMARY KEY,
+        window INTEGER NOT NULL,
+        current INTEGER NOT NULL,
+        previous INTEGER NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_rate_limits_expires_at ON rate_limits (expires_at);
+    """
+
+    def __init__(self, path: str, purge_every: int = 1000):
+        self.purge_every = purge_every
+        self._hits = 0
+        super().__init__(path)
+
+    def hit(self, key: str, limit: int, window_seconds: float) -> bool:
+        """Record a hit for key; return whether it is within the limit"""
+        now = time.time()
+
+        self._hits += 1
+        if self._hits % self.purge_every == 0:
+            self.execute("DELETE FROM rate_limits WHERE expires_at < ?", (now,))
+
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT window, current, previous FROM rate_limits WHERE key = ?", (key,)
+            ).fetchone()
+            allowed, state = slide_window(tuple(row) if row else None, limit, window_seconds, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits (key, window, current, previous, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, state[0], state[1], state[2], now + 2 * window_seconds)
+            )
+        return allowed
+
+class DatabaseRateLimitBackend:
+    """Sliding-window counters in the application database, shared by every host"""
+
+    def __init__(self, purge_every: int = 1000, max_retries: int = 20):
+        self.purge_every = purge_every
+        self.max_retries = max_retries
+        self._hits = 0
+
+    def hit(self, key: str, limit: int, window_seconds: float) -> bool:
+        """Record a hit for key; return whether it is within the limit"""
+        from sqlalchemy.exc import IntegrityError
+        from models.database import db
+        from models.rate_limit import RateLimitCounter
+
+        table = RateLimitCounter.__table__
+        now = time.time()
+
+        self._hits += 1
+        if self._hits % self.purge_every == 0:
+            with db.engine.begin() as conn:
+                conn.execute(table.delete().where(table.c.expires_at < now))
+
+        # Compare-and-swap in short transactions of their own, so no row lock is held
+        # for the rest of the request and no SELECT ... FOR UPDATE support is needed
+        for _ in range(self.max_retries):
+            try:
+                with db.engine.begin() as conn:
+                    row = conn.execute(table.select().where(table.c.key == key)).first()
+                    allowed, state = slide_window(
+                        (row.window, row.current, row.previous) if row else None,
+                        limit, window_seconds, now
+                    )
+                    values = {
+                        'window': state[0],
+                        'current': state[1],
+                        'previous': state[2],
+                        'expires_at': now + 2 * window_seconds
+                    }
+                    if row is None:
+                        conn.execute(table.insert().values(key=key, **values))
+                        return allowed
+
+                    result = conn.execute(
+                        table.update().where(
+                            table.c.key == key,
+                            table.c.window == row.window,
+                            table.c.current == row.current,
+                            table.c.previous == row.previous
+                        ).values(**values)
+                    )
+                    if result.rowcount == 1:
+                        return allowed
+            except IntegrityError:
+                # Another worker inserted the key first
+                pass
+
+        logger.warning(f"Rate limit counter for {key} is too contended, allowing request")
+        return True
+
+# Factory function
+def create_rate_limit_backend(backend: str = 'memory', path: Optional[str] = None):
+    """Create rate limit backend: 'memory', 'sqlite' or 'database'"""
+    if backend == 'sqlite':
+        return SQLiteRateLimitBackend(path)
+    if backend == 'database':
+        return DatabaseRateLimitBackend()
+    if backend != 'memory':
+        logger.warning(f"Unknown rate limit backend '{backend}', using in-memory counters")
+    return MemoryRateLimitBackend()
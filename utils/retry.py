@@ -0,0 +1,157 @@
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Most seconds one call may spend waiting to retry; set on request threads, unbounded elsewhere
+_retry_deadline = contextvars.ContextVar('retry_deadline', default=None)
+
+class RetryBudget:
+    """Caps retries at a fraction of recent requests so retries cannot amplify an outage"""
+
+    def __init__(self, ratio: float = 0.2, min_retries_per_second: float = 1.0, window_seconds: float = 10.0):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window_seconds = window_seconds
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        cutoff = now - self.window_seconds
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_request(self):
+        """Count one first attempt towards the budget"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget; False when it is exhausted"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            allowed = self.min_retries_per_second * self.window_seconds + self.ratio * len(self._requests)
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+class RetryPolicy:
+    """Timeouts, retry eligibility and jittered backoff for outbound API calls
+
+    Only idempotent methods and requests carrying an idempotency key are retried,
+    on connection errors, timeouts and the statuses in retry_statuses.
+    """
+
+    def __init__(self, max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 endpoint_timeouts: Optional[Dict[str, Tuple[float, float]]] = None,
+                 max_retry_after: float = 30.0, retry_statuses=RETRY_STATUSES,
+                 budget: Optional[RetryBudget] = None):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.default_timeout = (connect_timeout, read_timeout)
+        self.endpoint_timeouts = endpoint_timeouts or {}
+        self.max_retry_after = max_retry_after
+        self.retry_statuses = frozenset(retry_statuses)
+        self.budget = budget or RetryBudget()
+
+    def timeout_for(self, endpoint: str) -> Tuple[float, float]:
+        """(connect, read) timeout for the longest matching endpoint prefix"""
+        matches = [prefix for prefix in self.endpoint_timeouts if endpoint.startswith(prefix)]
+        if not matches:
+            return self.default_timeout
+        return self.endpoint_timeouts[max(matches, key=len)]
+
+    def is_retryable(self, method: str, idempotency_key: Optional[str] = None) -> bool:
+        """Whether repeating this request cannot apply it twice"""
+        return method.upper() in IDEMPOTENT_METHODS or bool(idempotency_key)
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None, waited: float = 0.0) -> Optional[float]:
+        """Seconds to wait before retry number attempt + 1, or None to give up
+
+        Uses full-jitter exponential backoff, never shorter than the server's
+        Retry-After. Gives up when the server asks for more than max_retry_after,
+        or when the wait would take the call (having already waited that many
+        seconds) past the current retry deadline.
+        """
+        if attempt >= self.max_retries:
+            return None
+
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+        wait = parse_retry_after(retry_after)
+        if wait is not None:
+            if wait > self.max_retry_after:
+                return None
+            delay = max(delay, wait)
+
+        deadline = _retry_deadline.get()
+        if deadline is not None and waited + delay > deadline:
+            return None
+
+        return delay
+
+@contextmanager
+def retry_deadline(seconds: Optional[float]):
+    """Limit the total time each call in this block waits between retries (None lifts the limit)"""
+    token = _retry_deadline.set(seconds)
+    try:
+        yield
+    finally:
+        _retry_deadline.reset(token)
+
+def init_retry_deadline(app, seconds: float):
+    """Fail request threads fast instead of waiting out long Retry-Afters
+
+    Background threads (rates refresh, reply workers, the reconciler) keep the
+    policy's full waits.
+    """
+    from flask import g
+
+    def start_request_deadline():
+        g.retry_deadline_token = _retry_deadline.set(seconds)
+
+    def end_request_deadline(error=None):
+        token = g.pop('retry_deadline_token', None)
+        if token is not None:
+            _retry_deadline.reset(token)
+
+    app.before_request(start_request_deadline)
+    app.teardown_request(end_request_deadline)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        logger.debug(f"Ignoring unparseable Retry-After: {value}")
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+import logging
+from utils.sqlite_store import SQLiteStore
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# (state, data) for one conversation
+Session = Tuple[str, Optional[str]]
+
+class MemorySessionBackend:
+    """Conversation sessions in this process only, for development and single-worker runs"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Session]:
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._sessions[key]
+                return None
+            return entry[0]
+
+    def set(self, key: str, session: Session, ttl_seconds: float):
+        now = time.time()
+        with self._lock:
+            self._sessions[key] = (session, now + ttl_seconds)
+            self._sessions.move_to_end(key)
+            self._evict_expired(now)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def _evict_expired(self, now: float):
+        # Entries are ordered by last write, so abandoned sessions collect at the front
+        while self._sessions:
+            key, (session, expires_at) = next(iter(self._sessions.items()))
+            if expires_at > now and len(self._sessions) <= self.max_keys:
+                break
+            del self._sessions[key]
+
+class SQLiteSessionBackend(SQLiteStore):
+    """Conversation sessions in a SQLite file shared by all workers on a host"""
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS conversation_sessions (
+        key TEXT PRIMARY KEY,
+        state TEXT NOT NULL,
+        data TEXT,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_conversation_sessions_expires_at ON conversation_sessions (expires_at);
+    """
+
+    def __init__(self, path: str, purge_every: int = 1000):
+        self.purge_every = purge_every
+        self._writes = 0
+        super().__init__(path)
+
+    def get(self, key: str) -> Optional[Session]:
+        row = self.execute(
+            "SELECT state, data FROM conversation_sessions WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return (row['state'], row['data']) if row else None
+
+    def set(self, key: str, session: Session, ttl_seconds: float):
+        now = time.time()
+
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.execute("DELETE FROM conversation_sessions WHERE expires_at < ?", (now,))
+
+        self.execute(
+            "INSERT OR REPLACE INTO conversation_sessions (key, state, data, expires_at) VALUES (?, ?, ?, ?)",
+            (key, session[0], session[1], now + ttl_seconds)
+        )
+
+    def delete(self, key: str):
+        self.execute("DELETE FROM conversation_sessions WHERE key = ?", (key,))
+
+class DatabaseSessionBackend:
+    """Conversation sessions in their own table in the application database, shared by every host
+
+    Writes join the current unit of work, so a session step commits or rolls
+    back together with the rows it refers to.
+    """
+
+    def __init__(self, purge_every: int = 1000):
+        self.purge_every = purge_every
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[Session]:
+        from models.database import db
+        from models.session import ConversationSession
+
+        row = db.session.get(ConversationSession, key)
+        if row is None or row.expires_at <= time.time():
+            return None
+        return row.state, row.data
+
+    def set(self, key: str, session: Session, ttl_seconds: float):
+        from models.database import db, commit_session
+        from models.session import ConversationSession
+
+        now = time.time()
+
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            ConversationSession.query.filter(ConversationSession.expires_at < now).delete()
+
+        row = db.session.get(ConversationSession, key)
+        if row is None:
+            row = ConversationSession(key=key)
+            db.session.add(row)
+        row.state, row.data = session
+        row.expires_at = now + ttl_seconds
+        commit_session()
+
+    def delete(self, key: str):
+        from models.database import commit_session
+        from models.session import ConversationSession
+
+        ConversationSession.query.filter_by(key=key).delete()
+        commit_session()
+
+class SessionStore:
+    """Expiring conversation state (e.g. awaiting_otp) keyed by phone number, over a pluggable backend"""
+
+    def __init__(self, backend=None, ttl_seconds: float = 1800):
+        self.backend = backend or MemorySessionBackend()
+        self.ttl_seconds = ttl_seconds
+
+    def use_backend(self, backend, ttl_seconds: Optional[float] = None):
+        """Swap the session backend, e.g. for one shared by all workers"""
+        self.backend = backend
+        if ttl_seconds is not None:
+            self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[Session]:
+        """Get (state, data) for key, or None if there is no live session"""
+        with tracer.start_as_current_span('session.get'):
+            return self.backend.get(key)
+
+    def set(self, key: str, state: str, data: Optional[str] = None):
+        """Store state and data for key, expiring after ttl_seconds without a write"""
+        with tracer.start_as_current_span('session.set'):
+            self.backend.set(key, (state, data), self.ttl_seconds)
+
+    def delete(self, key: str):
+        """End the session for key"""
+        with tracer.start_as_current_span('session.delete'):
+            self.backend.delete(key)
+
+# Global session store
+session_store = SessionStore()
+
+# Factory function
+def create_session_backend(backend: str = 'memory', path: Optional[str] = None):
+    """Create session backend: 'memory', 'sqlite' or 'database'"""
+    if backend == 'sqlite':
+        return SQLiteSessionBackend(path)
+    if backend == 'database':
+        return DatabaseSessionBackend()
+    if backend != 'memory':
+        logger.warning(f"Unknown session backend '{backend}', using in-memory sessions")
+    return MemorySessionBackend()
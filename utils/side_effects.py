@@ -0,0 +1,35 @@
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+# Outbound calls that may have changed state elsewhere, for the block being tracked
+_side_effects = contextvars.ContextVar('side_effects', default=None)
+
+@contextmanager
+def track_side_effects(on_first: Optional[Callable[[str], None]] = None):
+    """Collect the outbound writes (Bitnob POSTs, Twilio sends) made in this block
+
+    Yields the list they are appended to. Threads started with a copy of this
+    context append to the same list. on_first is called with the first write's
+    description before that write is sent, so it can be recorded durably.
+    """
+    effects: List[str] = []
+    token = _side_effects.set((effects, on_first))
+    try:
+        yield effects
+    finally:
+        _side_effects.reset(token)
+
+def record_side_effect(description: str):
+    """Note an outbound call that cannot safely be repeated, if a block is being tracked
+
+    Call this before sending; an exception from on_first stops the call.
+    """
+    tracked = _side_effects.get()
+    if tracked is None:
+        return
+
+    effects, on_first = tracked
+    if not effects and on_first:
+        on_first(description)
+    effects.append(description)
@@ -0,0 +1,205 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Innermost active span of this thread or asyncio task
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class Span:
+    """One timed stage of a trace, shaped like an OpenTelemetry span"""
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.parent = parent
+        self.root = parent.root if parent else self
+        self.trace_id = self.root.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.start = time.perf_counter()
+        self.end_time = None
+        if parent is None:
+            self.started_at = time.time()
+            self.trace_attributes = {}
+            self.finished = []
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_trace_attribute(self, key: str, value: Any):
+        """Set an attribute on this span and, when exported, on every span of its trace"""
+        self.attributes[key] = value
+        self.root.trace_attributes[key] = value
+
+    def record_exception(self, exception: BaseException):
+        self.status = 'error'
+        self.attributes['exception.type'] = type(exception).__name__
+
+    def is_recording(self) -> bool:
+        return True
+
+    def end(self):
+        self.end_time = time.perf_counter()
+        self.root.finished.append(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_time or time.perf_counter()) - self.start) * 1000
+
+class NonRecordingSpan:
+    """Span returned while tracing is off; every call is a no-op"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_trace_attribute(self, key: str, value: Any):
+        pass
+
+    def record_exception(self, exception: BaseException):
+        pass
+
+    def is_recording(self) -> bool:
+        return False
+
+    def end(self):
+        pass
+
+NON_RECORDING_SPAN = NonRecordingSpan()
+
+class FileSpanExporter:
+    """Append each finished trace as one JSON line, for trace_summary.py
+
+    A '{pid}' in the path gives every worker process its own file.
+    """
+
+    def __init__(self, path: str, min_duration_ms: float = 0):
+        self.path = path.replace('{pid}', str(os.getpid()))
+        self.min_duration_ms = min_duration_ms
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, root: Span):
+        if root.duration_ms < self.min_duration_ms:
+            return
+
+        spans = []
+        for span in root.finished:
+            attributes = dict(root.trace_attributes)
+            attributes.update(span.attributes)
+            spans.append({
+                'name': span.name,
+                'span_id': span.span_id,
+                'parent_id': span.parent.span_id if span.parent else None,
+                'start_ms': round((span.start - root.start) * 1000, 3),
+                'duration_ms': round(span.duration_ms, 3),
+                'status': span.status,
+                'attributes': attributes
+            })
+
+        line = json.dumps({
+            'trace_id': root.trace_id,
+            'name': root.name,
+            'started_at': root.started_at,
+            'duration_ms': round(root.duration_ms, 3),
+            'attributes': root.trace_attributes,
+            'spans': spans
+        }, default=str)
+        with self._lock:
+            with open(self.path, 'a') as trace_file:
+                trace_file.write(line + '\n')
+
+class Tracer:
+    """Minimal tracer with the OpenTelemetry start_as_current_span API; a no-op until an exporter is set"""
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    def use_exporter(self, exporter):
+        """Start (or, with None, stop) recording spans"""
+        self.exporter = exporter
+
+    @contextmanager
+    def start_as_current_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        """Time a block as a child of the current span, or as a new trace"""
+        if self.exporter is None:
+            yield NON_RECORDING_SPAN
+            return
+
+        span = self.start_span(name, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        """Start a span without making it current; finish it with end_span"""
+        if self.exporter is None:
+            return NON_RECORDING_SPAN
+        return Span(name, _current_span.get(), attributes)
+
+    def end_span(self, span):
+        span.end()
+        if span.is_recording() and span.parent is None:
+            try:
+                self.exporter.export(span)
+            except Exception as e:
+                logger.warning(f"Could not export trace {span.trace_id}: {e}")
+
+def get_current_span():
+    """The innermost active span, or a no-op span outside any trace"""
+    return _current_span.get() or NON_RECORDING_SPAN
+
+def activate_span(span):
+    """Make a span current until deactivate_span is called with the returned token"""
+    return _current_span.set(span) if span.is_recording() else None
+
+def deactivate_span(token):
+    if token is not None:
+        _current_span.reset(token)
+
+# Global tracer
+tracer = Tracer()
+
+def init_tracing(app):
+    """Trace each request, from the first before_request hook to teardown"""
+    from flask import g, request
+
+    def start_request_span():
+        # Named by route template, so phone numbers in URLs stay out of the trace file
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        span = tracer.start_span(f"{request.method} {route}", {'http.method': request.method, 'http.route': route})
+        g.trace_span, g.trace_token = span, activate_span(span)
+
+    def end_request_span(error=None):
+        span = g.pop('trace_span', None)
+        if span is None:
+            return
+        deactivate_span(g.pop('trace_token', None))
+        if error is not None:
+            span.record_exception(error)
+        tracer.end_span(span)
+
+    app.before_request(start_request_span)
+    app.teardown_request(end_request_span)
+
+# Factory function
+def create_span_exporter(path: Optional[str], min_duration_ms: float = 0):
+    """Create the file exporter, or None (tracing off) when no path is set"""
+    if not path:
+        return None
+    return FileSpanExporter(path, min_duration_ms)
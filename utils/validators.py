@@ -2,6 +2,7 @@ import re
 from typing import Optional, Dict, Any, List
 from decimal import Decimal, InvalidOperation
 import logging
+from utils.bitcoin_address import check_address, MAINNET
 
 logger = logging.getLogger(__name__)
 
@@ -15,34 +16,36 @@ class ValidationError(Exception):
 class BitcoinValidator:
     """Bitcoin-specific validators"""
     
-    @staticmethod
-    def validate_address(address: str) -> Dict[str, Any]:
-        """Validate Bitcoin address format"""
+    # Network accepted for send addresses; set once at startup with use_network()
+    network = MAINNET
+    
+    @classmethod
+    def use_network(cls, network: str):
+        """Accept addresses for this network ('mainnet' or 'testnet')"""
+        cls.network = network
+    
+    @classmethod
+    def validate_address(cls, address: str, network: Optional[str] = None) -> Dict[str, Any]:
+        """Validate Bitcoin address checksum and network"""
         if not address or not isinstance(address, str):
             return {'valid': False, 'error': 'Address is required'}
         
         address = address.strip()
+        info = check_address(address)
         
-        # Legacy address (P2PKH): starts with 1
-        if address.startswith('1'):
-            if not re.match(r'^[13][a-km-zA-HJ-NP-Z1-9]{25,34}$', address):
-                return {'valid': False, 'error': 'Invalid legacy Bitcoin address format'}
-            return {'valid': True, 'type': 'legacy'}
-        
-        # Script address (P2SH): starts with 3
-        elif address.startswith('3'):
-            if not re.match(r'^[13][a-km-zA-HJ-NP-Z1-9]{25,34}$', address):
-                return {'valid': False, 'error': 'Invalid script Bitcoin address format'}
-            return {'valid': True, 'type': 'script'}
+        if not info.valid:
+            return {'valid': False, 'error': info.error}
         
-        # Bech32 address: starts with bc1
-        elif address.startswith('bc1'):
-            if not re.match(r'^bc1[a-z0-9]{39,59}$', address):
-                return {'valid': False, 'error': 'Invalid bech32 Bitcoin address format'}
-            return {'valid': True, 'type': 'bech32'}
+        network = network or cls.network
+        if info.network != network:
+            return {'valid': False, 'error': f'This is a {info.network} address; only {network} addresses are supported'}
         
-        else:
-            return {'valid': False, 'error': 'Unsupported Bitcoin address format'}
+        return {
+            'valid': True,
+            'type': info.type,
+            'network': info.network,
+            'witness_version': info.witness_version
+        }
     
     @staticmethod
     def validate_amount(amount: str) -> Dict[str, Any]: